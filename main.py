@@ -1,6 +1,12 @@
 # Import necessary modules from the project structure
+import importlib.util
+import os
+
 from config import load_portfolio_data, PORTFOLIO_PATH
-from src.data import StockDataFetcher, FeatureEngineering, ETFDataFiller
+from src.data import (
+    StockDataFetcher, FeatureEngineering, ETFDataFiller, TradingCalendar, SnapshotStore,
+    FetchPlanner, ETFHoldings, FundamentalFactors, CheckpointStore
+)
 from src.investing.orchestratrion import InvestmentDecisionMaker, PortfolioUpdator
 
 def main():
@@ -10,21 +16,44 @@ def main():
     # Create a data fetcher instance with the portfolio
     data_fetcher = StockDataFetcher(portfolio=my_portfolio)
 
-    # Fetch historical, financial, and current market data
-    historical_data = data_fetcher.get_historical_data()
+    # Local checkpoints and snapshots are written only when pyarrow is installed
+    pyarrow_installed = importlib.util.find_spec('pyarrow') is not None
+
+    # Fetch only the history the decision pipeline needs, then financial
+    # and current market data. The day's history is kept on disk when Parquet
+    # is available, so reruns on the same day load it instead.
+    checkpoints = CheckpointStore(os.path.join(os.path.dirname(PORTFOLIO_PATH), 'checkpoints')) \
+        if pyarrow_installed else None
+    planner = FetchPlanner.from_analyzers(
+        my_portfolio, [InvestmentDecisionMaker], store=checkpoints
+    )
+    historical_data = planner.load()
     financial_data = data_fetcher.fetch_financials()
     market_dict = data_fetcher.fetch_current_market_data()
 
+    # Align every ticker to one trading calendar, once for the whole run
+    calendar = TradingCalendar(historical_data)
+
     # Process the fetched data through feature engineering
     feature_engineering = FeatureEngineering(market_dict, historical_data, financial_data)
     market_data = feature_engineering.consolidate_info_fields()
 
+    # Add growth, margin and stability factors from the quarterly financials
+    market_data = FundamentalFactors.from_financial_data(financial_data).join(market_data)
+
     # Fill the ETF data using the processed market data
     etf_filler = ETFDataFiller(market_data, data_fetcher)
     etf_filler.fill_all_etfs()
 
+    # Look through ETFs to their constituents when a holdings file is provided
+    holdings_path = os.path.join(os.path.dirname(PORTFOLIO_PATH), 'etf_holdings.csv')
+    etf_holdings = ETFHoldings.from_file(holdings_path) if os.path.exists(holdings_path) else None
+
     # Make investment decisions based on the processed data
-    decision = InvestmentDecisionMaker(historical_data, market_data, my_portfolio, 100)
+    decision = InvestmentDecisionMaker(
+        historical_data, market_data, my_portfolio, 100, calendar=calendar,
+        etf_holdings=etf_holdings
+    )
     money_allocated_per_company = decision.execute_strategy()
 
     # Update the portfolio file 
@@ -34,5 +63,13 @@ def main():
     # Print the results of the investment decision
     print(money_allocated_per_company)
 
+    # Keep the enriched market data, factor contributions, weights and
+    # allocations of this run for downstream jobs
+    if pyarrow_installed:
+        snapshot_store = SnapshotStore(os.path.join(os.path.dirname(PORTFOLIO_PATH), 'snapshots'))
+        snapshot_store.write(
+            decision.snapshot_tables(money_allocated_per_company), metadata={'budget': 100}
+        )
+
 if __name__ == "__main__":
     main()
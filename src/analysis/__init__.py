@@ -2,4 +2,16 @@ from .technical_analysis import TechnicalAnalysis
 from .markov_model import MarkovModel
 from .portfolio_analyzer import PortfolioAnalysisEngine
 from .candlestick_patterns import CandlestickPatterns
-from .support_resistance import SupportResistance
\ No newline at end of file
+from .support_resistance import SupportResistance
+from .parameter_sweep import ParameterSweep
+from .markov_simulation import MarkovPathSimulator
+from .kernels import IndicatorKernels, set_backend, get_backend
+from .risk_engine import RiskEngine
+from .pattern_index import PatternIndex
+from .analog_search import AnalogSearch
+from .signal_calibration import SignalCalibrator
+from .hidden_markov_model import HiddenMarkovModel
+from .volume_profile import VolumeProfile, RollingVolumeProfile
+from .normalization import NormalizationEngine, QuantileSketch
+from .stress_scenarios import StressScenarioEngine
+from .alert_rules import AlertRuleEngine, JsonLinesSink, QueueSink
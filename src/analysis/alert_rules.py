@@ -0,0 +1,267 @@
+import datetime
+import json
+import operator
+import re
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+class JsonLinesSink:
+    """ Appends every alert as one JSON line to a local file. """
+    def __init__(self, path):
+        self.path = path
+
+    def emit(self, alerts):
+        with open(self.path, 'a') as file:
+            for alert in alerts:
+                file.write(json.dumps(alert, default=str) + '\n')
+
+
+class QueueSink:
+    """ Puts every alert on a queue.Queue or multiprocessing queue. """
+    def __init__(self, queue):
+        self.queue = queue
+
+    def emit(self, alerts):
+        for alert in alerts:
+            self.queue.put(alert)
+
+
+class AlertRuleEngine:
+    """
+    Alert rules over the columns AnalysisImplementor writes into market_data,
+    such as "rsi < 30 and currentPrice < lower_bollinger" or
+    "`Morning Star` == 1" restricted to held tickers.
+
+    Rules are compiled once: every distinct comparison across all rules
+    becomes one atom, evaluated as a vectorized column predicate, and the
+    rules become two sparse incidence matrices (clauses by atoms, rules by
+    clauses), so evaluating thousands of rules is two sparse products over
+    the tickers that changed. Alerts are edge-triggered: a (rule, ticker)
+    pair fires when it becomes true and not again until it has been false.
+    """
+    operators = {
+        '<': operator.lt, '<=': operator.le, '>': operator.gt,
+        '>=': operator.ge, '==': operator.eq, '!=': operator.ne,
+    }
+    token_pattern = re.compile(
+        r"\s*(?:(?P<quoted>`[^`]+`)|(?P<number>-?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?)"
+        r"|(?P<operator><=|>=|==|!=|<|>)|(?P<name>[A-Za-z_][A-Za-z0-9_]*))"
+    )
+
+    def __init__(self, rules, sink=None):
+        """
+        :param rules: List of dictionaries with a 'name', a 'when' expression and
+        optionally the 'tickers' the rule is limited to. An expression joins
+        comparisons of a column with a number or another column by 'and' and
+        'or', 'and' binding tighter; names with spaces go in backticks, and a
+        bare column means the column is non-zero.
+        :param sink: Object with an emit(alerts) method, e.g. JsonLinesSink or QueueSink.
+        """
+        self.rules = list(rules)
+        self.sink = sink
+        self.tickers = []
+        self.ticker_index = {}
+        self.active = np.zeros((len(self.rules), 0), dtype=bool)
+        self.compile()
+
+    def parse(self, expression):
+        """
+        Parses an expression into disjunctive normal form.
+        Returns:
+            list: Clauses, each a list of (column, operator, operand) atoms, where
+            the operand is a float or ('column', name)
+        """
+        tokens = []
+        position = 0
+        expression = expression.strip()
+        while position < len(expression):
+            match = self.token_pattern.match(expression, position)
+            if not match or match.end() == position:
+                raise ValueError(f"Cannot parse alert rule at: {expression[position:]!r}")
+            position = match.end()
+            kind = match.lastgroup
+            value = match.group(kind)
+            if kind == 'quoted':
+                kind, value = 'name', value[1:-1]
+            elif kind == 'name' and value in ('and', 'or'):
+                kind = value
+            tokens.append((kind, value))
+        clauses, clause, k = [], [], 0
+        while k < len(tokens):
+            kind, value = tokens[k]
+            if kind != 'name':
+                raise ValueError(f"Expected a column in alert rule {expression!r}, found {value!r}")
+            if k + 1 < len(tokens) and tokens[k + 1][0] == 'operator':
+                if k + 2 >= len(tokens) or tokens[k + 2][0] not in ('number', 'name'):
+                    raise ValueError(f"Missing operand in alert rule {expression!r}")
+                operand_kind, operand = tokens[k + 2]
+                operand = float(operand) if operand_kind == 'number' else ('column', operand)
+                clause.append((value, tokens[k + 1][1], operand))
+                k += 3
+            else:
+                clause.append((value, '!=', 0.0))
+                k += 1
+            if k < len(tokens):
+                joiner = tokens[k][0]
+                if joiner not in ('and', 'or'):
+                    raise ValueError(f"Expected 'and' or 'or' in alert rule {expression!r}")
+                if joiner == 'or':
+                    clauses.append(clause)
+                    clause = []
+                k += 1
+                if k == len(tokens):
+                    raise ValueError(f"Alert rule {expression!r} ends with '{joiner}'")
+        clauses.append(clause)
+        return clauses
+
+    def compile(self):
+        """
+        Deduplicates atoms and clauses across all rules and builds the
+        incidence matrices and the threshold groups the atoms are evaluated in.
+        """
+        atoms, clauses = {}, {}
+        clause_rows, clause_cols, rule_rows, rule_cols = [], [], [], []
+        self.rule_columns = []
+        for r, rule in enumerate(self.rules):
+            columns = set()
+            for clause in self.parse(rule['when']):
+                key = tuple(sorted({atoms.setdefault(atom, len(atoms)) for atom in clause}))
+                if key not in clauses:
+                    clauses[key] = len(clauses)
+                    clause_rows.extend([clauses[key]] * len(key))
+                    clause_cols.extend(key)
+                rule_rows.append(r)
+                rule_cols.append(clauses[key])
+                for column, _, operand in clause:
+                    columns.add(column)
+                    if isinstance(operand, tuple):
+                        columns.add(operand[1])
+            self.rule_columns.append(sorted(columns))
+        self.atoms = list(atoms)
+        self.clause_atoms = sparse.csr_matrix(
+            (np.ones(len(clause_rows)), (clause_rows, clause_cols)),
+            shape=(len(clauses), len(atoms))
+        )
+        self.clause_sizes = np.asarray(self.clause_atoms.sum(axis=1)).ravel()
+        self.rule_clauses = sparse.csr_matrix(
+            (np.ones(len(rule_rows)), (rule_rows, rule_cols)), shape=(len(self.rules), len(clauses))
+        )
+        # Atoms comparing a column with numbers are evaluated together per (column, operator)
+        groups = {}
+        self.column_atoms = []
+        for k, (column, op, operand) in enumerate(self.atoms):
+            if isinstance(operand, tuple):
+                self.column_atoms.append((k, column, op, operand[1]))
+            else:
+                groups.setdefault((column, op), []).append((k, operand))
+        self.threshold_groups = [
+            (column, op, np.array([k for k, _ in entries]), np.array([t for _, t in entries]))
+            for (column, op), entries in groups.items()
+        ]
+        self.columns = sorted({
+            name for column, _, operand in self.atoms
+            for name in ([column, operand[1]] if isinstance(operand, tuple) else [column])
+        })
+        self.scoped = [rule.get('tickers') for rule in self.rules]
+
+    def register(self, tickers):
+        """ Adds unseen tickers to the state, with every rule inactive. """
+        new = [ticker for ticker in dict.fromkeys(tickers) if ticker not in self.ticker_index]
+        if not new:
+            return
+        for ticker in new:
+            self.ticker_index[ticker] = len(self.tickers)
+            self.tickers.append(ticker)
+        self.active = np.concatenate(
+            [self.active, np.zeros((len(self.rules), len(new)), dtype=bool)], axis=1
+        )
+        # Which rules apply to which tickers, all of them unless the rule is scoped
+        scope = np.ones((len(self.rules), len(self.tickers)), dtype=bool)
+        for r, tickers in enumerate(self.scoped):
+            if tickers is not None:
+                scope[r] = False
+                scope[r, [self.ticker_index[t] for t in tickers if t in self.ticker_index]] = True
+        self.scope = scope
+
+    def evaluate_atoms(self, values):
+        """
+        Truth of every atom for every row of a (tickers, columns) frame.
+        Comparisons with missing values are false.
+        Returns:
+            np.ndarray: (atoms, tickers) booleans
+        """
+        result = np.zeros((len(self.atoms), len(values)), dtype=bool)
+        with np.errstate(invalid='ignore'):
+            for column, op, positions, thresholds in self.threshold_groups:
+                column_values = values[column].to_numpy()
+                result[positions] = self.operators[op](
+                    column_values[None, :], thresholds[:, None]
+                ) & ~np.isnan(column_values)[None, :]
+            for k, column, op, other in self.column_atoms:
+                left, right = values[column].to_numpy(), values[other].to_numpy()
+                result[k] = self.operators[op](left, right) & ~np.isnan(left) & ~np.isnan(right)
+        return result
+
+    def evaluate(self, market_data):
+        """
+        Truth of every rule for every ticker of a frame.
+        Returns:
+            np.ndarray: (rules, tickers) booleans
+        """
+        values = market_data.reindex(columns=self.columns).apply(pd.to_numeric, errors='coerce')
+        atoms = self.evaluate_atoms(values.astype(float)).astype(np.float64)
+        clauses = (self.clause_atoms @ atoms) >= self.clause_sizes[:, None]
+        return (self.rule_clauses @ clauses.astype(np.float64)) > 0
+
+    def update(self, market_data, changed=None, timestamp=None, emit=True):
+        """
+        Re-evaluates the rules for the tickers whose data changed and emits
+        the alerts that became true.
+        Args:
+            market_data (pd.DataFrame): Indexed by ticker with the AnalysisImplementor columns
+            changed (iterable, optional): Tickers with new bars, defaults to every row
+            timestamp (datetime, optional): Time stamped on the alerts, defaults to now
+            emit (bool): False only records the state, e.g. on startup so the
+            conditions that already hold do not all fire at once
+        Returns:
+            list: The alerts emitted, one dictionary per newly true (rule, ticker)
+        """
+        tickers = list(market_data.index if changed is None else changed)
+        tickers = [ticker for ticker in dict.fromkeys(tickers) if ticker in market_data.index]
+        self.register(tickers)
+        if not tickers:
+            return []
+        rows = market_data.loc[tickers]
+        positions = np.array([self.ticker_index[ticker] for ticker in tickers])
+        now = self.evaluate(rows) & self.scope[:, positions]
+        fired = now & ~self.active[:, positions]
+        self.active[:, positions] = now
+        if not emit or not fired.any():
+            return []
+        timestamp = timestamp or datetime.datetime.now().isoformat()
+        fired_rules, fired_tickers = np.nonzero(fired)
+        # Values of the fired tickers only, looked up per alert by position
+        fired_rows = np.unique(fired_tickers)
+        values = rows.iloc[fired_rows].reindex(columns=self.columns).to_dict('records')
+        records = dict(zip(fired_rows.tolist(), values))
+        alerts = [{
+            'rule': self.rules[r]['name'],
+            'ticker': tickers[k],
+            'time': timestamp,
+            'values': {column: records[k][column] for column in self.rule_columns[r]},
+        } for r, k in zip(fired_rules.tolist(), fired_tickers.tolist())]
+        if self.sink is not None:
+            self.sink.emit(alerts)
+        return alerts
+
+    def active_alerts(self):
+        """
+        Returns:
+            pd.DataFrame: Rules by tickers, True where the rule currently holds
+        """
+        return pd.DataFrame(
+            self.active, index=[rule['name'] for rule in self.rules], columns=self.tickers
+        )
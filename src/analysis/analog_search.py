@@ -0,0 +1,213 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.fft import irfft, next_fast_len, rfft
+
+
+class AnalogSearch:
+    """
+    Finds the historical windows, across every cached ticker, whose
+    z-normalized shape is closest to a ticker's most recent bars, and reports
+    what happened after each of them. Distances to every window of every
+    ticker come from one FFT cross-correlation (the MASS formulation of the
+    z-normalized Euclidean distance) with window statistics from cumulative
+    sums, so no window is ever compared in a Python loop.
+    """
+    def __init__(self, historical_data, window=20, horizons=(5, 20), column='Close'):
+        """
+        :param historical_data: Dictionary of DataFrames indexed by date for each ticker.
+        :param window: Number of bars compared, L.
+        :param horizons: Bars after each analog for which forward returns are reported.
+        :param column: Price column the windows are taken from.
+        """
+        self.historical_data = historical_data
+        self.window = window
+        self.horizons = tuple(horizons)
+        self.column = column
+        self.tickers = list(historical_data)
+        self.lengths = np.array([len(historical_data[t]) for t in self.tickers], dtype=int)
+        self.rows = int(self.lengths.max()) if len(self.lengths) else 0
+        self.prepare()
+
+    def prepare(self):
+        """
+        Builds the right-aligned (tickers, bars) price panel, the mean and
+        standard deviation of every window, the forward outcomes of every
+        window and the FFT of every series.
+        """
+        self.prices = np.full((len(self.tickers), self.rows), np.nan)
+        for i, ticker in enumerate(self.tickers):
+            values = self.historical_data[ticker][self.column].to_numpy(dtype=float)
+            self.prices[i, self.rows - len(values):] = values
+        observed = ~np.isnan(self.prices)
+        # Distances do not depend on a constant offset, centering each series
+        # keeps the cumulative sums of squares accurate
+        offsets = np.array([
+            np.nanmean(row) if observed[i].any() else 0.0 for i, row in enumerate(self.prices)
+        ])
+        values = np.where(observed, self.prices - offsets[:, None], 0.0)
+        length = self.window
+        windows = max(self.rows - length + 1, 0)
+
+        def window_sums(array):
+            cumulative = np.concatenate(
+                [np.zeros((len(array), 1)), np.cumsum(array, axis=1)], axis=1
+            )
+            return cumulative[:, length:] - cumulative[:, :-length]
+
+        counts = window_sums(observed.astype(float))
+        self.means = window_sums(values) / length
+        variances = np.maximum(window_sums(values ** 2) / length - self.means ** 2, 0.0)
+        self.stds = np.sqrt(variances)
+        # Complete windows that are not flat
+        self.valid = (counts == length) & (self.stds > 1e-8 * np.abs(self.means + offsets[:, None]))
+        self.fft_length = next_fast_len(self.rows + length)
+        self.series_fft = rfft(values, self.fft_length, axis=1)
+        self.forward_outcomes(windows)
+
+    def forward_outcomes(self, windows):
+        """
+        Forward return at every horizon, and over the longest horizon the
+        peak-to-trough drawdown and the maximum adverse excursion (worst
+        price relative to entry), measured from the last bar of every window.
+        """
+        longest = max(self.horizons)
+        first_end = self.window - 1
+        padded = np.concatenate(
+            [self.prices, np.full((len(self.tickers), longest), np.nan)], axis=1
+        )
+        # (tickers, windows, longest + 1) view of the path following each window, no copy
+        paths = sliding_window_view(padded, longest + 1, axis=1)[:, first_end:first_end + windows]
+        entry = paths[..., 0]
+        self.forward_returns = {
+            horizon: paths[..., horizon] / entry - 1 for horizon in self.horizons
+        }
+        self.forward_adverse_excursions = np.fmin.reduce(paths, axis=2) / entry - 1
+        # Running peak one step at a time, so no (tickers, windows, bars) copy is made
+        peak = entry.copy()
+        drawdowns = np.zeros_like(entry)
+        for step in range(1, longest + 1):
+            peak = np.fmax(peak, paths[..., step])
+            drawdowns = np.fmin(drawdowns, paths[..., step] / peak - 1)
+        self.forward_drawdowns = np.where(np.isnan(entry), np.nan, drawdowns)
+        self.has_forward = ~np.isnan(self.forward_returns[longest])
+
+    def query(self, ticker):
+        """ The z-normalized last window of a ticker. """
+        i = self.tickers.index(ticker)
+        values = self.prices[i, -self.window:]
+        if np.isnan(values).any():
+            raise ValueError(f"'{ticker}' has fewer than {self.window} bars")
+        std = values.std()
+        if std == 0:
+            raise ValueError(f"The last {self.window} bars of '{ticker}' are flat")
+        return (values - values.mean()) / std
+
+    def distance_profile(self, query):
+        """
+        Z-normalized Euclidean distance between a z-normalized query and every
+        window of every ticker.
+        Returns:
+            np.ndarray: Distances shaped (tickers, windows), inf for invalid windows
+        """
+        length = self.window
+        query_fft = rfft(query[::-1], self.fft_length)
+        products = irfft(self.series_fft * query_fft, self.fft_length, axis=1)
+        products = products[:, length - 1:self.rows]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            correlation = products / (length * self.stds)
+        distances = np.sqrt(np.maximum(2 * length * (1 - correlation), 0.0))
+        return np.where(self.valid, distances, np.inf)
+
+    def top_matches(self, distances, k):
+        """
+        Best k windows, skipping windows of the same ticker that overlap an
+        already selected match so one episode is reported once.
+        Returns:
+            list: (ticker position, window start) pairs in order of distance
+        """
+        flat = distances.ravel()
+        finite = int(np.isfinite(flat).sum())
+        candidates = min(k * (2 * self.window + 1), finite)
+        if candidates == 0:
+            return []
+        nearest = np.argpartition(flat, candidates - 1)[:candidates]
+        nearest = nearest[np.argsort(flat[nearest], kind='stable')]
+        windows = distances.shape[1]
+        chosen = []
+        for position in nearest:
+            row, start = divmod(int(position), windows)
+            if all(row != r or abs(start - s) >= self.window for r, s in chosen):
+                chosen.append((row, start))
+                if len(chosen) == k:
+                    break
+        return chosen
+
+    def search(self, ticker, k=10, require_forward=True):
+        """
+        Historical analogs of a ticker's last window.
+        Args:
+            ticker (str): Ticker whose recent bars are the query
+            k (int): Number of analogs
+            require_forward (bool): Only consider windows followed by the longest horizon
+        Returns:
+            pd.DataFrame: One row per analog with its ticker, dates, distance,
+            correlation, forward returns, forward peak-to-trough drawdown and
+            maximum adverse excursion
+        """
+        query = self.query(ticker)
+        distances = self.distance_profile(query)
+        i = self.tickers.index(ticker)
+        # Exclude the query's own window and every window overlapping it
+        distances[i, distances.shape[1] - self.window:] = np.inf
+        if require_forward:
+            distances[~self.has_forward] = np.inf
+        rows = []
+        for row, start in self.top_matches(distances, k):
+            other = self.tickers[row]
+            offset = self.rows - self.lengths[row]
+            index = self.historical_data[other].index
+            distance = distances[row, start]
+            analog = {
+                'ticker': other,
+                'start': index[start - offset],
+                'end': index[start - offset + self.window - 1],
+                'distance': distance,
+                'correlation': 1 - distance ** 2 / (2 * self.window),
+            }
+            for horizon in self.horizons:
+                analog[f'return_{horizon}'] = self.forward_returns[horizon][row, start]
+            analog['max_drawdown'] = self.forward_drawdowns[row, start]
+            analog['max_adverse_excursion'] = self.forward_adverse_excursions[row, start]
+            rows.append(analog)
+        return pd.DataFrame(rows)
+
+    def summarize(self, analogs):
+        """
+        Outcome statistics over a set of analogs.
+        Returns:
+            dict: Mean forward return and share of analogs that went up per horizon
+        """
+        summary = {'analogs': len(analogs)}
+        for horizon in self.horizons:
+            returns = analogs[f'return_{horizon}'] if len(analogs) else pd.Series(dtype=float)
+            summary[f'analog_mean_return_{horizon}'] = returns.mean()
+            summary[f'analog_up_probability_{horizon}'] = (returns > 0).mean() \
+                if returns.notna().any() else np.nan
+        return summary
+
+    def search_all(self, k=10, require_forward=True):
+        """
+        Runs the search for every ticker with enough bars, reusing the
+        series FFTs computed once in prepare.
+        Returns:
+            pd.DataFrame: Summary of each ticker's analogs indexed by ticker
+        """
+        summaries = {}
+        for ticker in self.tickers:
+            try:
+                analogs = self.search(ticker, k, require_forward)
+            except ValueError:
+                continue
+            summaries[ticker] = self.summarize(analogs)
+        return pd.DataFrame.from_dict(summaries, orient='index')
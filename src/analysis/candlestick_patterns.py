@@ -5,6 +5,11 @@ import pandas as pd
 class CandlestickPatterns:
     def __init__(self, historical_data) -> None:
         self.data = historical_data
+
+    @classmethod
+    def required_lookback(cls):
+        """ The longest patterns span three bars. """
+        return 3
         
     def identify_doji(self, ticker):
         df = self.data[ticker]
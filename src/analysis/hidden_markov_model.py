@@ -0,0 +1,338 @@
+import numpy as np
+import pandas as pd
+
+from utils import bars_for_years
+
+
+class HiddenMarkovModel:
+    """
+    Gaussian hidden Markov regime model fitted to every ticker at once.
+    Unlike MarkovModel, whose four states come from fixed return thresholds,
+    the regimes here are latent and learned per ticker from two observed
+    features, the daily log return and its rolling volatility, each with a
+    diagonal Gaussian emission. Inference runs forward-backward in log space
+    and fitting runs Baum-Welch, both as batched array operations over a
+    (tickers, bars, states) panel, so the only Python loop is over time.
+    Regimes are ordered by their mean return, state 0 being the weakest.
+    """
+    def __init__(self, historical_data, n_states=3, years=3, volatility_window=10, chunk_size=1000):
+        """
+        :param historical_data: Dictionary of DataFrames indexed by date for each ticker.
+        :param n_states: Number of hidden regimes.
+        :param years: Lookback window in years the model is fitted on.
+        :param volatility_window: Bars of returns behind the rolling volatility feature.
+        :param chunk_size: Tickers fitted together, bounds the memory of the panels.
+        """
+        self.n_states = n_states
+        self.volatility_window = volatility_window
+        self.chunk_size = chunk_size
+        self.tickers = list(historical_data)
+        self.bars = bars_for_years(years)
+        self.prepare(historical_data)
+        self.initial = None
+        self.transitions = None
+        self.means = None
+        self.variances = None
+        self.log_likelihood = np.full(len(self.tickers), np.nan)
+        self.filtered = None
+
+    @classmethod
+    def required_lookback(cls, years=3):
+        """ Daily bars of history the model uses, None meaning all of it. """
+        return bars_for_years(years)
+
+    def prepare(self, historical_data):
+        """
+        Builds the right-aligned (tickers, bars, 2) feature panel and its mask
+        of observed bars. The trailing returns are kept for filtering.
+        """
+        rows = min(max((len(data) for data in historical_data.values()), default=0), self.bars + 1)
+        closes = np.full((len(self.tickers), rows), np.nan)
+        for i, ticker in enumerate(self.tickers):
+            values = historical_data[ticker]['Close'].to_numpy(dtype=float)[-rows:]
+            closes[i, rows - len(values):] = values
+        self.last_close = closes[:, -1].copy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = np.log(closes[:, 1:] / closes[:, :-1])
+        self.recent_returns = returns[:, -self.volatility_window:].copy()
+        self.features = np.stack([returns, self.rolling_volatility(returns)], axis=2)
+        self.observed = np.isfinite(self.features).all(axis=2)
+        self.features[~self.observed] = 0.0
+
+    def rolling_volatility(self, returns):
+        """ Rolling standard deviation of each row, NaN until the window is full. """
+        window = self.volatility_window
+        finite = np.isfinite(returns)
+        values = np.where(finite, returns, 0.0)
+
+        def window_sums(array):
+            cumulative = np.concatenate(
+                [np.zeros((len(array), 1)), np.cumsum(array, axis=1)], axis=1
+            )
+            sums = np.full(array.shape, np.nan)
+            sums[:, window - 1:] = cumulative[:, window:] - cumulative[:, :-window]
+            return sums
+
+        counts = window_sums(finite.astype(float))
+        means = window_sums(values) / window
+        variances = np.maximum(window_sums(values ** 2) / window - means ** 2, 0.0)
+        return np.where(counts == window, np.sqrt(variances * window / (window - 1)), np.nan)
+
+    def initial_parameters(self, features, observed):
+        """
+        Cold start: each ticker's bars are split into volatility quantiles,
+        one per state, whose feature means and variances seed the emissions.
+        """
+        count, _, dims = features.shape
+        k = self.n_states
+        volatility = np.where(observed, features[..., 1], np.nan)
+        edges = np.nanquantile(volatility, np.linspace(0, 1, k + 1), axis=1).T
+        groups = (volatility[..., None] >= edges[:, None, 1:-1]).sum(axis=2)
+        one_hot = (groups[..., None] == np.arange(k)) & observed[..., None]
+        weights = one_hot / np.maximum(one_hot.sum(axis=1, keepdims=True), 1)
+        means = np.einsum('ntk,ntd->nkd', weights, features)
+        variances = np.einsum('ntk,ntd->nkd', weights, features ** 2) - means ** 2
+        initial = np.full((count, k), 1.0 / k)
+        transitions = np.full((count, k, k), 0.1 / max(k - 1, 1))
+        transitions[:, np.arange(k), np.arange(k)] = 0.9 if k > 1 else 1.0
+        return initial, transitions, means, np.maximum(variances, self.variance_floor(features, observed))
+
+    @staticmethod
+    def variance_floor(features, observed):
+        """ Smallest emission variance per ticker and feature, keeps states from collapsing. """
+        counts = np.maximum(observed.sum(axis=1), 1)[:, None]
+        means = (features * observed[..., None]).sum(axis=1) / counts
+        variances = ((features - means[:, None]) ** 2 * observed[..., None]).sum(axis=1) / counts
+        return np.maximum(variances, 1e-12)[:, None, :] * 1e-3
+
+    @staticmethod
+    def log_emissions(features, observed, means, variances):
+        """
+        Log density of every bar under every state, shaped (tickers, bars, states).
+        Unobserved bars have density one so they carry no information.
+        """
+        log_b = -0.5 * (
+            ((features[:, :, None, :] - means[:, None]) ** 2 / variances[:, None]).sum(axis=3)
+            + np.log(2 * np.pi * variances).sum(axis=2)[:, None]
+        )
+        return np.where(observed[..., None], log_b, 0.0)
+
+    @staticmethod
+    def forward(log_b, initial, transitions):
+        """
+        Log-space forward pass. Each step subtracts the running maximum before
+        the product with the transition matrices. The pass runs on a
+        (bars, states, tickers) copy so every step reduces over whole
+        contiguous rows of tickers instead of over short state axes.
+        Returns:
+            tuple: log alphas shaped (bars, states, tickers) and the log likelihoods
+        """
+        log_b = np.ascontiguousarray(log_b.transpose(1, 2, 0))
+        transitions = np.ascontiguousarray(transitions.transpose(1, 2, 0))
+        log_alpha = np.empty_like(log_b)
+        log_alpha[0] = np.log(initial.T) + log_b[0]
+        for t in range(1, len(log_b)):
+            previous = log_alpha[t - 1]
+            peak = previous.max(axis=0)
+            with np.errstate(divide='ignore'):
+                log_alpha[t] = peak + np.log(
+                    (np.exp(previous - peak)[:, None] * transitions).sum(axis=0)
+                ) + log_b[t]
+        last = log_alpha[-1]
+        peak = last.max(axis=0)
+        return log_alpha, peak + np.log(np.exp(last - peak).sum(axis=0))
+
+    @staticmethod
+    def backward(log_b, transitions, log_alpha, log_likelihood):
+        """
+        Log-space backward pass on the same layout as forward. The expected
+        transition counts are one contraction over time afterwards, so the
+        pair posterior of every bar is never materialized.
+        Returns:
+            tuple: state posteriors (tickers, bars, states) and expected transition counts
+        """
+        log_b = np.ascontiguousarray(log_b.transpose(1, 2, 0))
+        matrices = np.ascontiguousarray(transitions.transpose(1, 2, 0))
+        log_beta = np.zeros_like(log_b)
+        for t in range(len(log_b) - 2, -1, -1):
+            following = log_b[t + 1] + log_beta[t + 1]
+            peak = following.max(axis=0)
+            with np.errstate(divide='ignore'):
+                log_beta[t] = peak + np.log(
+                    (matrices * np.exp(following - peak)[None]).sum(axis=1)
+                )
+        # xi_t(i, j) = alpha_t(i) a_ij b_t+1(j) beta_t+1(j) / L, split around the
+        # peak of alpha_t so both factors stay in range
+        peaks = log_alpha[:-1].max(axis=1, keepdims=True)
+        before = np.exp(log_alpha[:-1] - peaks)
+        after = np.exp(log_b[1:] + log_beta[1:] + peaks - log_likelihood)
+        counts = transitions * np.matmul(before.transpose(2, 1, 0), after.transpose(2, 0, 1))
+        posteriors = np.exp(log_alpha + log_beta - log_likelihood)
+        return posteriors.transpose(2, 0, 1), counts
+
+    def maximize(self, features, observed, posteriors, counts, floor):
+        """ Baum-Welch re-estimation of every parameter from the expectations. """
+        initial = np.maximum(posteriors[:, 0], 1e-12)
+        initial /= initial.sum(axis=1, keepdims=True)
+        transitions = np.maximum(counts, 1e-12)
+        transitions /= transitions.sum(axis=2, keepdims=True)
+        weights = posteriors * observed[..., None]
+        totals = np.maximum(weights.sum(axis=1), 1e-12)[..., None]
+        weights = weights.transpose(0, 2, 1)
+        means = np.matmul(weights, features) / totals
+        variances = np.matmul(weights, features ** 2) / totals - means ** 2
+        return initial, transitions, means, np.maximum(variances, floor)
+
+    def fit_chunk(self, rows, warm_start, max_iterations, tolerance):
+        features, observed = self.features[rows], self.observed[rows]
+        floor = self.variance_floor(features, observed)
+        if warm_start:
+            parameters = [
+                self.initial[rows], self.transitions[rows], self.means[rows], self.variances[rows]
+            ]
+        else:
+            parameters = list(self.initial_parameters(features, observed))
+        log_likelihood = np.full(len(rows), -np.inf)
+        active = np.arange(len(rows))
+        for _ in range(max_iterations):
+            if not len(active):
+                break
+            initial, transitions, means, variances = (p[active] for p in parameters)
+            log_b = self.log_emissions(features[active], observed[active], means, variances)
+            log_alpha, current = self.forward(log_b, initial, transitions)
+            posteriors, counts = self.backward(log_b, transitions, log_alpha, current)
+            updated = self.maximize(
+                features[active], observed[active], posteriors, counts, floor[active]
+            )
+            for parameter, values in zip(parameters, updated):
+                parameter[active] = values
+            # Tickers whose likelihood stopped improving leave the batch
+            improvement = current - log_likelihood[active]
+            log_likelihood[active] = current
+            active = active[improvement > tolerance * np.maximum(np.abs(current), 1.0)]
+        return parameters, log_likelihood
+
+    def fit(self, warm_start=False, max_iterations=100, tolerance=1e-6):
+        """
+        Fits every ticker with Baum-Welch, one chunk of tickers at a time.
+        Args:
+            warm_start (bool): Start from the current parameters, e.g. after refresh
+            max_iterations (int): Cap on EM iterations per chunk
+            tolerance (float): Relative likelihood improvement below which a ticker has converged
+        Returns:
+            HiddenMarkovModel: self
+        """
+        warm_start = warm_start and self.means is not None
+        count, k, dims = len(self.tickers), self.n_states, self.features.shape[2]
+        if not warm_start:
+            self.initial = np.empty((count, k))
+            self.transitions = np.empty((count, k, k))
+            self.means = np.empty((count, k, dims))
+            self.variances = np.empty((count, k, dims))
+        for start in range(0, count, self.chunk_size):
+            rows = np.arange(start, min(start + self.chunk_size, count))
+            parameters, log_likelihood = self.fit_chunk(rows, warm_start, max_iterations, tolerance)
+            self.initial[rows], self.transitions[rows], self.means[rows], self.variances[rows] = parameters
+            self.log_likelihood[rows] = log_likelihood
+        self.sort_states()
+        self.filtered = self.filter()
+        return self
+
+    def sort_states(self):
+        """ Reorders every ticker's states by ascending mean return. """
+        order = np.argsort(self.means[..., 0], axis=1)
+        rows = np.arange(len(self.tickers))[:, None]
+        self.initial = self.initial[rows, order]
+        self.transitions = self.transitions[rows[..., None], order[:, :, None], order[:, None, :]]
+        self.means = self.means[rows, order]
+        self.variances = self.variances[rows, order]
+
+    def refresh(self, historical_data, **kwargs):
+        """
+        Rebuilds the panel from newer history and refits starting from the
+        current parameters, which usually converges in a few iterations.
+        Tickers not fitted before start cold.
+        """
+        previous = dict(zip(self.tickers, range(len(self.tickers))))
+        parameters = (self.initial, self.transitions, self.means, self.variances)
+        self.tickers = list(historical_data)
+        self.prepare(historical_data)
+        self.log_likelihood = np.full(len(self.tickers), np.nan)
+        if parameters[0] is None:
+            return self.fit(**kwargs)
+        cold = self.initial_parameters(self.features, self.observed)
+        positions = np.array([previous.get(ticker, -1) for ticker in self.tickers])
+        known = positions >= 0
+        self.initial, self.transitions, self.means, self.variances = (
+            np.where(known.reshape(-1, *[1] * (c.ndim - 1)), p[np.maximum(positions, 0)], c)
+            for p, c in zip(parameters, cold)
+        )
+        return self.fit(warm_start=True, **kwargs)
+
+    def filter(self):
+        """
+        Filtered regime probabilities at the last bar of every ticker, from a
+        forward pass over the panel with the fitted parameters.
+        Returns:
+            np.ndarray: Probabilities shaped (tickers, states)
+        """
+        filtered = np.empty((len(self.tickers), self.n_states))
+        for start in range(0, len(self.tickers), self.chunk_size):
+            rows = slice(start, start + self.chunk_size)
+            log_b = self.log_emissions(
+                self.features[rows], self.observed[rows], self.means[rows], self.variances[rows]
+            )
+            log_alpha, log_likelihood = self.forward(log_b, self.initial[rows], self.transitions[rows])
+            filtered[rows] = np.exp(log_alpha[-1] - log_likelihood).T
+        return filtered
+
+    def filter_step(self, closes):
+        """
+        Advances the filtered regime probabilities by one new bar per ticker
+        without revisiting the history.
+        Args:
+            closes (dict or pd.Series): New close price per ticker, missing tickers skip the bar
+        Returns:
+            pd.DataFrame: Updated regime probabilities indexed by ticker
+        """
+        closes = pd.Series(closes, dtype=float).reindex(self.tickers).to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = np.log(closes / self.last_close)
+        arrived = np.isfinite(returns)
+        self.recent_returns[arrived] = np.concatenate(
+            [self.recent_returns[arrived, 1:], returns[arrived, None]], axis=1
+        )
+        self.last_close[arrived] = closes[arrived]
+        volatility = self.recent_returns.std(axis=1, ddof=1)
+        features = np.stack([returns, volatility], axis=1)[:, None, :]
+        observed = np.isfinite(features).all(axis=2)
+        log_b = self.log_emissions(
+            np.where(observed[..., None], features, 0.0), observed, self.means, self.variances
+        )[:, 0]
+        predicted = np.einsum('ni,nij->nj', self.filtered, self.transitions)
+        posterior = predicted * np.exp(log_b - log_b.max(axis=1, keepdims=True))
+        posterior /= posterior.sum(axis=1, keepdims=True)
+        self.filtered = np.where(arrived[:, None], posterior, self.filtered)
+        return self.regime_probabilities()
+
+    def regime_probabilities(self):
+        """ Filtered probability of each regime at the latest bar, one row per ticker. """
+        return pd.DataFrame(self.filtered, index=self.tickers, columns=range(self.n_states))
+
+    def current_regimes(self):
+        """ Most likely current regime per ticker, 0 being the weakest. """
+        return pd.Series(self.filtered.argmax(axis=1), index=self.tickers, name='regime')
+
+    def predict_next_state(self):
+        """
+        Regime distribution for the next bar, comparable to
+        MarkovModel.predict_next_state but as probabilities.
+        """
+        predicted = np.einsum('ni,nij->nj', self.filtered, self.transitions)
+        return pd.DataFrame(predicted, index=self.tickers, columns=range(self.n_states))
+
+    def expected_return(self):
+        """ Expected log return of the next bar implied by the regime forecast. """
+        return self.predict_next_state().mul(
+            pd.DataFrame(self.means[..., 0], index=self.tickers)
+        ).sum(axis=1)
@@ -0,0 +1,406 @@
+import numpy as np
+import pandas as pd
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+PATTERN_NAMES = [
+    'Doji', 'Hammer', 'Inverted Hammer', 'Shooting Star', 'Spinning Tops',
+    'Engulfing', 'Harami', 'Piercing Line', 'Dark Cloud Cover', 'Morning Star',
+    'Evening Star', 'Three White Soldiers', 'Three Black Crows',
+]
+BACKENDS = ('numpy', 'numba')
+_backend = 'numba' if numba is not None else 'numpy'
+
+
+def set_backend(backend):
+    """
+    Selects the kernel backend used by IndicatorKernels instances that do not
+    choose one themselves.
+    Args:
+        backend (str): 'numba' or 'numpy'
+    """
+    global _backend
+    _backend = _validate_backend(backend)
+
+
+def get_backend():
+    return _backend
+
+
+def _validate_backend(backend):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown kernel backend '{backend}', expected one of {BACKENDS}")
+    if backend == 'numba' and numba is None:
+        raise ImportError("The 'numba' backend requires numba to be installed")
+    return backend
+
+
+def _jit(function):
+    return numba.njit(cache=True)(function) if numba is not None else function
+
+
+def ema_alpha(span):
+    """ Smoothing factor computed the same way as pandas' ewm(span=...). """
+    com = (span - 1) / 2.0
+    return 1.0 / (1.0 + com)
+
+
+# Single-pass loops, compiled with numba. Each column of the panel is one ticker.
+
+@_jit
+def _ema_loop(values, alpha):
+    rows, columns = values.shape
+    output = np.full((rows, columns), np.nan)
+    old_wt_factor = 1.0 - alpha
+    for j in range(columns):
+        weighted = values[0, j]
+        nobs = 0 if np.isnan(weighted) else 1
+        if nobs:
+            output[0, j] = weighted
+        old_wt = 1.0
+        for i in range(1, rows):
+            cur = values[i, j]
+            is_observation = not np.isnan(cur)
+            if is_observation:
+                nobs += 1
+            if not np.isnan(weighted):
+                old_wt *= old_wt_factor
+                if is_observation:
+                    if weighted != cur:
+                        weighted = old_wt * weighted + alpha * cur
+                        weighted /= old_wt + alpha
+                    old_wt = 1.0
+            elif is_observation:
+                weighted = cur
+            if nobs:
+                output[i, j] = weighted
+    return output
+
+
+@_jit
+def _rsi_loop(close, window):
+    rows, columns = close.shape
+    output = np.full((rows, columns), np.nan)
+    gains = np.zeros(rows + 1)
+    losses = np.zeros(rows + 1)
+    for j in range(columns):
+        count = 0
+        for i in range(rows):
+            gain = 0.0
+            loss = 0.0
+            if not np.isnan(close[i, j]):
+                count += 1
+                if i > 0:
+                    delta = close[i, j] - close[i - 1, j]
+                    if delta > 0:
+                        gain = delta
+                    elif delta < 0:
+                        loss = -delta
+            gains[i + 1] = gains[i] + gain
+            losses[i + 1] = losses[i] + loss
+            if count >= window:
+                average_gain = (gains[i + 1] - gains[i + 1 - window]) / window
+                average_loss = (losses[i + 1] - losses[i + 1 - window]) / window
+                if average_loss == 0:
+                    output[i, j] = np.nan if average_gain == 0 else 100.0
+                else:
+                    output[i, j] = 100 - 100 / (1 + average_gain / average_loss)
+    return output
+
+
+@_jit
+def _obv_loop(close, volume):
+    rows, columns = close.shape
+    output = np.zeros((rows, columns))
+    for j in range(columns):
+        total = 0.0
+        for i in range(rows):
+            step = 0.0
+            if i > 0:
+                delta = close[i, j] - close[i - 1, j]
+                if delta > 0:
+                    step = volume[i, j]
+                elif delta < 0:
+                    step = -volume[i, j]
+                if np.isnan(step):
+                    step = 0.0
+            total += step
+            output[i, j] = total
+    return output
+
+
+@_jit
+def _sign(value):
+    if value > 0:
+        return 1.0
+    if value < 0:
+        return -1.0
+    if value == 0:
+        return 0.0
+    return np.nan
+
+
+@_jit
+def _pattern_loop(open_, high, low, close):
+    rows, columns = close.shape
+    output = np.zeros((rows, columns, 13), dtype=np.bool_)
+    for j in range(columns):
+        o2 = c2 = np.nan
+        o1 = h1 = l1 = c1 = np.nan
+        for i in range(rows):
+            o = open_[i, j]
+            h = high[i, j]
+            l = low[i, j]
+            c = close[i, j]
+            body = abs(c - o)
+            total_range = h - l
+            lower_shadow = min(o, c) - l
+            upper_shadow = h - max(o, c)
+            current_body = c - o
+            previous_body = c1 - o1
+            small_middle = abs(c1 - o1) <= (h1 - l1) * 0.1
+            output[i, j, 0] = body <= total_range * 0.1
+            output[i, j, 1] = (body <= total_range * 0.3) and \
+                (lower_shadow >= 2 * body) and (upper_shadow <= body * 0.3)
+            output[i, j, 2] = (body <= total_range * 0.3) and \
+                (upper_shadow >= 2 * body) and (lower_shadow <= body * 0.3)
+            output[i, j, 3] = (body <= total_range * 0.3) and \
+                (upper_shadow >= 2 * body) and (lower_shadow <= body * 0.1)
+            output[i, j, 4] = (body <= total_range * 0.1) and \
+                (upper_shadow >= body) and (lower_shadow >= body)
+            output[i, j, 5] = (abs(current_body) > abs(previous_body)) and \
+                (_sign(current_body) != _sign(previous_body))
+            output[i, j, 6] = (abs(current_body) < abs(previous_body)) and \
+                (_sign(current_body) != _sign(previous_body))
+            output[i, j, 7] = (o < c1) and (c > o1 + (c1 - o1) / 2)
+            output[i, j, 8] = (o > c1) and (c < o1 + (c1 - o1) / 2)
+            output[i, j, 9] = (c2 > o2) and small_middle and (o < c1) and (c > o2)
+            output[i, j, 10] = (c2 < o2) and small_middle and (o > c1) and (c < o2)
+            output[i, j, 11] = (c2 > o2) and (c1 > o1) and (c > o) and \
+                (c2 < c1) and (c1 < c)
+            output[i, j, 12] = (c2 < o2) and (c1 < o1) and (c < o) and \
+                (c2 > c1) and (c1 > c)
+            o2, c2 = o1, c1
+            o1, h1, l1, c1 = o, h, l, c
+    return output
+
+
+# Pure NumPy equivalents, looping over time at most and vectorized across tickers.
+
+def _ema_numpy(values, alpha):
+    output = np.full(values.shape, np.nan)
+    old_wt_factor = 1.0 - alpha
+    weighted = values[0].copy()
+    observed = ~np.isnan(weighted)
+    output[0] = np.where(observed, weighted, np.nan)
+    old_wt = np.ones(values.shape[1])
+    for i in range(1, values.shape[0]):
+        cur = values[i]
+        is_observation = ~np.isnan(cur)
+        observed |= is_observation
+        started = ~np.isnan(weighted)
+        old_wt = np.where(started, old_wt * old_wt_factor, old_wt)
+        update = started & is_observation & (weighted != cur)
+        with np.errstate(invalid='ignore'):
+            blended = (old_wt * weighted + alpha * cur) / (old_wt + alpha)
+        weighted = np.where(update, blended, weighted)
+        old_wt = np.where(started & is_observation, 1.0, old_wt)
+        weighted = np.where(~started & is_observation, cur, weighted)
+        output[i] = np.where(observed, weighted, np.nan)
+    return output
+
+
+def _shift(values, periods):
+    shifted = np.full(values.shape, np.nan)
+    shifted[periods:] = values[:-periods]
+    return shifted
+
+
+def _rsi_numpy(close, window):
+    valid = ~np.isnan(close)
+    delta = close - _shift(close, 1)
+    gains = np.where(delta > 0, delta, 0.0)
+    losses = np.where(delta < 0, -delta, 0.0)
+    zeros = np.zeros((1, close.shape[1]))
+    gains = np.vstack([zeros, np.cumsum(gains, axis=0)])
+    losses = np.vstack([zeros, np.cumsum(losses, axis=0)])
+    count = np.cumsum(valid, axis=0)
+    average_gain = np.full(close.shape, np.nan)
+    average_loss = np.full(close.shape, np.nan)
+    average_gain[window - 1:] = (gains[window:] - gains[:-window]) / window
+    average_loss[window - 1:] = (losses[window:] - losses[:-window]) / window
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100 - 100 / (1 + average_gain / average_loss)
+    rsi = np.where(average_loss == 0, np.where(average_gain == 0, np.nan, 100.0), rsi)
+    return np.where(count >= window, rsi, np.nan)
+
+
+def _obv_numpy(close, volume):
+    steps = np.sign(close - _shift(close, 1)) * volume
+    return np.cumsum(np.nan_to_num(steps, nan=0.0), axis=0)
+
+
+def _pattern_numpy(open_, high, low, close):
+    with np.errstate(invalid='ignore'):
+        o1, h1, l1, c1 = (_shift(x, 1) for x in (open_, high, low, close))
+        o2, c2 = _shift(open_, 2), _shift(close, 2)
+        body = np.abs(close - open_)
+        total_range = high - low
+        lower_shadow = np.minimum(open_, close) - low
+        upper_shadow = high - np.maximum(open_, close)
+        current_body = close - open_
+        previous_body = c1 - o1
+        small_middle = np.abs(c1 - o1) <= (h1 - l1) * 0.1
+        patterns = [
+            body <= total_range * 0.1,
+            (body <= total_range * 0.3) & (lower_shadow >= 2 * body) & \
+                (upper_shadow <= body * 0.3),
+            (body <= total_range * 0.3) & (upper_shadow >= 2 * body) & \
+                (lower_shadow <= body * 0.3),
+            (body <= total_range * 0.3) & (upper_shadow >= 2 * body) & \
+                (lower_shadow <= body * 0.1),
+            (body <= total_range * 0.1) & (upper_shadow >= body) & (lower_shadow >= body),
+            (np.abs(current_body) > np.abs(previous_body)) & \
+                (np.sign(current_body) != np.sign(previous_body)),
+            (np.abs(current_body) < np.abs(previous_body)) & \
+                (np.sign(current_body) != np.sign(previous_body)),
+            (open_ < c1) & (close > o1 + (c1 - o1) / 2),
+            (open_ > c1) & (close < o1 + (c1 - o1) / 2),
+            (c2 > o2) & small_middle & (open_ < c1) & (close > o2),
+            (c2 < o2) & small_middle & (open_ > c1) & (close < o2),
+            (c2 > o2) & (c1 > o1) & (close > open_) & (c2 < c1) & (c1 < close),
+            (c2 < o2) & (c1 < o1) & (close < open_) & (c2 > c1) & (c1 > close),
+        ]
+    return np.stack(patterns, axis=-1)
+
+
+_KERNELS = {
+    'numba': {
+        'ema': _ema_loop, 'rsi': _rsi_loop, 'obv': _obv_loop, 'patterns': _pattern_loop,
+    },
+    'numpy': {
+        'ema': _ema_numpy, 'rsi': _rsi_numpy, 'obv': _obv_numpy, 'patterns': _pattern_numpy,
+    },
+}
+
+
+class IndicatorKernels:
+    """
+    Computes recursive indicators and candlestick predicates for every ticker
+    in one pass over a price panel, instead of building several temporary
+    Series per ticker. Each ticker's bars are aligned to the end of the panel
+    by position, so shifts and recursions never cross a gap.
+    """
+    def __init__(self, historical_data, backend=None):
+        """
+        :param historical_data: Dictionary of DataFrames with OHLCV columns for each ticker.
+        :param backend: 'numba' or 'numpy', defaults to the module-wide backend.
+        """
+        self.historical_data = historical_data
+        self.backend = _validate_backend(backend or get_backend())
+        self.kernels = _KERNELS[self.backend]
+        self.tickers = list(historical_data)
+        self.lengths = np.array([len(historical_data[t]) for t in self.tickers], dtype=int)
+        self.rows = int(self.lengths.max()) if len(self.lengths) else 0
+        self.panels = {}
+
+    def panel(self, column):
+        """ Right-aligned (bars, tickers) array for one OHLCV column. """
+        if column not in self.panels:
+            panel = np.full((self.rows, len(self.tickers)), np.nan)
+            for j, ticker in enumerate(self.tickers):
+                values = self.historical_data[ticker][column].to_numpy(dtype=float)
+                panel[self.rows - len(values):, j] = values
+            self.panels[column] = panel
+        return self.panels[column]
+
+    def to_series(self, panel, name=None):
+        """ Splits a panel back into one Series per ticker on its own index. """
+        return {
+            ticker: pd.Series(
+                panel[self.rows - length:, j], index=self.historical_data[ticker].index,
+                name=name
+            ) for j, (ticker, length) in enumerate(zip(self.tickers, self.lengths))
+        }
+
+    def ema(self, span, values=None):
+        values = self.panel('Close') if values is None else values
+        return self.kernels['ema'](np.ascontiguousarray(values), ema_alpha(span))
+
+    def macd(self, fast=12, slow=26, signal=9):
+        macd = self.ema(fast) - self.ema(slow)
+        return macd, self.ema(signal, macd)
+
+    def rsi(self, window=14):
+        return self.kernels['rsi'](self.panel('Close'), window)
+
+    def obv(self):
+        return self.kernels['obv'](self.panel('Close'), self.panel('Volume'))
+
+    def patterns(self):
+        """
+        Returns:
+            np.ndarray: Boolean array shaped (bars, tickers, patterns), in PATTERN_NAMES order
+        """
+        return self.kernels['patterns'](
+            self.panel('Open'), self.panel('High'), self.panel('Low'), self.panel('Close')
+        )
+
+    def find_patterns(self):
+        """ Same output as CandlestickPatterns.find_patterns. """
+        patterns = self.patterns()
+        return {
+            ticker: pd.DataFrame(
+                patterns[self.rows - length:, j], index=self.historical_data[ticker].index,
+                columns=PATTERN_NAMES
+            ) for j, (ticker, length) in enumerate(zip(self.tickers, self.lengths))
+        }
+
+    def compare_with_reference(self, technical_analysis, candlestick_patterns):
+        """
+        Checks the kernels against the pandas implementations they replace.
+        Args:
+            technical_analysis (TechnicalAnalysis): Built on the same historical data
+            candlestick_patterns (CandlestickPatterns): Built on the same historical data
+        Returns:
+            dict: Largest absolute difference per indicator, and the number of
+            mismatching pattern flags
+        """
+        macd, macd_signal = self.macd()
+        computed = {
+            'macd': self.to_series(macd),
+            'macd_signal': self.to_series(macd_signal),
+            'rsi': self.to_series(self.rsi()),
+            'obv': self.to_series(self.obv()),
+        }
+        emas = {}
+        differences = {}
+        for ticker in self.tickers:
+            window = technical_analysis.windows[ticker]
+            if window not in emas:
+                emas[window] = self.to_series(self.ema(window))
+            reference_macd, reference_signal = technical_analysis.calculate_macd(ticker)
+            reference = {
+                'ema': (emas[window], technical_analysis.calculate_ema(ticker)),
+                'macd': (computed['macd'], reference_macd),
+                'macd_signal': (computed['macd_signal'], reference_signal),
+                'rsi': (computed['rsi'], technical_analysis.calculate_rsi(ticker)),
+                'obv': (computed['obv'], technical_analysis.calculate_obv(ticker)[0]),
+            }
+            for name, (series, expected) in reference.items():
+                values = series[ticker].values
+                if (np.isnan(values) != np.isnan(expected.values)).any():
+                    difference = np.inf
+                else:
+                    difference = np.nanmax(np.abs(values - expected.values), initial=0.0)
+                differences[name] = max(differences.get(name, 0.0), difference)
+        reference_patterns = candlestick_patterns.find_patterns()
+        differences['patterns'] = sum(
+            int((frame.values != reference_patterns[ticker][PATTERN_NAMES].values).sum())
+            for ticker, frame in self.find_patterns().items()
+        )
+        return differences
@@ -1,6 +1,8 @@
 import pandas as pd
 import numpy as np
 
+from utils import bars_for_years
+
 
 class MarkovModel:
     """
@@ -8,12 +10,23 @@ class MarkovModel:
     that future states depend on the current state and not the sequence
     of events preceeding it
     """
-    def __init__(self, data, years=3) -> None:
+    def __init__(self, data, years=3, offset=None) -> None:
+        """
+        :param data: DataFrame of a single ticker's history.
+        :param years: Lookback window in years, used when no offset is given.
+        :param offset: Row offset where the lookback window starts, as given by TradingCalendar.
+        """
         self.original_data = data
-        self.historical_data = self.limit_data_to_recent_years(data, years)
+        self.historical_data = data.iloc[offset:] if offset is not None \
+            else self.limit_data_to_recent_years(data, years)
         self.thresholds = {}
         self.states = {}
         self.transition_matrices = {}
+
+    @classmethod
+    def required_lookback(cls, years=3):
+        """ Daily bars of history the model uses, None meaning all of it. """
+        return bars_for_years(years)
     
     def limit_data_to_recent_years(self, data, years):
         """ Limit data to the most recent years specified. """
@@ -62,15 +75,18 @@ class MarkovModel:
         self.transition_matrices = transition_matrix
         return self.transition_matrices
 
-    def predict_next_state(self):
+    def predict_next_state(self, random_state=None):
         """
         Uses the transition matrix to predict the next state 
         based on the current state’s probabilities.
+        Args:
+            random_state (int or np.random.Generator, optional): Seed for a reproducible draw
         """
         transition_matrix = self.markov_chain_transition_matrix()
         current_state = self.states.iloc[-1]
         next_state_probabilities = transition_matrix.loc[current_state]
-        next_state = np.random.choice(
+        rng = np.random.default_rng(random_state)
+        next_state = rng.choice(
             next_state_probabilities.index, p=next_state_probabilities.values
         )
         return next_state
@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+
+
+class MarkovPathSimulator:
+    """
+    Simulates many forward paths of Markov regimes and returns for every
+    ticker at once. Regimes are drawn by inverse-CDF sampling from each
+    ticker's transition matrix. Returns are bootstrapped from the daily
+    changes historically observed in the drawn regime. A seeded Generator
+    makes every run reproducible.
+    """
+    n_states = 4
+    up_states = (2, 3)
+
+    def __init__(self, markov_models, seed=None):
+        """
+        :param markov_models: Dictionary of MarkovModel instances keyed by ticker.
+        :param seed: Seed or np.random.Generator used for every draw.
+        """
+        self.tickers = list(markov_models)
+        self.rng = np.random.default_rng(seed)
+        self.prepare(markov_models)
+
+    def prepare(self, markov_models):
+        """
+        Stacks the transition matrices, current states and per-regime return
+        pools of every ticker into padded arrays.
+        """
+        count = len(self.tickers)
+        states = range(self.n_states)
+        self.transitions = np.zeros((count, self.n_states, self.n_states))
+        self.current_states = np.zeros(count, dtype=np.int64)
+        pools = []
+        for i, ticker in enumerate(self.tickers):
+            model = markov_models[ticker]
+            matrix = model.markov_chain_transition_matrix().reindex(
+                index=states, columns=states, fill_value=0
+            ).fillna(0).to_numpy(dtype=float, copy=True)
+            # Regimes that were never left behind stay where they are
+            unseen = matrix.sum(axis=1) == 0
+            matrix[unseen, np.flatnonzero(unseen)] = 1
+            self.transitions[i] = matrix / matrix.sum(axis=1, keepdims=True)
+            self.current_states[i] = model.states.iloc[-1]
+            returns = model.historical_data['Close'].pct_change().reindex(model.states.index)
+            pools.append([returns[model.states == state].values for state in states])
+        self.pool_sizes = np.array(
+            [[len(pool) for pool in ticker_pools] for ticker_pools in pools], dtype=np.int64
+        ).reshape(count, self.n_states)
+        width = max(int(self.pool_sizes.max(initial=0)), 1)
+        self.return_pools = np.zeros((count, self.n_states, width))
+        for i, ticker_pools in enumerate(pools):
+            for state, pool in enumerate(ticker_pools):
+                self.return_pools[i, state, :len(pool)] = pool
+        self.cumulative = np.cumsum(self.transitions, axis=2)
+        self.cumulative[..., -1] = 1.0
+
+    def simulate(self, n_paths=1000, horizon=20, tickers=None):
+        """
+        Generates regime and return paths.
+        Args:
+            n_paths (int): Paths per ticker
+            horizon (int): Steps per path
+            tickers (array-like, optional): Positions of the tickers to simulate
+        Returns:
+            tuple: states shaped (tickers, paths, horizon) and the matching returns
+        """
+        tickers = np.arange(len(self.tickers)) if tickers is None else np.asarray(tickers)
+        rows = tickers[:, None]
+        current = np.broadcast_to(self.current_states[tickers, None], (len(tickers), n_paths))
+        states = np.empty((len(tickers), n_paths, horizon), dtype=np.int8)
+        returns = np.empty((len(tickers), n_paths, horizon))
+        for step in range(horizon):
+            draws = self.rng.random((len(tickers), n_paths, 1))
+            cdf = self.cumulative[rows, current]
+            current = np.minimum((draws >= cdf).sum(axis=2), self.n_states - 1)
+            sizes = self.pool_sizes[rows, current]
+            picks = (self.rng.random(sizes.shape) * sizes).astype(np.int64)
+            states[..., step] = current
+            returns[..., step] = np.where(
+                sizes > 0, self.return_pools[rows, current, np.minimum(picks, sizes - 1)], 0.0
+            )
+        return states, returns
+
+    def next_up_probabilities(self, tickers=None):
+        """
+        Exact probability that the next regime is an up regime: the sum of the
+        up-state entries of each ticker's transition row for its current
+        regime. Deterministic, unlike a sample of the first simulated step.
+        """
+        tickers = np.arange(len(self.tickers)) if tickers is None else np.asarray(tickers)
+        rows = self.transitions[tickers, self.current_states[tickers]]
+        return rows[:, list(self.up_states)].sum(axis=1)
+
+    def summarize(
+        self, n_paths=1000, horizon=20, quantiles=(0.05, 0.5, 0.95), chunk_size=500
+    ):
+        """
+        Distribution summaries per ticker, simulated chunk by chunk to bound memory.
+        The next-step up probability is computed in closed form, only the
+        multi-step statistics come from the simulated paths.
+        Returns:
+            pd.DataFrame: Probability of an up regime on the next step and over
+            the horizon, expected and quantile cumulative returns and the
+            probability of a loss over the horizon
+        """
+        summaries = []
+        for start in range(0, len(self.tickers), chunk_size):
+            tickers = np.arange(start, min(start + chunk_size, len(self.tickers)))
+            states, returns = self.simulate(n_paths, horizon, tickers)
+            up = np.isin(states, self.up_states)
+            cumulative = np.prod(1 + returns, axis=2) - 1
+            summary = pd.DataFrame({
+                'next_up_probability': self.next_up_probabilities(tickers),
+                'up_probability': up.mean(axis=(1, 2)),
+                'expected_return': cumulative.mean(axis=1),
+                'loss_probability': (cumulative < 0).mean(axis=1),
+            }, index=[self.tickers[i] for i in tickers])
+            for q, values in zip(quantiles, np.quantile(cumulative, quantiles, axis=1)):
+                summary[f'return_q{int(round(q * 100)):02d}'] = values
+            summaries.append(summary)
+        if not summaries:
+            return pd.DataFrame()
+        return pd.concat(summaries)
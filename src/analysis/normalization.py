@@ -0,0 +1,244 @@
+import numpy as np
+import pandas as pd
+from scipy.special import ndtr
+
+
+class QuantileSketch:
+    """
+    Mergeable summary of the distribution of every column of a metric
+    matrix. Each column keeps at most `size` weighted points: a chunk of rows
+    is added by merging its values with the points, and the result is
+    compressed back to `size` points at evenly spaced cumulative weights.
+    Two sketches built on different chunks or processes merge the same way,
+    so a universe can be normalized consistently without holding every row.
+    Exact minima, maxima and counts are kept alongside.
+    """
+    def __init__(self, columns, size=512):
+        """
+        :param columns: Names of the summarized columns.
+        :param size: Points kept per column, the rank error is about 1 / size per merge level.
+        """
+        self.columns = list(columns)
+        self.size = size
+        self.points = {column: np.empty(0) for column in self.columns}
+        self.weights = {column: np.empty(0) for column in self.columns}
+        self.minimum = pd.Series(np.inf, index=self.columns)
+        self.maximum = pd.Series(-np.inf, index=self.columns)
+        self.count = pd.Series(0, index=self.columns, dtype=np.int64)
+
+    @classmethod
+    def from_frame(cls, frame, size=512):
+        return cls(frame.columns, size).update(frame)
+
+    def compress(self, points, weights):
+        """ Reduces weighted points to at most `size` points carrying equal weight. """
+        order = np.argsort(points, kind='stable')
+        points, weights = points[order], weights[order]
+        if len(points) <= self.size:
+            return points, weights
+        cumulative = np.cumsum(weights)
+        total = cumulative[-1]
+        targets = (np.arange(self.size) + 0.5) * total / self.size
+        positions = np.minimum(np.searchsorted(cumulative, targets), len(points) - 1)
+        return points[positions], np.full(self.size, total / self.size)
+
+    def update(self, frame):
+        """
+        Adds a chunk of rows. NaNs are ignored column by column.
+        Returns:
+            QuantileSketch: self
+        """
+        values = frame.reindex(columns=self.columns).to_numpy(dtype=float)
+        finite = np.isfinite(values)
+        with np.errstate(invalid='ignore'):
+            self.minimum = np.fmin(self.minimum, pd.Series(
+                np.where(finite, values, np.inf).min(axis=0, initial=np.inf), index=self.columns
+            ))
+            self.maximum = np.fmax(self.maximum, pd.Series(
+                np.where(finite, values, -np.inf).max(axis=0, initial=-np.inf), index=self.columns
+            ))
+        self.count += finite.sum(axis=0)
+        for k, column in enumerate(self.columns):
+            column_values = values[finite[:, k], k]
+            self.points[column], self.weights[column] = self.compress(
+                np.concatenate([self.points[column], column_values]),
+                np.concatenate([self.weights[column], np.ones(len(column_values))]),
+            )
+        return self
+
+    def merge(self, other):
+        """
+        Combines two sketches of the same columns into a new one.
+        Returns:
+            QuantileSketch: Summary of the rows seen by either sketch
+        """
+        merged = QuantileSketch(self.columns, min(self.size, other.size))
+        for column in self.columns:
+            merged.points[column], merged.weights[column] = merged.compress(
+                np.concatenate([self.points[column], other.points[column]]),
+                np.concatenate([self.weights[column], other.weights[column]]),
+            )
+        merged.minimum = np.fmin(self.minimum, other.minimum)
+        merged.maximum = np.fmax(self.maximum, other.maximum)
+        merged.count = self.count + other.count
+        return merged
+
+    def quantiles(self, probabilities):
+        """
+        Approximate quantiles of every column.
+        Returns:
+            pd.DataFrame: One row per probability, one column per summarized column
+        """
+        probabilities = np.atleast_1d(np.asarray(probabilities, dtype=float))
+        table = {}
+        for column in self.columns:
+            points, weights = self.points[column], self.weights[column]
+            if not len(points):
+                table[column] = np.full(len(probabilities), np.nan)
+                continue
+            # Each point sits at the middle of the weight it carries
+            ranks = (np.cumsum(weights) - weights / 2) / weights.sum()
+            table[column] = np.interp(probabilities, ranks, points)
+        return pd.DataFrame(table, index=probabilities)
+
+    def cdf(self, frame):
+        """
+        Approximate share of the summarized rows below each value of a frame,
+        NaN where the value is missing.
+        """
+        result = pd.DataFrame(np.nan, index=frame.index, columns=self.columns)
+        for column in self.columns:
+            points, weights = self.points[column], self.weights[column]
+            if not len(points) or column not in frame:
+                continue
+            values = frame[column].to_numpy(dtype=float)
+            if points[0] == points[-1]:
+                result[column] = np.where(np.isfinite(values), 0.5, np.nan)
+                continue
+            ranks = (np.cumsum(weights) - weights / 2) / weights.sum()
+            # The exact extremes pin both ends of the curve
+            curve_points = np.r_[self.minimum[column], points, self.maximum[column]]
+            curve_ranks = np.r_[0.0, ranks, 1.0]
+            result[column] = np.where(
+                np.isfinite(values), np.interp(values, curve_points, curve_ranks), np.nan
+            )
+        return result
+
+
+class NormalizationEngine:
+    """
+    Scales a whole metric matrix to [0, 1] in one vectorized pass, every
+    column at once. Missing values stay missing and never distort the other
+    rows, a column whose values are all equal maps to 0.5, and 'low' metrics
+    are flipped so higher is always better.
+    Modes:
+        'minmax': linear between the column minimum and maximum
+        'rank': percentile rank, robust to any outlier
+        'zscore': z-score of the values winsorized at the given quantiles,
+        mapped through the normal CDF
+        'sketch': percentile within the distribution held by a QuantileSketch,
+        so chunks of a universe are scaled against the same reference
+    """
+    modes = ('minmax', 'rank', 'zscore', 'sketch')
+
+    def __init__(self, mode='minmax', limits=(0.01, 0.99), sketch=None):
+        """
+        :param mode: One of NormalizationEngine.modes.
+        :param limits: Lower and upper quantiles the z-score mode winsorizes at.
+        :param sketch: QuantileSketch used by the 'sketch' mode, and by the other
+        modes to take minima, maxima and quantiles from instead of the frame for
+        the columns it holds.
+        """
+        if mode not in self.modes:
+            raise ValueError(f"Unknown normalization mode '{mode}', expected one of {self.modes}")
+        if mode == 'sketch' and sketch is None:
+            raise ValueError("The 'sketch' mode needs a QuantileSketch")
+        self.mode = mode
+        self.limits = limits
+        self.sketch = sketch
+
+    @staticmethod
+    def to_matrix(frame):
+        return frame.apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+
+    def sketched(self, statistic, columns, local):
+        """ Statistic of the sketch for the columns it holds, the local one for the others. """
+        if self.sketch is None:
+            return local
+        reference = statistic.reindex(columns=columns).to_numpy(dtype=float) \
+            if isinstance(statistic, pd.DataFrame) \
+            else statistic.reindex(columns).to_numpy(dtype=float)
+        return np.where(np.isfinite(reference), reference, local)
+
+    def minmax(self, values, columns):
+        low = np.fmin.reduce(values, axis=0, initial=np.inf)
+        high = np.fmax.reduce(values, axis=0, initial=-np.inf)
+        if self.sketch is not None:
+            low = self.sketched(self.sketch.minimum, columns, low)
+            high = self.sketched(self.sketch.maximum, columns, high)
+        spread = high - low
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scaled = np.clip((values - low) / spread, 0.0, 1.0)
+        return np.where(spread > 0, scaled, 0.5)
+
+    @staticmethod
+    def rank(values):
+        frame = pd.DataFrame(values)
+        ranks = frame.rank(method='average').to_numpy()
+        counts = frame.notna().sum().to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scaled = (ranks - 1) / (counts - 1)
+        return np.where(counts > 1, scaled, 0.5)
+
+    def zscore(self, values, columns):
+        finite_columns = np.isfinite(values).any(axis=0)
+        bounds = np.full((2, values.shape[1]), np.nan)
+        bounds[:, finite_columns] = np.nanquantile(values[:, finite_columns], self.limits, axis=0)
+        if self.sketch is not None:
+            bounds = self.sketched(self.sketch.quantiles(self.limits), columns, bounds)
+        clipped = np.clip(values, bounds[0], bounds[1])
+        with np.errstate(invalid='ignore'):
+            mean = np.nanmean(clipped, axis=0) if len(values) else np.full(values.shape[1], np.nan)
+            std = np.nanstd(clipped, axis=0) if len(values) else np.full(values.shape[1], np.nan)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scaled = ndtr((clipped - mean) / std)
+        return np.where(std > 0, scaled, 0.5)
+
+    def normalize(self, frame, directions=None):
+        """
+        Scales every column of a frame to [0, 1].
+        Args:
+            frame (pd.DataFrame): Metric matrix, one row per ticker
+            directions (dict, optional): {column: 'high' or 'low'}, 'low' columns
+            are flipped. Columns without a direction count as 'high'.
+        Returns:
+            pd.DataFrame: Scaled frame with the same index and columns
+        """
+        columns = list(frame.columns)
+        values = self.to_matrix(frame)
+        with np.errstate(invalid='ignore'):
+            if self.mode == 'minmax':
+                scaled = self.minmax(values, columns)
+            elif self.mode == 'rank':
+                scaled = self.rank(values)
+            elif self.mode == 'zscore':
+                scaled = self.zscore(values, columns)
+            else:
+                # Columns the sketch does not hold fall back to their rank
+                scaled = np.where(
+                    np.isin(columns, self.sketch.columns),
+                    self.sketch.cdf(pd.DataFrame(values, columns=columns)).reindex(
+                        columns=columns
+                    ).to_numpy(),
+                    self.rank(values)
+                )
+        scaled = np.where(np.isnan(values), np.nan, scaled)
+        if directions:
+            low = np.array([directions.get(column) == 'low' for column in columns])
+            scaled[:, low] = 1 - scaled[:, low]
+        return pd.DataFrame(scaled, index=frame.index, columns=columns)
+
+    def normalize_series(self, series, direction='high'):
+        """ Scales a single metric, see normalize. """
+        frame = series.to_frame()
+        return self.normalize(frame, {frame.columns[0]: direction}).iloc[:, 0]
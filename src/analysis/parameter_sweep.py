@@ -0,0 +1,192 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+
+class ParameterSweep:
+    """
+    Evaluates a grid of indicator windows and strategy thresholds over the
+    whole price panel in one pass. Prefix sums of prices, squared prices and
+    daily gains/losses are built once, so every rolling mean or standard
+    deviation window afterwards costs O(1) per bar and ticker.
+    """
+    default_grid = {
+        'rsi_window': [14], 'rsi_lower': [30], 'rsi_upper': [70],
+        'macd_fast': [12], 'macd_slow': [26], 'macd_signal': [9],
+        'bollinger_window': [20], 'sma_window': [25, 50],
+        'adjustment': [0.05], 'minimum_allocation': [5],
+    }
+
+    def __init__(self, historical_data, horizon=5, budget=100):
+        """
+        :param historical_data: Dictionary of DataFrames containing 'Close' prices for each ticker.
+        :param horizon: Number of bars ahead used to score the signals.
+        :param budget: Budget used to check how many tickers clear the minimum allocation.
+        """
+        closes = pd.concat(
+            {ticker: data['Close'] for ticker, data in historical_data.items()}, axis=1
+        ).sort_index()
+        self.tickers = list(closes.columns)
+        self.dates = closes.index
+        self.close = closes.values.astype(float)
+        self.horizon = horizon
+        self.budget = budget
+        valid = ~np.isnan(self.close)
+        # Shifting every column by its first price keeps the sums of squares well conditioned
+        first_valid = np.argmax(valid, axis=0)
+        self.offset = self.close[first_valid, np.arange(self.close.shape[1])]
+        centered = np.where(valid, self.close - self.offset, 0.0)
+        delta = np.diff(self.close, axis=0, prepend=np.nan)
+        gains = np.where(delta > 0, delta, 0.0)
+        losses = np.where(delta < 0, -delta, 0.0)
+        self.prefix_count = self.prefix_sum_of(valid.astype(float))
+        self.prefix_sum = self.prefix_sum_of(centered)
+        self.prefix_squares = self.prefix_sum_of(centered ** 2)
+        self.prefix_gains = self.prefix_sum_of(np.where(valid, gains, 0.0))
+        self.prefix_losses = self.prefix_sum_of(np.where(valid, losses, 0.0))
+        self.forward_returns = np.full_like(self.close, np.nan)
+        self.forward_returns[:-horizon] = self.close[horizon:] / self.close[:-horizon] - 1
+        self._cache = {}
+
+    @staticmethod
+    def prefix_sum_of(values):
+        """ Cumulative sum along time with a leading row of zeros. """
+        return np.vstack([np.zeros((1, values.shape[1])), np.cumsum(values, axis=0)])
+
+    @staticmethod
+    def window_sum(prefix, window):
+        """
+        Sum over the trailing window for every bar, NaN while the window is incomplete.
+        """
+        sums = np.full((prefix.shape[0] - 1, prefix.shape[1]), np.nan)
+        sums[window - 1:] = prefix[window:] - prefix[:-window]
+        return sums
+
+    def _cached(self, key, compute):
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    def _full_window(self, window):
+        return self.window_sum(self.prefix_count, window) == window
+
+    def rolling_mean(self, window):
+        """ Rolling mean of Close, matching Series.rolling(window).mean(). """
+        def compute():
+            sums = self.window_sum(self.prefix_sum, window)
+            return np.where(self._full_window(window), sums / window + self.offset, np.nan)
+        return self._cached(('mean', window), compute)
+
+    def rolling_std(self, window):
+        """ Rolling sample standard deviation of Close. """
+        def compute():
+            sums = self.window_sum(self.prefix_sum, window)
+            squares = self.window_sum(self.prefix_squares, window)
+            variance = np.maximum(squares - sums ** 2 / window, 0.0) / (window - 1)
+            return np.where(self._full_window(window), np.sqrt(variance), np.nan)
+        return self._cached(('std', window), compute)
+
+    def rsi(self, window):
+        """ Relative Strength Index from rolling average gains and losses. """
+        def compute():
+            gain = self.window_sum(self.prefix_gains, window) / window
+            loss = self.window_sum(self.prefix_losses, window) / window
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rsi = 100 - 100 / (1 + gain / loss)
+            return np.where(self._full_window(window), rsi, np.nan)
+        return self._cached(('rsi', window), compute)
+
+    def ema(self, span, values=None, key=None):
+        """ Exponential moving average with adjust=False, as in TechnicalAnalysis. """
+        values = self.close if values is None else values
+        key = ('ema', span) if key is None else key
+        return self._cached(
+            key, lambda: pd.DataFrame(values).ewm(span=span, adjust=False).mean().values
+        )
+
+    def macd(self, fast, slow, signal):
+        macd = self.ema(fast) - self.ema(slow)
+        macd_signal = self.ema(signal, macd, key=('macd_signal', fast, slow, signal))
+        return macd, macd_signal
+
+    def combined_signal(self, params):
+        """
+        Adds up the StrategyExecutor style adjustments for every bar and ticker.
+        Args:
+            params (dict): One parameter set of the grid
+        Returns:
+            np.ndarray: Total adjustment, shaped like the price panel
+        """
+        step = params['adjustment']
+        close = self.close
+        rsi = self.rsi(params['rsi_window'])
+        signal = np.where(rsi > params['rsi_upper'], -step,
+                          np.where(rsi < params['rsi_lower'], step, 0.0))
+        macd, macd_signal = self.macd(
+            params['macd_fast'], params['macd_slow'], params['macd_signal']
+        )
+        signal += np.where(macd > macd_signal, step, -step)
+        middle = self.rolling_mean(params['bollinger_window'])
+        width = 2 * self.rolling_std(params['bollinger_window'])
+        signal += np.where(close > middle + width, step,
+                           np.where(close < middle - width, -step, 0.0))
+        sma = self.rolling_mean(params['sma_window'])
+        signal += np.where(close > sma, step, -step)
+        volatility = self.rolling_std(params['sma_window'])
+        observed = (~np.isnan(volatility)).sum(axis=1, keepdims=True)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_volatility = np.nansum(volatility, axis=1, keepdims=True) / observed
+        signal += np.where(volatility > mean_volatility, -step, step)
+        # Bars without a full history for every indicator carry no signal
+        ready = ~(np.isnan(rsi) | np.isnan(sma) | np.isnan(width) | np.isnan(close))
+        return np.where(ready, signal, np.nan)
+
+    def score(self, signal, minimum_allocation):
+        """
+        Scores a signal panel against forward returns.
+        Returns:
+            dict: Information coefficient, hit rate, average signal-weighted return,
+            coverage and the number of tickers funded on the last bar
+        """
+        forward = self.forward_returns
+        usable = ~(np.isnan(signal) | np.isnan(forward))
+        s = signal[usable]
+        f = forward[usable]
+        active = s != 0
+        ic = np.corrcoef(s, f)[0, 1] if s.size > 1 and s.std() > 0 and f.std() > 0 else np.nan
+        last = np.nan_to_num(signal[-1], nan=0.0)
+        weights = np.maximum(1 + last, 0)
+        weights = weights / weights.sum() if weights.sum() > 0 else weights
+        return {
+            'ic': ic,
+            'hit_rate': np.mean(np.sign(s[active]) == np.sign(f[active])) \
+                if active.any() else np.nan,
+            'signal_return': np.sum(s * f) / np.sum(np.abs(s)) \
+                if active.any() else np.nan,
+            'coverage': usable.mean(),
+            'funded_tickers': int(np.sum(self.budget * weights >= minimum_allocation)),
+        }
+
+    def expand_grid(self, grid=None):
+        """ Cartesian product of the grid, skipping MACD sets whose fast span is not faster. """
+        grid = {**self.default_grid, **(grid or {})}
+        names = list(grid)
+        for values in itertools.product(*(grid[name] for name in names)):
+            params = dict(zip(names, values))
+            if params['macd_fast'] < params['macd_slow']:
+                yield params
+
+    def run(self, grid=None):
+        """
+        Evaluates every parameter set of the grid.
+        Args:
+            grid (dict, optional): Lists of values per parameter, merged over default_grid
+        Returns:
+            pd.DataFrame: One row per parameter set with its scores
+        """
+        results = []
+        for params in self.expand_grid(grid):
+            signal = self.combined_signal(params)
+            results.append({**params, **self.score(signal, params['minimum_allocation'])})
+        return pd.DataFrame(results)
@@ -0,0 +1,257 @@
+import numpy as np
+import pandas as pd
+
+from .kernels import IndicatorKernels, PATTERN_NAMES
+
+
+class PatternIndex:
+    """
+    Inverted index of candlestick pattern occurrences across the universe.
+    For every pattern it keeps two parallel arrays sorted by session date and
+    then ticker: the session dates (int64 nanoseconds in one timezone) and
+    the ticker codes. Date-range queries are two binary searches, ticker
+    subsets a membership test on the slice, and new bars are detected on a
+    short tail of each frame and merged into the tail of the arrays, so the
+    history is never rescanned or copied. The last indexed session of every
+    ticker may still be forming, so it is indexed again on the next update.
+    The arrays live in buffers with spare capacity, and dates and codes are
+    views of their filled part.
+    """
+    # Bars of context the three-bar patterns need before the first new bar
+    context_bars = 2
+
+    def __init__(self, timezone='America/New_York', backend=None):
+        """
+        :param timezone: Timezone the session dates are normalized to.
+        :param backend: Kernel backend used to detect patterns, see IndicatorKernels.
+        """
+        self.timezone = timezone
+        self.backend = backend
+        self.tickers = []
+        self.ticker_codes = {}
+        self.buffers = {
+            pattern: (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+            for pattern in PATTERN_NAMES
+        }
+        self.dates = {pattern: self.buffers[pattern][0] for pattern in PATTERN_NAMES}
+        self.codes = {pattern: self.buffers[pattern][1] for pattern in PATTERN_NAMES}
+        self.sessions = np.empty(0, dtype=np.int64)
+        self.last_indexed = {}
+
+    @classmethod
+    def from_historical_data(cls, historical_data, **kwargs):
+        index = cls(**kwargs)
+        index.update(historical_data)
+        return index
+
+    def normalize_index(self, index):
+        """ Session dates of an index as int64 nanoseconds in the index timezone. """
+        index = pd.DatetimeIndex(index)
+        if index.tz is None:
+            index = index.tz_localize(self.timezone)
+        else:
+            index = index.tz_convert(self.timezone)
+        return index.normalize().as_unit('ns').asi8
+
+    def to_timestamp(self, date):
+        """ A date as int64 nanoseconds of its session date, integers pass through. """
+        if isinstance(date, (int, np.integer)):
+            return date
+        date = pd.Timestamp(date)
+        date = date.tz_localize(self.timezone) if date.tz is None else date.tz_convert(self.timezone)
+        return date.normalize().as_unit('ns').value
+
+    def to_dates(self, values):
+        return pd.DatetimeIndex(pd.to_datetime(values, utc=True)).tz_convert(self.timezone)
+
+    def code(self, ticker):
+        if ticker not in self.ticker_codes:
+            self.ticker_codes[ticker] = len(self.tickers)
+            self.tickers.append(ticker)
+        return self.ticker_codes[ticker]
+
+    def new_bars(self, historical_data):
+        """
+        Tail of every frame holding the bars not indexed yet and the last
+        indexed session, which may have changed since, plus the context bars
+        the multi-bar patterns look back on.
+        Returns:
+            tuple: ({ticker: tail DataFrame}, {ticker: session dates of the tail})
+        """
+        tails, sessions = {}, {}
+        for ticker, data in historical_data.items():
+            dates = self.normalize_index(data.index)
+            last = self.last_indexed.get(ticker)
+            first_new = 0 if last is None else int(np.searchsorted(dates, last, side='left'))
+            if first_new >= len(dates):
+                continue
+            start = max(first_new - self.context_bars, 0)
+            tails[ticker] = data.iloc[start:]
+            sessions[ticker] = (dates[start:], first_new - start)
+        return tails, sessions
+
+    def update(self, historical_data):
+        """
+        Indexes every bar newer than the last indexed bar of its ticker, and
+        indexes that bar's session again, replacing its occurrences, so a
+        pattern formed or undone when the session closed is picked up.
+        Args:
+            historical_data (dict): {ticker: OHLC DataFrame}, full or just recent bars
+        Returns:
+            int: Number of occurrences indexed, those of the re-indexed sessions included
+        """
+        tails, sessions = self.new_bars(historical_data)
+        if not tails:
+            return 0
+        patterns = IndicatorKernels(tails, backend=self.backend).find_patterns()
+        new_dates = {pattern: [] for pattern in PATTERN_NAMES}
+        new_codes = {pattern: [] for pattern in PATTERN_NAMES}
+        new_sessions = [self.sessions]
+        replaced = {}
+        for ticker, frame in patterns.items():
+            dates, skip = sessions[ticker]
+            flags = frame.to_numpy(dtype=bool)[skip:]
+            code = self.code(ticker)
+            replaced[code] = dates[skip]
+            for k, pattern in enumerate(PATTERN_NAMES):
+                rows = np.flatnonzero(flags[:, k])
+                new_dates[pattern].append(dates[skip:][rows])
+                new_codes[pattern].append(np.full(len(rows), code, dtype=np.int64))
+            self.last_indexed[ticker] = dates[-1]
+            new_sessions.append(dates[skip:])
+        self.sessions = np.unique(np.concatenate(new_sessions))
+        # First re-indexed session per ticker code, later than any date elsewhere
+        replaced_from = np.full(len(self.tickers), np.iinfo(np.int64).max, dtype=np.int64)
+        replaced_from[list(replaced)] = list(replaced.values())
+        added = 0
+        for pattern in PATTERN_NAMES:
+            dates = np.concatenate(new_dates[pattern])
+            codes = np.concatenate(new_codes[pattern])
+            added += len(dates)
+            self.insert(pattern, dates, codes, replaced_from)
+        return added
+
+    def insert(self, pattern, dates, codes, replaced_from=None):
+        """
+        Merges occurrences into a pattern's sorted arrays, dropping the
+        occurrences of every ticker code on or after its replaced_from date.
+        Only the part of the arrays from the earliest of those dates on is
+        rewritten, which for daily updates is the last session.
+        """
+        current_dates, current_codes = self.dates[pattern], self.codes[pattern]
+        first = dates.min(initial=np.iinfo(np.int64).max)
+        if replaced_from is not None and len(replaced_from):
+            first = min(first, replaced_from.min())
+        position = int(np.searchsorted(current_dates, first, side='left'))
+        tail_dates, tail_codes = current_dates[position:], current_codes[position:]
+        if replaced_from is not None:
+            kept = tail_dates < replaced_from[tail_codes]
+            tail_dates, tail_codes = tail_dates[kept], tail_codes[kept]
+        if len(dates) == 0 and len(tail_dates) == len(current_dates) - position:
+            return
+        dates = np.concatenate([tail_dates, dates])
+        codes = np.concatenate([tail_codes, codes])
+        order = np.lexsort((codes, dates))
+        self.write(pattern, position, dates[order], codes[order])
+
+    def write(self, pattern, position, dates, codes):
+        """ Writes sorted occurrences from position on, growing the buffers geometrically. """
+        size = position + len(dates)
+        date_buffer, code_buffer = self.buffers[pattern]
+        if size > len(date_buffer):
+            capacity = max(size, 2 * len(date_buffer), 64)
+            date_buffer = np.resize(date_buffer, capacity)
+            code_buffer = np.resize(code_buffer, capacity)
+            self.buffers[pattern] = (date_buffer, code_buffer)
+        date_buffer[position:size] = dates
+        code_buffer[position:size] = codes
+        self.dates[pattern] = date_buffer[:size]
+        self.codes[pattern] = code_buffer[:size]
+
+    def query_positions(self, pattern, start=None, end=None, tickers=None):
+        """
+        Raw occurrences of a pattern between two dates, both inclusive.
+        Args:
+            pattern (str): One of PATTERN_NAMES
+            start (datetime-like, optional): First session date
+            end (datetime-like, optional): Last session date
+            tickers (list, optional): Restricts the result to these tickers
+        Returns:
+            tuple: (session dates as int64 nanoseconds, ticker codes)
+        """
+        dates, codes = self.dates[pattern], self.codes[pattern]
+        low = 0 if start is None else np.searchsorted(dates, self.to_timestamp(start), side='left')
+        high = len(dates) if end is None \
+            else np.searchsorted(dates, self.to_timestamp(end), side='right')
+        dates, codes = dates[low:high], codes[low:high]
+        if tickers is not None:
+            wanted = [self.ticker_codes[ticker] for ticker in tickers if ticker in self.ticker_codes]
+            keep = np.isin(codes, wanted)
+            dates, codes = dates[keep], codes[keep]
+        return dates, codes
+
+    def query(self, pattern, start=None, end=None, tickers=None):
+        """
+        Occurrences of a pattern as a DataFrame with 'date' and 'ticker' columns.
+        """
+        dates, codes = self.query_positions(pattern, start, end, tickers)
+        return pd.DataFrame({
+            'date': self.to_dates(dates),
+            'ticker': np.asarray(self.tickers, dtype=object)[codes] if len(codes) else [],
+        })
+
+    def screen(self, last_sessions=5, patterns=None, tickers=None):
+        """
+        Tickers that printed each pattern within the most recent sessions of the index.
+        Returns:
+            dict: {pattern: sorted list of tickers}
+        """
+        if len(self.sessions) == 0:
+            return {pattern: [] for pattern in patterns or PATTERN_NAMES}
+        start = self.sessions[max(len(self.sessions) - last_sessions, 0)]
+        screened = {}
+        for pattern in patterns or PATTERN_NAMES:
+            dates = self.dates[pattern]
+            codes = self.codes[pattern][np.searchsorted(dates, start, side='left'):]
+            if tickers is not None:
+                codes = codes[np.isin(codes, [self.ticker_codes.get(t, -1) for t in tickers])]
+            screened[pattern] = sorted(self.tickers[code] for code in np.unique(codes))
+        return screened
+
+    def occurrences(self, ticker, start=None, end=None):
+        """
+        Session dates of every pattern printed by one ticker.
+        Returns:
+            dict: {pattern: DatetimeIndex}
+        """
+        return {
+            pattern: self.to_dates(self.query_positions(pattern, start, end, [ticker])[0])
+            for pattern in PATTERN_NAMES
+        }
+
+    def save(self, path):
+        """ Writes the index to a single .npz file. """
+        arrays = {
+            'tickers': np.array(self.tickers, dtype=str),
+            'sessions': self.sessions,
+            'last_tickers': np.array(list(self.last_indexed), dtype=str),
+            'last_dates': np.array(list(self.last_indexed.values()), dtype=np.int64),
+        }
+        for k, pattern in enumerate(PATTERN_NAMES):
+            arrays[f'dates_{k}'] = self.dates[pattern]
+            arrays[f'codes_{k}'] = self.codes[pattern]
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        stored = np.load(path)
+        index = cls(**kwargs)
+        for ticker in stored['tickers']:
+            index.code(str(ticker))
+        index.sessions = stored['sessions']
+        index.last_indexed = {
+            str(ticker): date for ticker, date in zip(stored['last_tickers'], stored['last_dates'])
+        }
+        for k, pattern in enumerate(PATTERN_NAMES):
+            index.write(pattern, 0, stored[f'dates_{k}'], stored[f'codes_{k}'])
+        return index
@@ -2,13 +2,24 @@ import numpy as np
 import pandas as pd
 
 from utils import find_nearest_date
+from .normalization import NormalizationEngine
 
 
 class PortfolioAnalysisEngine:
     def __init__(
-        self, portfolio_data, market_data, historical_data
+        self, portfolio_data, market_data, historical_data, calendar=None, normalizer=None,
+        etf_holdings=None
     ):
+        """
+        normalizer is the NormalizationEngine every metric is scaled with,
+        min-max over the tickers at hand by default. etf_holdings is an
+        ETFHoldings; when given, the balance score looks through ETFs to the
+        companies they hold.
+        """
         self.historical_data = historical_data
+        self.calendar = calendar
+        self.normalizer = normalizer or NormalizationEngine()
+        self.etf_holdings = etf_holdings
         self.portfolio_data = pd.DataFrame(portfolio_data)
         self.portfolio_data.set_index('ticker_symbol', inplace=True)
         self.market_data = market_data
@@ -23,27 +34,35 @@ class PortfolioAnalysisEngine:
             'enterpriseToRevenue': 'low', 'enterpriseToEbitda': 'low', 
             'earningsQuarterlyGrowth': 'high', 'revenueGrowth': 'high', 
             'returnOnAssets': 'high', 'operatingCashflow': 'high',
-            'averageVolume': 'high', 'volumeChange': 'high', 'sharpe_ratio': 'high'
+            'averageVolume': 'high', 'volumeChange': 'high', 'sharpe_ratio': 'high',
+            # Quarterly financial factors of data.FundamentalFactors
+            'ttmRevenue': 'high', 'ttmNetIncome': 'high', 'revenueGrowthYoY': 'high',
+            'revenueGrowthQoQ': 'high', 'earningsGrowthYoY': 'high',
+            'earningsGrowthQoQ': 'high', 'ttmGrossMargin': 'high',
+            'ttmOperatingMargin': 'high', 'ttmNetMargin': 'high',
+            'grossMarginTrend': 'high', 'operatingMarginTrend': 'high',
+            'earningsStability': 'high'
         }
         self.initialize_weights()
 
+    @classmethod
+    def required_lookback(cls):
+        """
+        Momentum only needs about a year of bars, but the Sharpe ratio is
+        computed over the whole history, so all of it is needed.
+        """
+        return None
+
     def initialize_weights(self):
         self.weights = {
             ticker: 1.0 / len(self.market_data) for ticker in self.market_data.index
         }
     
     def normalize_metric(self, series, direction):
-        min_val = series.min()
-        max_val = series.max()
-        if direction == 'high':
-            return (series - min_val) / (max_val - min_val)
-        return 1 - (series - min_val) / (max_val - min_val)
+        return self.normalizer.normalize_series(series, direction)
     
     def normalize_scores(self, dataframe, columns):
-        for col in columns:
-            min_val = dataframe[col].min()
-            max_val = dataframe[col].max()
-            dataframe[col] = (dataframe[col] - min_val) / (max_val - min_val)
+        dataframe[columns] = self.normalizer.normalize(dataframe[columns])
     
     def calculate_portfolio_diversity(self):
         # Merge 'portfolio_data' with 'market_data' directly on their indices
@@ -63,9 +82,13 @@ class PortfolioAnalysisEngine:
         self.portfolio_data['discount_score'] = (
             self.portfolio_data['average_cost'] - self.portfolio_data['currentPrice']
         ) / self.portfolio_data['average_cost']
-        # Balance score where larger scores are deincentivized
+        # Balance score where larger scores are deincentivized. With ETF
+        # holdings the concentration is the look-through exposure, so a stock
+        # also held through ETFs, or an ETF of already held names, scores lower
+        concentration = self.portfolio_data['dollar_value'] if self.etf_holdings is None \
+            else self.etf_holdings.effective_positions(self.portfolio_data['dollar_value'])
         self.portfolio_data['balance_score'] = 1 / (
-            self.portfolio_data['dollar_value'] / total_portfolio_value
+            concentration / total_portfolio_value
         )
         # Normalize scores to range between 0 and 1
         self.normalize_scores(
@@ -88,6 +111,9 @@ class PortfolioAnalysisEngine:
         latest_date = pd.Timestamp('today').floor('D') - pd.DateOffset(days=1)
         end_date = latest_date - pd.DateOffset(days=21)
         start_date = end_date - pd.DateOffset(days=230)
+        if self.calendar is not None:
+            self.calculate_momentum_from_calendar(start_date, end_date)
+            return
         percent_changes = {}
         for ticker, data in self.historical_data.items():
             data = data.sort_index()
@@ -109,6 +135,23 @@ class PortfolioAnalysisEngine:
         # Normalize the momentum scores directly within market_data
         self.normalize_scores(self.market_data, ['momentum'])
         
+    def calculate_momentum_from_calendar(self, start_date, end_date):
+        """
+        Momentum for every ticker at once from the calendar's aligned closes,
+        looking the start and end sessions up only once.
+        """
+        start = self.calendar.nearest_position(start_date)
+        end = self.calendar.nearest_position(end_date)
+        closes = self.calendar.panel('Close')
+        if start >= 0 and end > start:
+            momentum = closes[end] / closes[start] - 1
+        else:
+            momentum = np.full(len(self.calendar.tickers), np.nan)
+        momentum = pd.Series(momentum, index=self.calendar.tickers)
+        tickers = self.market_data.index.intersection(momentum.index)
+        self.market_data.loc[tickers, 'momentum'] = momentum[tickers]
+        self.normalize_scores(self.market_data, ['momentum'])
+
     def calculate_volume_metrics(self):
         for ticker, data in self.historical_data.items():
             if 'Volume' in data.columns:
@@ -144,31 +187,53 @@ class PortfolioAnalysisEngine:
         # normalize scores
         self.normalize_scores(self.market_data, ['sharpe_ratio'])
                 
+    def normalize_all_metrics(self, exclude=()):
+        metrics = [
+            metric for metric in self.metrics
+            if metric in self.market_data.columns and metric not in exclude
+        ]
+        self.market_data[metrics] = self.normalizer.normalize(
+            self.market_data[metrics], self.metrics
+        )
+
+    def calculate_fundamental_score(self):
+        # Calculate fundamental score as the mean of all metrics
+        metrics = [metric for metric in self.metrics if metric in self.market_data.columns]
+        self.market_data['fundamental_score'] = self.market_data[metrics].mean(axis=1)
+
     def calculate_all_metrics(self):
         self.calculate_volume_metrics()
-        for metric, direction in self.metrics.items():
-            if metric in self.market_data.columns:
-                self.market_data[metric] = self.normalize_metric(
-                    self.market_data[metric], direction
-                )
-        # Calculate fundamental score as the mean of all metrics
-        self.market_data['fundamental_score'] = self.market_data[
-            list(self.metrics.keys())
-        ].mean(axis=1)
-        
-    def apply_strategy(self):
-        
-        self.calculate_portfolio_diversity()
+        self.normalize_all_metrics()
+        self.calculate_fundamental_score()
+
+    def calculate_ticker_metrics(self):
+        """
+        Ticker-level half of apply_strategy. Everything here only depends on
+        market and historical data, so it can be computed once for a universe
+        shared by many portfolios.
+        """
         self.calculate_momentum()
         self.calculate_sharpe_ratio()
-        self.calculate_all_metrics()
+        self.calculate_volume_metrics()
+        self.normalize_all_metrics(exclude=('portfolioDiversity',))
+
+    def apply_account_strategy(self):
+        """
+        Portfolio-specific half of apply_strategy, for market data whose
+        ticker-level metrics were already computed by calculate_ticker_metrics.
+        """
+        self.calculate_portfolio_diversity()
+        self.market_data['portfolioDiversity'] = self.normalize_metric(
+            self.market_data['portfolioDiversity'], 'high'
+        )
+        self.calculate_fundamental_score()
+        self.update_weights_from_scores()
 
+    def update_weights_from_scores(self):
         # Normalize the fundamental scores for proportional adjustment
-        max_score = self.market_data['fundamental_score'].max()
-        min_score = self.market_data['fundamental_score'].min()
-        normalized_scores = (
-            self.market_data['fundamental_score'] - min_score
-        ) / (max_score - min_score)
+        normalized_scores = self.normalize_metric(
+            self.market_data['fundamental_score'], 'high'
+        )
         
         # Adjust initial weights based on normalized fundamental scores
         self.weights = {
@@ -179,4 +244,12 @@ class PortfolioAnalysisEngine:
         total_weight = sum(self.weights.values())
         self.weights = {
             ticker: weight / total_weight for ticker, weight in self.weights.items()
-        }                     
\ No newline at end of file
+        }
+
+    def apply_strategy(self):
+        
+        self.calculate_portfolio_diversity()
+        self.calculate_momentum()
+        self.calculate_sharpe_ratio()
+        self.calculate_all_metrics()
+        self.update_weights_from_scores()
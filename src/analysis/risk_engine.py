@@ -0,0 +1,167 @@
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+
+
+class RiskEngine:
+    """
+    Maintains an exponentially weighted covariance matrix of daily returns
+    across the portfolio. Each new bar updates the mean and covariance in
+    O(N^2), so the full history never has to be revisited. Pairs are only
+    updated on bars where both tickers traded, and the decay weights are
+    tracked per pair to remove the start-up bias.
+    """
+    def __init__(self, tickers, halflife=63, shrinkage=0.1, benchmark=None, periods_per_year=252):
+        """
+        :param tickers: Ticker symbols, in the order of the return vectors passed to update.
+        :param halflife: Number of bars after which an observation's weight halves.
+        :param shrinkage: Weight of the diagonal target when shrinking correlations.
+        :param benchmark: Ticker used for beta, must be one of the tickers.
+        :param periods_per_year: Used to annualize volatility.
+        """
+        self.tickers = list(tickers)
+        self.decay = 0.5 ** (1 / halflife)
+        self.shrinkage = shrinkage
+        self.benchmark = benchmark
+        self.periods_per_year = periods_per_year
+        count = len(self.tickers)
+        self.weighted_mean = np.zeros(count)
+        self.mean_weights = np.zeros(count)
+        self.weighted_covariance = np.zeros((count, count))
+        self.covariance_weights = np.zeros((count, count))
+        self.observations = 0
+
+    @classmethod
+    def from_historical_data(cls, historical_data, **kwargs):
+        """
+        Builds an engine and feeds it the daily returns of every ticker's 'Close'.
+        """
+        closes = pd.concat(
+            {ticker: data['Close'] for ticker, data in historical_data.items()}, axis=1
+        ).sort_index()
+        engine = cls(closes.columns, **kwargs)
+        engine.fit(closes.pct_change(fill_method=None).iloc[1:])
+        return engine
+
+    def fit(self, returns):
+        """
+        Feeds a (bars, tickers) table of returns, oldest first.
+        """
+        values = returns[self.tickers].values if isinstance(returns, pd.DataFrame) \
+            else np.asarray(returns, dtype=float)
+        for row in values:
+            self.update(row)
+        return self
+
+    def update(self, returns):
+        """
+        Folds one bar of returns into the mean and covariance.
+        Args:
+            returns (array-like): Return per ticker, NaN where a ticker did not trade
+        """
+        returns = np.asarray(returns, dtype=float)
+        observed = ~np.isnan(returns)
+        deviation = np.where(observed, returns - self.mean, 0.0)
+        pairs = np.outer(observed, observed)
+        self.weighted_covariance = np.where(
+            pairs,
+            self.decay * self.weighted_covariance + (1 - self.decay) * np.outer(deviation, deviation),
+            self.weighted_covariance
+        )
+        self.covariance_weights = np.where(
+            pairs, self.decay * self.covariance_weights + (1 - self.decay), self.covariance_weights
+        )
+        self.weighted_mean = np.where(
+            observed,
+            self.decay * self.weighted_mean + (1 - self.decay) * np.nan_to_num(returns),
+            self.weighted_mean
+        )
+        self.mean_weights = np.where(
+            observed, self.decay * self.mean_weights + (1 - self.decay), self.mean_weights
+        )
+        self.observations += 1
+
+    @property
+    def mean(self):
+        """ Bias corrected exponentially weighted mean return per bar. """
+        return np.divide(
+            self.weighted_mean, self.mean_weights,
+            out=np.zeros_like(self.weighted_mean), where=self.mean_weights > 0
+        )
+
+    def covariance(self, shrinkage=None):
+        """
+        Covariance of per-bar returns, shrunk towards its own diagonal.
+        Args:
+            shrinkage (float, optional): Overrides the engine's shrinkage intensity
+        Returns:
+            pd.DataFrame: Covariance matrix indexed by ticker on both axes
+        """
+        shrinkage = self.shrinkage if shrinkage is None else shrinkage
+        covariance = np.divide(
+            self.weighted_covariance, self.covariance_weights,
+            out=np.zeros_like(self.weighted_covariance), where=self.covariance_weights > 0
+        )
+        target = np.diag(np.diag(covariance))
+        covariance = (1 - shrinkage) * covariance + shrinkage * target
+        return pd.DataFrame(covariance, index=self.tickers, columns=self.tickers)
+
+    def weight_vector(self, weights):
+        """ Aligns a {ticker: weight} mapping to the engine's tickers. """
+        return pd.Series(weights, dtype=float).reindex(self.tickers).fillna(0).values
+
+    def portfolio_volatility(self, weights, annualize=True):
+        weights = self.weight_vector(weights)
+        variance = weights @ self.covariance().values @ weights
+        scale = np.sqrt(self.periods_per_year) if annualize else 1.0
+        return np.sqrt(max(variance, 0.0)) * scale
+
+    def marginal_risk_contributions(self, weights, annualize=True):
+        """
+        Change in portfolio volatility per unit increase of each weight.
+        """
+        vector = self.weight_vector(weights)
+        volatility = self.portfolio_volatility(weights, annualize=False)
+        covariance = self.covariance().values
+        marginal = covariance @ vector / volatility if volatility > 0 \
+            else np.zeros_like(vector)
+        scale = np.sqrt(self.periods_per_year) if annualize else 1.0
+        return pd.Series(marginal * scale, index=self.tickers)
+
+    def risk_contributions(self, weights, annualize=True):
+        """
+        Share of the portfolio volatility attributable to each ticker, they
+        add up to the portfolio volatility.
+        """
+        return self.marginal_risk_contributions(weights, annualize) * \
+            self.weight_vector(weights)
+
+    def betas(self, benchmark=None):
+        """
+        Beta of every ticker to the benchmark ticker.
+        """
+        benchmark = self.benchmark if benchmark is None else benchmark
+        if benchmark not in self.tickers:
+            raise ValueError(f"Benchmark '{benchmark}' is not tracked by the risk engine")
+        covariance = self.covariance()
+        variance = covariance.at[benchmark, benchmark]
+        if variance <= 0:
+            return pd.Series(np.nan, index=self.tickers)
+        return covariance[benchmark] / variance
+
+    def portfolio_beta(self, weights, benchmark=None):
+        return float(self.weight_vector(weights) @ self.betas(benchmark).values)
+
+    def value_at_risk(self, weights, confidence=0.95, horizon=1, portfolio_value=1.0):
+        """
+        Parametric (normal) value at risk, reported as a positive loss.
+        Args:
+            weights (dict): Weight per ticker
+            confidence (float): Confidence level of the loss quantile
+            horizon (int): Holding period in bars
+            portfolio_value (float): Value the weights are applied to
+        """
+        vector = self.weight_vector(weights)
+        expected = vector @ self.mean * horizon
+        volatility = self.portfolio_volatility(weights, annualize=False) * np.sqrt(horizon)
+        return portfolio_value * (norm.ppf(confidence) * volatility - expected)
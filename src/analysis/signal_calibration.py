@@ -0,0 +1,353 @@
+import numpy as np
+import pandas as pd
+
+from utils import bars_for_years
+from .kernels import IndicatorKernels, PATTERN_NAMES
+from .parameter_sweep import ParameterSweep
+
+
+class SignalCalibrator:
+    """
+    Measures what every StrategyExecutor signal has historically been worth.
+    For each signal (candlestick patterns, the RSI, MACD, Bollinger, moving
+    average and volatility conditions, and the Markov regime) it collects
+    the distribution of forward returns over several horizons across the
+    whole cached universe, with every signal computed only from the bars
+    known at the time, and turns the excess over the unconditional
+    return into an adjustment the executor can load instead of its fixed
+    constants.
+
+    Signals are rebuilt exactly as the executor sees them, so the SMA and
+    Bollinger conditions keep TechnicalAnalysis' definitions. Tickers are
+    processed in chunks; each chunk's signals are stacked into one matrix
+    and reduced against the forward returns with a single matrix product
+    per horizon.
+    """
+    INDICATOR_SIGNALS = [
+        'rsi_overbought', 'rsi_oversold', 'macd_bullish', 'macd_bearish',
+        'bollinger_above', 'bollinger_below', 'bollinger_wide', 'bollinger_narrow',
+        'price_above_sma', 'price_below_sma', 'price_above_ema', 'price_below_ema',
+        'volatility_high', 'volatility_low', 'markov_up', 'markov_down',
+    ]
+    SIGNALS = INDICATOR_SIGNALS + PATTERN_NAMES
+    STATISTICS = ['count', 'sum', 'sum_squares', 'positive']
+    windows = (25, 50)
+
+    def __init__(
+        self, historical_data, horizons=(1, 5, 20), chunk_size=200, backend=None,
+        prior_count=100, scale=0.5, max_adjustment=0.10, years=3
+    ):
+        """
+        :param historical_data: Dictionary of OHLCV DataFrames for each ticker.
+        :param horizons: Bars ahead over which forward returns are measured.
+        :param chunk_size: Tickers processed at once, bounds the memory used.
+        :param backend: Kernel backend, see IndicatorKernels.
+        :param prior_count: Occurrences at which a signal's evidence gets half its weight.
+        :param scale: Adjustment per standard deviation of excess forward return.
+        :param max_adjustment: Largest absolute calibrated adjustment.
+        :param years: Lookback TechnicalAnalysis uses to pick each ticker's window.
+        """
+        self.historical_data = historical_data
+        self.horizons = tuple(horizons)
+        self.chunk_size = chunk_size
+        self.backend = backend
+        self.prior_count = prior_count
+        self.scale = scale
+        self.max_adjustment = max_adjustment
+        self.years = years
+        self.tickers = list(historical_data)
+        self.dates = np.unique(np.concatenate(
+            [self.session_values(data.index) for data in historical_data.values()]
+            or [np.empty(0, dtype=np.int64)]
+        ))
+        self.table = None
+
+    @staticmethod
+    def session_values(index):
+        index = pd.DatetimeIndex(index)
+        if index.tz is not None:
+            index = index.tz_convert('America/New_York').tz_localize(None)
+        return index.normalize().as_unit('ns').asi8
+
+    def chunks(self):
+        for start in range(0, len(self.tickers), self.chunk_size):
+            yield self.tickers[start:start + self.chunk_size]
+
+    def ticker_window(self, data):
+        """ The volatility based window TechnicalAnalysis picks for a ticker. """
+        close = data['Close']
+        close = close[close.index >= close.index[-1] - pd.DateOffset(years=self.years)]
+        recent = close.rolling(window=30).std().dropna()
+        if recent.empty:
+            return self.windows[1]
+        return self.windows[0] if recent.iloc[-1] > close.std() else self.windows[1]
+
+    @staticmethod
+    def rolling(values, window):
+        """
+        Rolling mean and sample standard deviation along the bars of a
+        right-aligned panel, NaN until the window is complete.
+        """
+        valid = ~np.isnan(values)
+        first_valid = np.argmax(valid, axis=0)
+        offset = np.nan_to_num(values[first_valid, np.arange(values.shape[1])])
+        centered = np.where(valid, values - offset, 0.0)
+        counts = ParameterSweep.window_sum(ParameterSweep.prefix_sum_of(valid.astype(float)), window)
+        sums = ParameterSweep.window_sum(ParameterSweep.prefix_sum_of(centered), window)
+        squares = ParameterSweep.window_sum(ParameterSweep.prefix_sum_of(centered ** 2), window)
+        full = counts == window
+        mean = np.where(full, sums / window + offset, np.nan)
+        variance = np.maximum(squares - sums ** 2 / window, 0.0) / (window - 1)
+        return mean, np.where(full, np.sqrt(variance), np.nan)
+
+    @staticmethod
+    def pct_change(panel):
+        """ Bar to bar relative change of a panel, like Series.pct_change. """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.vstack([np.full((1, panel.shape[1]), np.nan), panel[1:] / panel[:-1] - 1])
+
+    @staticmethod
+    def per_ticker(choices, windows):
+        """ Picks, for every column, the panel computed with that ticker's window. """
+        return np.where(windows[None, :] == SignalCalibrator.windows[0], choices[0], choices[1])
+
+    def panel_positions(self, kernels):
+        """ Position in self.dates of every row of a right-aligned panel, -1 for padding. """
+        positions = np.full((kernels.rows, len(kernels.tickers)), -1, dtype=np.int64)
+        for j, (ticker, length) in enumerate(zip(kernels.tickers, kernels.lengths)):
+            sessions = self.session_values(self.historical_data[ticker].index)
+            positions[kernels.rows - length:, j] = np.searchsorted(self.dates, sessions)
+        return positions
+
+    def chunk_indicators(self, tickers):
+        """
+        Indicator panels of a chunk of tickers, everything the signals need.
+        """
+        kernels = IndicatorKernels(
+            {ticker: self.historical_data[ticker] for ticker in tickers}, backend=self.backend
+        )
+        close = kernels.panel('Close')
+        windows = np.array([self.ticker_window(self.historical_data[t]) for t in tickers])
+        sma_choices, volatility_choices, ema_choices = [], [], []
+        for window in self.windows:
+            mean, std = self.rolling(close, window)
+            # TechnicalAnalysis.calculate_sma reports the change of the moving average
+            sma_choices.append(self.pct_change(mean))
+            volatility_choices.append(std)
+            ema_choices.append(kernels.ema(window))
+        bollinger_mean, bollinger_std = self.rolling(close, 20)
+        bollinger_sma = self.pct_change(bollinger_mean)
+        macd, macd_signal = kernels.macd()
+        return {
+            'kernels': kernels,
+            'close': close,
+            'rsi': kernels.rsi(),
+            'macd': macd,
+            'macd_signal': macd_signal,
+            'sma': self.per_ticker(sma_choices, windows),
+            'ema': self.per_ticker(ema_choices, windows),
+            'volatility': self.per_ticker(volatility_choices, windows),
+            'upper_bollinger': bollinger_sma + 2 * bollinger_std,
+            'lower_bollinger': bollinger_sma - 2 * bollinger_std,
+            'positions': self.panel_positions(kernels),
+        }
+
+    def trailing_sum(self, values, window):
+        """
+        Sum over the trailing window of every bar along axis 0, over the bars
+        available so far while the window is still filling.
+        """
+        prefix = np.concatenate([np.zeros((1,) + values.shape[1:]), np.cumsum(values, axis=0)])
+        ends = np.arange(1, len(values) + 1)
+        return prefix[ends] - prefix[np.maximum(ends - window, 0)]
+
+    def markov_up_probability(self, close, min_changes=20):
+        """
+        Probability of an up regime on the next bar, as MarkovPathSimulator
+        computes it for the executor, using only what was known at each bar.
+        The regime thresholds (mean and standard deviation of the daily
+        changes) and the transition counts both come from the trailing
+        MarkovModel lookback ending at the bar, so no future bar enters.
+        Returns:
+            np.ndarray: (bars, tickers) probabilities, NaN before min_changes changes
+        """
+        window = bars_for_years(self.years)
+        changes = self.pct_change(close)
+        observed = ~np.isnan(changes)
+        values = np.where(observed, changes, 0.0)
+        count = self.trailing_sum(observed.astype(float), window)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = self.trailing_sum(values, window) / count
+            variance = (self.trailing_sum(values ** 2, window) - count * mean ** 2) / (count - 1)
+        std = np.sqrt(np.maximum(variance, 0.0))
+        significant, minor = mean + std, mean
+        states = np.where(
+            changes <= -significant, 0, np.where(
+                changes <= -minor, 1, np.where(changes <= minor, 2, 3)
+            )
+        )
+        states = np.where(observed & (count >= min_changes), states, -1)
+        # Transitions ending at every bar, one-hot over the 16 (from, to) cells
+        transitions = np.zeros(states.shape + (16,), dtype=np.int32)
+        known = (states[:-1] >= 0) & (states[1:] >= 0)
+        bars, columns = np.nonzero(known)
+        transitions[bars + 1, columns, states[bars, columns] * 4 + states[bars + 1, columns]] = 1
+        counts = self.trailing_sum(transitions, window).reshape(states.shape + (4, 4))
+        # Transition row of the current regime of every bar
+        rows = np.take_along_axis(
+            counts, np.maximum(states, 0)[..., None, None], axis=2
+        )[..., 0, :]
+        totals = rows.sum(axis=2)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            probability = rows[..., 2:].sum(axis=2) / totals
+        # Regimes never left behind stay where they are, as in MarkovPathSimulator
+        probability = np.where(totals > 0, probability, np.isin(states, (2, 3)).astype(float))
+        return np.where(states >= 0, probability, np.nan)
+
+    def signal_masks(self, indicators, volatility_mean):
+        """
+        (bars, tickers) mask of every signal, in SIGNALS order. Masks are 0 or
+        1, except the Markov signals, which carry the weight the executor
+        gives them, so their counts are effective occurrences.
+        """
+        close = indicators['close']
+        rsi, sma, ema = indicators['rsi'], indicators['sma'], indicators['ema']
+        macd, macd_signal = indicators['macd'], indicators['macd_signal']
+        upper, lower = indicators['upper_bollinger'], indicators['lower_bollinger']
+        volatility = indicators['volatility']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # StrategyExecutor.adjust_bollinger divides by the ticker's 'sma' column
+            bandwidth = (upper - lower) / sma
+        mean_volatility = np.where(
+            indicators['positions'] >= 0, volatility_mean[indicators['positions']], np.nan
+        )
+        up_probability = self.markov_up_probability(close)
+        known = ~np.isnan(up_probability)
+        priced = ~np.isnan(close)
+        masks = {
+            'rsi_overbought': rsi > 70,
+            'rsi_oversold': rsi < 30,
+            'macd_bullish': priced & (macd > macd_signal),
+            'macd_bearish': priced & ~(macd > macd_signal),
+            'bollinger_above': close > upper,
+            'bollinger_below': close < lower,
+            'bollinger_wide': bandwidth > 0.10,
+            'bollinger_narrow': bandwidth < 0.05,
+            'price_above_sma': close > sma,
+            'price_below_sma': close <= sma,
+            'price_above_ema': close > ema,
+            'price_below_ema': close <= ema,
+            'volatility_high': volatility > mean_volatility,
+            'volatility_low': volatility <= mean_volatility,
+            # The executor blends the two adjustments by the up probability,
+            # so each signal is weighted by its share of the blend
+            'markov_up': np.where(known, up_probability, 0.0),
+            'markov_down': np.where(known, 1 - up_probability, 0.0),
+        }
+        patterns = indicators['kernels'].patterns()
+        for k, pattern in enumerate(PATTERN_NAMES):
+            masks[pattern] = patterns[:, :, k]
+        return np.stack([masks[signal] for signal in self.SIGNALS])
+
+    def cross_sectional_volatility(self):
+        """
+        Mean volatility across the universe on every date, the reference the
+        executor compares each ticker's volatility with.
+        """
+        sums = np.zeros(len(self.dates))
+        counts = np.zeros(len(self.dates))
+        for tickers in self.chunks():
+            kernels = IndicatorKernels(
+                {ticker: self.historical_data[ticker] for ticker in tickers}, backend=self.backend
+            )
+            close = kernels.panel('Close')
+            windows = np.array([self.ticker_window(self.historical_data[t]) for t in tickers])
+            volatility = self.per_ticker(
+                [self.rolling(close, window)[1] for window in self.windows], windows
+            )
+            positions = self.panel_positions(kernels)
+            observed = (positions >= 0) & ~np.isnan(volatility)
+            np.add.at(sums, positions[observed], volatility[observed])
+            np.add.at(counts, positions[observed], 1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return sums / counts
+
+    def forward_statistics(self, close, horizon):
+        """
+        (statistics, bars * tickers) matrix of the forward return over a
+        horizon: observed, return, squared return and positive indicators.
+        """
+        forward = np.full_like(close, np.nan)
+        forward[:-horizon] = close[horizon:] / close[:-horizon] - 1
+        observed = ~np.isnan(forward)
+        returns = np.where(observed, forward, 0.0)
+        return np.stack([
+            observed, returns, returns ** 2, returns > 0
+        ]).reshape(len(self.STATISTICS), -1).astype(float)
+
+    def accumulate(self):
+        """
+        Sums of the forward return statistics per signal and horizon over
+        the whole universe, plus the unconditional sums.
+        Returns:
+            tuple: (signal sums shaped (horizons, signals, statistics),
+            unconditional sums shaped (horizons, statistics))
+        """
+        volatility_mean = self.cross_sectional_volatility()
+        totals = np.zeros((len(self.horizons), len(self.SIGNALS), len(self.STATISTICS)))
+        baseline = np.zeros((len(self.horizons), len(self.STATISTICS)))
+        for tickers in self.chunks():
+            indicators = self.chunk_indicators(tickers)
+            masks = self.signal_masks(indicators, volatility_mean)
+            masks = masks.reshape(len(self.SIGNALS), -1).astype(float)
+            for h, horizon in enumerate(self.horizons):
+                statistics = self.forward_statistics(indicators['close'], horizon)
+                totals[h] += masks @ statistics.T
+                baseline[h] += statistics.sum(axis=1)
+        return totals, baseline
+
+    def calibrate(self):
+        """
+        Returns:
+            pd.DataFrame: One row per signal and horizon with the occurrence
+            count, mean, standard deviation and hit rate of the forward return,
+            its excess over the unconditional mean, a t-statistic and the
+            calibrated weight, NaN for signals that never occurred
+        """
+        totals, baseline = self.accumulate()
+        rows = []
+        for h, horizon in enumerate(self.horizons):
+            base_count, base_sum, base_squares, _ = baseline[h]
+            base_mean = base_sum / base_count if base_count else np.nan
+            base_std = np.sqrt(max(base_squares / base_count - base_mean ** 2, 0.0)) \
+                if base_count else np.nan
+            for s, signal in enumerate(self.SIGNALS):
+                count, total, squares, positive = totals[h, s]
+                mean = total / count if count else np.nan
+                std = np.sqrt(max(squares / count - mean ** 2, 0.0)) if count else np.nan
+                excess = mean - base_mean
+                t_stat = excess / (std / np.sqrt(count)) if count and std > 0 else np.nan
+                # Shrink towards zero when a signal has few occurrences
+                shrinkage = count / (count + self.prior_count)
+                weight = np.clip(
+                    self.scale * shrinkage * excess / base_std, -self.max_adjustment,
+                    self.max_adjustment
+                ) if count and base_std > 0 else np.nan
+                rows.append({
+                    'signal': signal, 'horizon': horizon, 'count': int(count),
+                    'mean_return': mean, 'std_return': std,
+                    'hit_rate': positive / count if count else np.nan,
+                    'excess_return': excess, 't_stat': t_stat, 'weight': weight,
+                })
+        self.table = pd.DataFrame(rows)
+        return self.table
+
+    def save(self, path):
+        """
+        Writes the calibration table to CSV for StrategyExecutor.load_calibration.
+        Signals without a weight are left out, so the executor keeps their defaults.
+        """
+        if self.table is None:
+            self.calibrate()
+        self.table.dropna(subset=['weight']).to_csv(path, index=False)
+        return path
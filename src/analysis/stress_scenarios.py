@@ -0,0 +1,266 @@
+import numpy as np
+import pandas as pd
+
+
+class StressScenarioEngine:
+    """
+    Replays historical stress windows on the current holdings of every
+    account. Each scenario is the cumulative return path of every held
+    ticker over a window of the cached history; stacking the paths of many
+    scenarios gives a (tickers, scenarios x bars) matrix, and one matrix
+    multiply with the (accounts, tickers) dollar positions yields the P&L
+    path of every account in every scenario. Scenarios are processed in
+    blocks so the result never exceeds a fixed number of elements. The
+    cached history has to reach back to the start of a scenario; results
+    of scenarios it does not cover are NaN rather than a flat path.
+    """
+    scenarios = {
+        'covid_crash_2020': ('2020-02-19', '2020-03-23'),
+        'bear_market_2022': ('2022-01-03', '2022-10-12'),
+    }
+
+    def __init__(self, historical_data, portfolios, scenarios=None, block_elements=20_000_000):
+        """
+        :param historical_data: Dictionary of DataFrames with 'Close' for each ticker.
+        :param portfolios: {account_id: portfolio list as in the portfolio JSON}, or one portfolio list.
+        :param scenarios: {name: (start date, end date)}, defaults to StressScenarioEngine.scenarios.
+        :param block_elements: Largest number of P&L path elements computed at once.
+        """
+        if isinstance(portfolios, list):
+            portfolios = {'portfolio': portfolios}
+        self.scenarios = dict(self.scenarios if scenarios is None else scenarios)
+        self.block_elements = block_elements
+        self.accounts = list(portfolios)
+        self.tickers = list(dict.fromkeys(
+            stock['ticker_symbol'] for portfolio in portfolios.values() for stock in portfolio
+        ))
+        self.closes = pd.concat(
+            {ticker: historical_data[ticker]['Close'] for ticker in self.tickers
+             if ticker in historical_data}, axis=1
+        ).reindex(columns=self.tickers).sort_index().ffill()
+        self.close_values = self.closes.to_numpy(dtype=float)
+        self.positions = self.position_values(portfolios)
+
+    @classmethod
+    def required_lookback(cls):
+        """ The built-in scenarios go back to 2020, so the whole history is needed. """
+        return None
+
+    def position_values(self, portfolios):
+        """
+        Dollar value of every holding at the last cached close.
+        Returns:
+            np.ndarray: (accounts, tickers) positions
+        """
+        columns = {ticker: k for k, ticker in enumerate(self.tickers)}
+        last_close = self.close_values[-1] if len(self.closes) \
+            else np.full(len(self.tickers), np.nan)
+        shares = np.zeros((len(self.accounts), len(self.tickers)))
+        for row, portfolio in enumerate(portfolios.values()):
+            for stock in portfolio:
+                shares[row, columns[stock['ticker_symbol']]] += stock.get('stocks_owned', 0)
+        return np.nan_to_num(shares * last_close)
+
+    def window(self, start, end):
+        """
+        Forward-filled closes between two dates, both inclusive, as a (bars,
+        tickers) array, empty when the cached history starts after start.
+        """
+        if not len(self.closes) or self.closes.index[0] > self.to_timestamp(start):
+            return self.close_values[:0]
+        first = self.closes.index.searchsorted(self.to_timestamp(start), side='left')
+        last = self.closes.index.searchsorted(self.to_timestamp(end), side='right')
+        return self.close_values[first:last]
+
+    def to_timestamp(self, date):
+        date = pd.Timestamp(date)
+        timezone = getattr(self.closes.index, 'tz', None)
+        if timezone is not None:
+            return date.tz_localize(timezone) if date.tz is None else date.tz_convert(timezone)
+        return date.tz_localize(None) if date.tz is not None else date
+
+    def add_rolling_scenarios(self, window=21, step=5, worst=None):
+        """
+        Adds every window of the cached history as a scenario, or only the
+        worst ones for an equally weighted basket of the held tickers.
+        Args:
+            window (int): Bars per scenario
+            step (int): Bars between the starts of consecutive windows
+            worst (int, optional): Keep only this many windows with the lowest basket return
+        """
+        dates = self.closes.index
+        starts = np.arange(0, len(dates) - window + 1, step)
+        if worst is not None and len(starts):
+            basket = self.closes.pct_change(fill_method=None).mean(axis=1).fillna(0.0)
+            growth = np.r_[0.0, np.log1p(basket.to_numpy())[1:]].cumsum()
+            returns = growth[starts + window - 1] - growth[starts]
+            starts = np.sort(starts[np.argsort(returns, kind='stable')[:worst]])
+        for start in starts:
+            first, last = dates[start], dates[start + window - 1]
+            self.scenarios[f"window_{first:%Y-%m-%d}"] = (first, last)
+
+    def scenario_paths(self):
+        """
+        Cumulative return of every ticker on every bar of every scenario,
+        measured from the last close at the start of the window. Scenarios are
+        padded to the longest one by holding their last value. Tickers
+        without a close at the start of a window contribute nothing.
+        Returns:
+            tuple: paths shaped (scenarios, bars, tickers), the number of bars of
+            every scenario and a (scenarios, tickers) mask of the tickers priced
+            at the start of each window
+        """
+        windows = [self.window(start, end) for start, end in self.scenarios.values()]
+        bars = max((len(window) for window in windows), default=0)
+        paths = np.zeros((len(windows), bars, len(self.tickers)))
+        covered = np.zeros((len(windows), len(self.tickers)), dtype=bool)
+        for k, window in enumerate(windows):
+            if not len(window):
+                continue
+            with np.errstate(divide='ignore', invalid='ignore'):
+                path = window / window[0] - 1
+            covered[k] = np.isfinite(path[-1])
+            path = np.where(np.isfinite(path), path, 0.0)
+            paths[k, :len(path)] = path
+            paths[k, len(path):] = path[-1]
+        return paths, np.array([len(window) for window in windows], dtype=np.int64), covered
+
+    def blocks(self, lengths, width):
+        """
+        Groups scenarios of similar length, shortest first, so each block is
+        only padded to its own longest scenario and its (accounts, scenarios,
+        bars) arrays fit in block_elements.
+        Returns:
+            list: (scenario positions, bars) per block
+        """
+        order = np.argsort(lengths, kind='stable')
+        blocks, start = [], 0
+        while start < len(order):
+            bars = max(int(lengths[order[start]]), 1)
+            size = max(self.block_elements // max(len(self.accounts) * max(bars, width), 1), 1)
+            block = order[start:start + size]
+            blocks.append((block, max(int(lengths[block].max()), 1)))
+            start += len(block)
+        return blocks
+
+    def holdings(self):
+        """
+        Positions of each account's held tickers only, padded to the largest
+        account, so per-ticker contributions skip the tickers an account does not hold.
+        Returns:
+            tuple: (accounts, held) ticker positions and dollar values
+        """
+        held = self.positions != 0
+        width = max(int(held.sum(axis=1).max(initial=0)), 1)
+        # Held tickers first in every row, in ticker order
+        order = np.argsort(~held, axis=1, kind='stable')[:, :width]
+        return order, np.take_along_axis(self.positions, order, axis=1)
+
+    def run(self):
+        """
+        Applies every scenario to every account.
+        Returns:
+            pd.DataFrame: Indexed by (account, scenario) with the starting 'value',
+            final 'pnl' and 'return', the 'max_drawdown' along the path, the
+            'worst_ticker' and its 'worst_contribution', the least-gaining holding
+            when nothing lost, and the 'coverage', the share of the account's value
+            with history in the window. Results are NaN for accounts without
+            holdings and where the coverage is 0
+        """
+        paths, lengths, covered = self.scenario_paths()
+        count, _, tickers = paths.shape
+        values = self.positions.sum(axis=1)
+        held, held_positions = self.holdings()
+        # Padded slots of accounts holding fewer tickers than the largest one
+        padding = ~np.take_along_axis(self.positions != 0, held, axis=1)
+        pnl = np.empty((len(self.accounts), count))
+        drawdown = np.empty((len(self.accounts), count))
+        worst = np.zeros((len(self.accounts), count), dtype=np.int64)
+        worst_contribution = np.zeros((len(self.accounts), count))
+        for block, bars in self.blocks(lengths, held.shape[1]):
+            block_paths = paths[block, :bars]
+            scenarios = len(block)
+            # (accounts, tickers) @ (tickers, scenarios * bars), the single multiply
+            block_pnl = (self.positions @ block_paths.reshape(-1, tickers).T).reshape(
+                len(self.accounts), scenarios, bars
+            )
+            account_values = values[:, None, None] + block_pnl
+            peaks = np.maximum.accumulate(
+                np.maximum(account_values, values[:, None, None]), axis=2
+            )
+            with np.errstate(divide='ignore', invalid='ignore'):
+                block_drawdown = np.where(peaks > 0, account_values / peaks - 1, 0.0).min(axis=2)
+            pnl[:, block] = block_pnl[..., -1]
+            drawdown[:, block] = np.minimum(block_drawdown, 0.0)
+            if tickers:
+                # (accounts, scenarios, held) dollar contribution of every holding
+                contributions = held_positions[:, None, :] * block_paths[:, -1].T[held].transpose(0, 2, 1)
+                # Padding and unpriced holdings never rank lowest, so with no
+                # losses the least-gaining priced holding is picked
+                unranked = padding[:, None, :] | ~covered[block].T[held].transpose(0, 2, 1)
+                lowest = np.where(unranked, np.inf, contributions).argmin(axis=2)
+                worst[:, block] = np.take_along_axis(held, lowest, axis=1)
+                worst_contribution[:, block] = np.take_along_axis(
+                    contributions, lowest[..., None], axis=2
+                )[..., 0]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = np.where(values[:, None] > 0, pnl / values[:, None], np.nan)
+            coverage = np.where(
+                values[:, None] > 0, (self.positions @ covered.T) / values[:, None], np.nan
+            )
+        # Accounts that hold nothing, and scenarios without history for any
+        # holding, have no results rather than a flat path
+        missing = ~(coverage > 0)
+        worst_tickers = np.asarray(self.tickers, dtype=object)[worst] if tickers \
+            else np.full(worst.shape, None, dtype=object)
+        worst_tickers[missing] = np.nan
+        for result in (pnl, returns, drawdown, worst_contribution):
+            result[missing] = np.nan
+        index = pd.MultiIndex.from_product(
+            [self.accounts, list(self.scenarios)], names=['account', 'scenario']
+        )
+        return pd.DataFrame({
+            'value': np.repeat(values, count),
+            'pnl': pnl.ravel(),
+            'return': returns.ravel(),
+            'max_drawdown': drawdown.ravel(),
+            'worst_ticker': worst_tickers.ravel(),
+            'worst_contribution': worst_contribution.ravel(),
+            'coverage': coverage.ravel(),
+        }, index=index)
+
+    def worst_contributors(self, scenario, account=None, k=5):
+        """
+        Tickers that lost the most in one scenario, for one account or summed
+        over all of them.
+        Returns:
+            pd.Series: The k most negative dollar contributions
+        """
+        start, end = self.scenarios[scenario]
+        window = self.window(start, end)
+        if not len(window):
+            return pd.Series(dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            final = np.nan_to_num(window[-1] / window[0] - 1)
+        positions = self.positions.sum(axis=0) if account is None \
+            else self.positions[self.accounts.index(account)]
+        contributions = pd.Series(positions * final, index=self.tickers)
+        return contributions.nsmallest(k)
+
+    def summary(self, results=None):
+        """
+        Scenario-level view over all accounts.
+        Returns:
+            pd.DataFrame: Indexed by scenario with the total P&L, the mean and
+            worst account return and the mean and worst max drawdown
+        """
+        results = self.run() if results is None else results
+        grouped = results.groupby(level='scenario', sort=False)
+        return pd.DataFrame({
+            # NaN, not 0, for scenarios no account has history for
+            'pnl': grouped['pnl'].sum(min_count=1),
+            'mean_return': grouped['return'].mean(),
+            'worst_return': grouped['return'].min(),
+            'mean_max_drawdown': grouped['max_drawdown'].mean(),
+            'worst_max_drawdown': grouped['max_drawdown'].min(),
+        })
@@ -1,34 +1,153 @@
+from collections import deque
+
 import numpy as np
-from scipy.signal import argrelextrema
 
 
 class SupportResistance:
-    def __init__(self, historical_data, order=10):
+    zone_dtype = np.dtype([
+        ('kind', 'i1'), ('lower', 'f8'), ('upper', 'f8'), ('center', 'f8'),
+        ('touches', 'i4'), ('last_touch', 'i8'),
+    ])
+
+    def __init__(self, historical_data, order=10, tolerance=0.015):
         """
         Initializes the class with historical data.
         :param historical_data: A Dictionary of DataFrames containing 'Close' prices for each ticker.
         :param order: How many points on each side to use for the local extrema calculation.
+        :param tolerance: Relative price distance under which extrema are merged into one zone.
         """
         self.data = historical_data
         self.order = order
-    
+        self.tolerance = tolerance
+
+    @classmethod
+    def required_lookback(cls):
+        """ Levels are searched over the whole history, so all of it is needed. """
+        return None
+
+    @staticmethod
+    def previous_smaller_distance(values):
+        """
+        Distance from each point to the nearest earlier point with a strictly
+        smaller value, or an effectively infinite distance when there is none.
+        The monotonic deque holds the indices that can still be that neighbour
+        for later points.
+        """
+        n = len(values)
+        distances = np.full(n, np.iinfo(np.int64).max, dtype=np.int64)
+        candidates = deque()
+        for i in range(n):
+            while candidates and values[candidates[-1]] >= values[i]:
+                candidates.pop()
+            if candidates:
+                distances[i] = i - candidates[-1]
+            candidates.append(i)
+        return distances
+
+    def dominance_radius(self, values, minima=True):
+        """
+        Computes in O(n) how many bars on both sides each point is lower
+        (higher) than or equal to. A point is a local minimum (maximum) of
+        order k exactly when its radius is greater than k, as with
+        argrelextrema and np.less_equal (np.greater_equal), so every order is
+        answered by the same pass. Flat bottoms and tops keep all their bars,
+        and the series edges count as extrema when nothing within k bars
+        beats them, however short the series.
+        Args:
+            values (np.ndarray): Prices without missing values
+            minima (bool): Whether to measure dominance for minima or maxima
+        Returns:
+            np.ndarray: Dominance radius per point
+        """
+        values = np.asarray(values, dtype=float)
+        if not minima:
+            values = -values
+        left = self.previous_smaller_distance(values)
+        right = self.previous_smaller_distance(values[::-1])[::-1]
+        return np.minimum(left, right)
+
+    def find_extrema(self, ticker, orders=None):
+        """
+        Detects local minima and maxima of 'Close' for several orders in one pass.
+        Args:
+            ticker (str): Ticker symbol
+            orders (iterable, optional): Orders to evaluate. Defaults to [self.order].
+        Returns:
+            dict: {order: (minima positions, maxima positions)} as integer arrays
+        """
+        orders = [self.order] if orders is None else list(orders)
+        prices = self.data[ticker]['Close'].dropna().values
+        minima_radius = self.dominance_radius(prices, minima=True)
+        maxima_radius = self.dominance_radius(prices, minima=False)
+        return {
+            order: (
+                np.flatnonzero(minima_radius > order),
+                np.flatnonzero(maxima_radius > order)
+            ) for order in orders
+        }
+
     def calculate_supports(self, ticker):
         """
         Identifies support levels using local minima.
         """
-        prices = self.data[ticker]['Close']
-        local_minima = argrelextrema(prices.values, np.less_equal, order=self.order)[0]
-        supports = prices.iloc[local_minima]
-        return supports.dropna()
+        prices = self.data[ticker]['Close'].dropna()
+        local_minima = self.find_extrema(ticker)[self.order][0]
+        return prices.iloc[local_minima]
 
     def calculate_resistances(self, ticker):
         """
         Identifies resistance levels using local maxima.
         """
-        prices = self.data[ticker]['Close']
-        local_maxima = argrelextrema(prices.values, np.greater_equal, order=self.order)[0]
-        resistances = prices.iloc[local_maxima]
-        return resistances.dropna()
+        prices = self.data[ticker]['Close'].dropna()
+        local_maxima = self.find_extrema(ticker)[self.order][1]
+        return prices.iloc[local_maxima]
+
+    def cluster_levels(self, prices, positions, kind):
+        """
+        Merges extrema whose prices lie within the relative tolerance of the
+        previous one into price zones.
+        Args:
+            prices (np.ndarray): Prices at the extrema
+            positions (np.ndarray): Bar positions of the extrema
+            kind (int): 0 for support zones, 1 for resistance zones
+        Returns:
+            np.ndarray: Structured array with zone_dtype, sorted by price
+        """
+        if len(prices) == 0:
+            return np.empty(0, dtype=self.zone_dtype)
+        order = np.argsort(prices, kind='stable')
+        prices = prices[order]
+        positions = positions[order]
+        # A new zone starts whenever the gap to the previous extremum is too wide
+        new_zone = np.r_[True, np.diff(prices) > self.tolerance * prices[:-1]]
+        starts = np.flatnonzero(new_zone)
+        zones = np.empty(len(starts), dtype=self.zone_dtype)
+        zones['kind'] = kind
+        zones['lower'] = prices[starts]
+        zones['upper'] = np.maximum.reduceat(prices, starts)
+        zones['touches'] = np.diff(np.r_[starts, len(prices)])
+        zones['center'] = np.add.reduceat(prices, starts) / zones['touches']
+        zones['last_touch'] = np.maximum.reduceat(positions, starts)
+        return zones
+
+    def calculate_zones(self, ticker, orders=None):
+        """
+        Clusters the extrema of every requested order into support and resistance zones.
+        Returns:
+            np.ndarray: Support zones followed by resistance zones
+        """
+        prices = self.data[ticker]['Close'].dropna().values
+        minima = []
+        maxima = []
+        for supports, resistances in self.find_extrema(ticker, orders).values():
+            minima.append(supports)
+            maxima.append(resistances)
+        minima = np.unique(np.concatenate(minima)) if minima else np.empty(0, int)
+        maxima = np.unique(np.concatenate(maxima)) if maxima else np.empty(0, int)
+        return np.concatenate([
+            self.cluster_levels(prices[minima], minima, kind=0),
+            self.cluster_levels(prices[maxima], maxima, kind=1),
+        ])
 
     def find_levels(self):
         """
@@ -39,4 +158,12 @@ class SupportResistance:
         for ticker in self.data:
             supports[ticker] = self.calculate_supports(ticker)
             resistances[ticker] = self.calculate_resistances(ticker)
-        return supports, resistances
\ No newline at end of file
+        return supports, resistances
+
+    def find_zones(self, orders=None):
+        """
+        Calculate support and resistance zones for every ticker in the historical data.
+        Returns:
+            dict: {ticker: structured array of zones}
+        """
+        return {ticker: self.calculate_zones(ticker, orders) for ticker in self.data}
@@ -1,17 +1,32 @@
 import numpy as np
 import pandas as pd
 
+from utils import bars_for_years
+
 
 class TechnicalAnalysis:
-    def __init__(self, historical_data, max_years=3):
+    def __init__(self, historical_data, max_years=3, calendar=None):
         self.historical_data = historical_data
+        self.calendar = calendar
         self.limit_data_to_recent_years(max_years)
         self.windows = self.calculate_volatility_based_window()
+
+    @classmethod
+    def required_lookback(cls, max_years=3):
+        """ Daily bars of history the analysis uses, None meaning all of it. """
+        return bars_for_years(max_years)
         
     def limit_data_to_recent_years(self, years):
         """
         Limits the data to the most recent years
         """
+        if self.calendar is not None:
+            start = self.calendar.lookback_start(years=years)
+            self.historical_data = {
+                ticker: data.iloc[self.calendar.ticker_offset(ticker, start):]
+                for ticker, data in self.historical_data.items()
+            }
+            return
         current_date = pd.to_datetime('today').tz_localize('America/New_York')
         cutoff_date = current_date - pd.DateOffset(years=years)
         limited_data = {}  # Dictionary to store limited data for each ticker
@@ -0,0 +1,270 @@
+import numpy as np
+import pandas as pd
+
+
+class VolumeProfile:
+    """
+    Volume-at-price profile of every ticker over a lookback window. Each
+    bar's volume is assigned to the price bin of its typical price, and the
+    bins of the whole universe are filled by a single bincount over
+    (ticker, bin) codes. From the profile come the point of control (the
+    busiest bin), the value area (the busiest bins holding a share of the
+    volume) and the high-volume nodes (runs of bins well above the average),
+    reported as support zones below the last close and resistance zones above.
+    """
+    zone_dtype = np.dtype([
+        ('kind', 'i1'), ('source', 'i1'), ('lower', 'f8'), ('upper', 'f8'),
+        ('center', 'f8'), ('volume', 'f8'), ('share', 'f8'),
+    ])
+    # Values of the 'source' field
+    HIGH_VOLUME_NODE, POINT_OF_CONTROL, VALUE_AREA_LOW, VALUE_AREA_HIGH = range(4)
+
+    def __init__(self, historical_data, lookback=252, bins=50, value_area=0.70, node_threshold=1.5):
+        """
+        :param historical_data: Dictionary of DataFrames with 'High', 'Low', 'Close' and 'Volume'.
+        :param lookback: Number of most recent bars profiled.
+        :param bins: Price bins per ticker, spanning the lowest low to the highest high.
+        :param value_area: Share of the volume the value area holds.
+        :param node_threshold: Multiple of the average bin volume a high-volume node exceeds.
+        """
+        self.data = historical_data
+        self.lookback = lookback
+        self.bins = bins
+        self.value_area = value_area
+        self.node_threshold = node_threshold
+        self.tickers = list(historical_data)
+        self.volumes = None
+        self.edges = None
+        self.last_close = None
+
+    @classmethod
+    def required_lookback(cls, lookback=252):
+        """ Daily bars of history the profile uses, None meaning all of it. """
+        return lookback
+
+    def panel(self, column):
+        """ Right-aligned (tickers, lookback) array of one column, NaN where missing. """
+        values = np.full((len(self.tickers), self.lookback), np.nan)
+        for i, ticker in enumerate(self.tickers):
+            column_values = self.data[ticker][column].to_numpy(dtype=float)[-self.lookback:]
+            values[i, self.lookback - len(column_values):] = column_values
+        return values
+
+    def build(self):
+        """
+        Fills every ticker's profile over equal-width bins between its lowest
+        low and highest high.
+        Returns:
+            tuple: volumes shaped (tickers, bins) and bin edges shaped (tickers, bins + 1)
+        """
+        high, low, close, volume = (self.panel(c) for c in ('High', 'Low', 'Close', 'Volume'))
+        typical = (high + low + close) / 3
+        valid = np.isfinite(typical) & np.isfinite(volume) & (volume > 0)
+        lowest = np.nanmin(np.where(valid, low, np.nan), axis=1, initial=np.inf)
+        highest = np.nanmax(np.where(valid, high, np.nan), axis=1, initial=-np.inf)
+        lowest = np.where(np.isfinite(lowest), lowest, 0.0)
+        # A ticker without a price range still gets bins around its price
+        highest = np.where(highest > lowest, highest, lowest * 1.01 + 1e-9)
+        width = (highest - lowest) / self.bins
+        ratios = np.where(valid, (typical - lowest[:, None]) / width[:, None], 0.0)
+        positions = np.clip(ratios.astype(np.int64), 0, self.bins - 1)
+        codes = (np.arange(len(self.tickers))[:, None] * self.bins + positions)[valid]
+        self.volumes = np.bincount(
+            codes, weights=volume[valid], minlength=len(self.tickers) * self.bins
+        ).reshape(len(self.tickers), self.bins)
+        self.edges = lowest[:, None] + width[:, None] * np.arange(self.bins + 1)
+        self.last_close = pd.DataFrame(close.T).ffill().to_numpy()[-1]
+        return self.volumes, self.edges
+
+    def occupied_span(self, volumes):
+        """ First and last bin holding volume per ticker, the span averages are taken over. """
+        occupied = volumes > 0
+        first = occupied.argmax(axis=1)
+        last = volumes.shape[1] - 1 - occupied[:, ::-1].argmax(axis=1)
+        return first, last, occupied.any(axis=1)
+
+    def point_of_control(self, volumes):
+        return volumes.argmax(axis=1)
+
+    def value_area_bins(self, volumes):
+        """
+        Lowest and highest bin of the value area: the busiest bins, taken in
+        order of volume, until they hold the value area share.
+        """
+        order = np.argsort(-volumes, axis=1, kind='stable')
+        ranked = np.take_along_axis(volumes, order, axis=1)
+        totals = volumes.sum(axis=1, keepdims=True)
+        cumulative = np.cumsum(ranked, axis=1)
+        # Bins ranked before the share is reached, plus the one reaching it
+        inside = (cumulative - ranked) < self.value_area * totals
+        inside[:, 0] = True
+        chosen = np.where(inside, order, -1)
+        high = chosen.max(axis=1)
+        low = np.where(inside, order, volumes.shape[1]).min(axis=1)
+        return low, high
+
+    def key_levels(self):
+        """
+        Point of control and value-area bounds of every ticker.
+        Returns:
+            pd.DataFrame: Indexed by ticker with 'poc', 'value_area_low',
+            'value_area_high' and 'last_close' prices
+        """
+        if self.volumes is None:
+            self.build()
+        return self.levels_frame(self.volumes, self.edges)
+
+    def levels_frame(self, volumes, edges):
+        rows = np.arange(len(volumes))
+        centers = (edges[:, 1:] + edges[:, :-1]) / 2
+        poc = self.point_of_control(volumes)
+        low, high = self.value_area_bins(volumes)
+        has_volume = volumes.sum(axis=1) > 0
+        return pd.DataFrame({
+            'poc': np.where(has_volume, centers[rows, poc], np.nan),
+            'value_area_low': np.where(has_volume, edges[rows, low], np.nan),
+            'value_area_high': np.where(has_volume, edges[rows, high + 1], np.nan),
+            'last_close': self.last_close,
+        }, index=self.tickers)
+
+    def zones_for(self, volumes, edges, last_close):
+        """
+        Support and resistance zones of one ticker's profile.
+        Args:
+            volumes (np.ndarray): Volume per bin
+            edges (np.ndarray): Bin edges, one more than the bins
+            last_close (float): Price splitting supports from resistances
+        Returns:
+            np.ndarray: Structured array with zone_dtype, sorted by price
+        """
+        total = volumes.sum()
+        if total <= 0:
+            return np.empty(0, dtype=self.zone_dtype)
+        first, last, _ = self.occupied_span(volumes[None])
+        average = total / (last[0] - first[0] + 1)
+        nodes = volumes > self.node_threshold * average
+        # Runs of consecutive high-volume bins form one node
+        changes = np.diff(np.r_[0, nodes.astype(np.int8), 0])
+        starts, ends = np.flatnonzero(changes == 1), np.flatnonzero(changes == -1)
+        poc = int(volumes.argmax())
+        low, high = self.value_area_bins(volumes[None])
+        spans = [(start, end, self.HIGH_VOLUME_NODE) for start, end in zip(starts, ends)]
+        spans += [
+            (poc, poc + 1, self.POINT_OF_CONTROL),
+            (int(low[0]), int(low[0]) + 1, self.VALUE_AREA_LOW),
+            (int(high[0]), int(high[0]) + 1, self.VALUE_AREA_HIGH),
+        ]
+        zones = np.empty(len(spans), dtype=self.zone_dtype)
+        cumulative = np.r_[0.0, np.cumsum(volumes)]
+        centers = (edges[1:] + edges[:-1]) / 2
+        for k, (start, end, source) in enumerate(spans):
+            volume = cumulative[end] - cumulative[start]
+            center = np.dot(volumes[start:end], centers[start:end]) / volume if volume > 0 \
+                else centers[start:end].mean()
+            zones[k] = (
+                0 if center <= last_close else 1, source, edges[start], edges[end],
+                center, volume, volume / total
+            )
+        return np.sort(zones, order='center')
+
+    def find_zones(self):
+        """
+        Volume-profile zones of every ticker.
+        Returns:
+            dict: {ticker: structured array of zones}
+        """
+        if self.volumes is None:
+            self.build()
+        return {
+            ticker: self.zones_for(self.volumes[i], self.edges[i], self.last_close[i])
+            for i, ticker in enumerate(self.tickers)
+        }
+
+
+class RollingVolumeProfile(VolumeProfile):
+    """
+    Volume profile kept up to date one bar at a time. Bins sit on a fixed
+    logarithmic price grid, so a bar always maps to the same bin and the
+    profile is updated by adding the new bar's volume and removing the
+    volume of the bar leaving the window, both for the whole universe with
+    one scatter-add each. Only tickers whose price leaves the span of their
+    bins are re-binned, from the bars still in the window.
+    """
+    def __init__(self, historical_data, lookback=252, bin_width=0.005, span_bins=512,
+                 value_area=0.70, node_threshold=1.5):
+        """
+        :param historical_data: Dictionary of DataFrames the window is seeded from.
+        :param lookback: Number of most recent bars profiled.
+        :param bin_width: Relative price width of each bin, 0.005 being half a percent.
+        :param span_bins: Bins held per ticker around its current price.
+        :param value_area: Share of the volume the value area holds.
+        :param node_threshold: Multiple of the average bin volume a high-volume node exceeds.
+        """
+        super().__init__(historical_data, lookback, span_bins, value_area, node_threshold)
+        self.step = np.log1p(bin_width)
+        self.position = 0
+        self.seed()
+
+    def grid_bins(self, high, low, close):
+        """ Absolute grid bin of each bar's typical price, -1 where it is missing. """
+        typical = (high + low + close) / 3
+        with np.errstate(invalid='ignore', divide='ignore'):
+            bins = np.floor(np.log(typical) / self.step)
+        return np.where(np.isfinite(bins) & (typical > 0), bins, -1).astype(np.int64)
+
+    def seed(self):
+        """ Fills the ring buffers of the window and builds every profile. """
+        high, low, close, volume = (self.panel(c) for c in ('High', 'Low', 'Close', 'Volume'))
+        self.window_bins = self.grid_bins(high, low, close)
+        self.window_volumes = np.where((self.window_bins >= 0) & np.isfinite(volume), volume, 0.0)
+        self.last_close = pd.DataFrame(close.T).ffill().to_numpy()[-1]
+        self.base = np.zeros(len(self.tickers), dtype=np.int64)
+        self.volumes = np.zeros((len(self.tickers), self.bins))
+        self.edges = np.zeros((len(self.tickers), self.bins + 1))
+        self.rebin(np.arange(len(self.tickers)))
+
+    def rebin(self, rows):
+        """ Re-centres the bins of some tickers on their last close and refills them from the window. """
+        closes = self.last_close[rows]
+        self.base[rows] = self.grid_bins(closes, closes, closes) - self.bins // 2
+        self.edges[rows] = np.exp((self.base[rows, None] + np.arange(self.bins + 1)) * self.step)
+        offsets = self.window_bins[rows] - self.base[rows, None]
+        inside = (offsets >= 0) & (offsets < self.bins) & (self.window_volumes[rows] > 0)
+        codes = (np.arange(len(rows))[:, None] * self.bins + offsets)[inside]
+        self.volumes[rows] = np.bincount(
+            codes, weights=self.window_volumes[rows][inside], minlength=len(rows) * self.bins
+        ).reshape(len(rows), self.bins)
+
+    def update(self, bars):
+        """
+        Adds one new bar per ticker and drops the oldest bar of the window.
+        Args:
+            bars (pd.DataFrame): Indexed by ticker with 'High', 'Low', 'Close' and
+            'Volume', tickers without a new bar may be missing
+        """
+        bars = bars.reindex(self.tickers)
+        high, low, close, volume = (
+            bars[c].to_numpy(dtype=float) for c in ('High', 'Low', 'Close', 'Volume')
+        )
+        new_bins = self.grid_bins(high, low, close)
+        new_volumes = np.where((new_bins >= 0) & np.isfinite(volume), volume, 0.0)
+        rows = np.arange(len(self.tickers))
+        slot = self.position % self.lookback
+        # The ring buffer is right-aligned at seeding, its oldest bar sits at the write slot
+        old_bins, old_volumes = self.window_bins[:, slot].copy(), self.window_volumes[:, slot].copy()
+        self.window_bins[:, slot] = new_bins
+        self.window_volumes[:, slot] = new_volumes
+        self.position += 1
+        for bins, volumes, sign in ((old_bins, old_volumes, -1.0), (new_bins, new_volumes, 1.0)):
+            offsets = bins - self.base
+            inside = (offsets >= 0) & (offsets < self.bins) & (volumes > 0)
+            np.add.at(self.volumes, (rows[inside], offsets[inside]), sign * volumes[inside])
+        np.maximum(self.volumes, 0.0, out=self.volumes)
+        arrived = np.isfinite(close)
+        self.last_close = np.where(arrived, close, self.last_close)
+        offsets = self.grid_bins(close, close, close) - self.base
+        # Tickers drifting towards the edge of their bins are re-centred
+        margin = self.bins // 8
+        drifted = np.flatnonzero(arrived & ((offsets < margin) | (offsets >= self.bins - margin)))
+        if len(drifted):
+            self.rebin(drifted)
@@ -1,3 +1,10 @@
 from .data_fetcher import StockDataFetcher
 from .feature_engineering import FeatureEngineering
-from.etf_data_filler import ETFDataFiller
\ No newline at end of file
+from.etf_data_filler import ETFDataFiller
+from .intraday_bars import IntradayBarStore
+from .trading_calendar import TradingCalendar
+from .checkpoint_store import CheckpointStore
+from .snapshot_store import SnapshotStore
+from .fetch_planner import FetchPlanner
+from .etf_holdings import ETFHoldings
+from .fundamental_factors import FundamentalFactors
\ No newline at end of file
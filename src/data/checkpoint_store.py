@@ -0,0 +1,111 @@
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+
+class CheckpointStore:
+    """
+    Local Parquet checkpoints of per-ticker pipeline stage outputs. Each
+    output is keyed by a content hash of the stage's inputs and parameters,
+    so a rerun finds every unchanged (ticker, stage) pair on disk and only
+    recomputes what actually changed. A manifest records the last good key
+    of every stage per ticker; older checkpoints of a stage are deleted
+    once a new key replaces them.
+    """
+    def __init__(self, root):
+        """
+        :param root: Directory the checkpoints and manifest are written to.
+        """
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.manifest_path = os.path.join(root, 'manifest.json')
+        self.manifest = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as file:
+                self.manifest = json.load(file)
+
+    @staticmethod
+    def content_hash(*parts):
+        """
+        Hashes DataFrames, Series and JSON-like values into one hex digest.
+        """
+        digest = hashlib.sha256()
+        for part in parts:
+            if isinstance(part, (pd.DataFrame, pd.Series)):
+                digest.update(pd.util.hash_pandas_object(part, index=True).values.tobytes())
+                columns = part.columns if isinstance(part, pd.DataFrame) else [part.name]
+                digest.update(repr(list(columns)).encode())
+            else:
+                digest.update(json.dumps(part, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def path(self, stage, ticker, key):
+        return os.path.join(self.root, stage, ticker, f"{key}.parquet")
+
+    def load(self, stage, ticker, key):
+        """
+        Returns:
+            pd.DataFrame: The checkpointed output, or None if there is none
+        """
+        path = self.path(stage, ticker, key)
+        if not os.path.exists(path):
+            return None
+        return pd.read_parquet(path)
+
+    def save(self, stage, ticker, key, frame):
+        path = self.path(stage, ticker, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first so a crash never leaves a partial checkpoint
+        temporary_path = f"{path}.tmp"
+        frame.to_parquet(temporary_path)
+        os.replace(temporary_path, path)
+        self.mark_current(stage, ticker, key)
+
+    def mark_current(self, stage, ticker, key):
+        """
+        Records key as the last good checkpoint of a stage and deletes the
+        checkpoint it supersedes, so only one output per (ticker, stage) is
+        kept on disk.
+        """
+        previous = self.manifest.get(ticker, {}).get(stage)
+        if previous == key:
+            return
+        self.manifest.setdefault(ticker, {})[stage] = key
+        self.save_manifest()
+        if previous is not None:
+            previous_path = self.path(stage, ticker, previous)
+            if os.path.exists(previous_path):
+                os.remove(previous_path)
+
+    def save_manifest(self):
+        temporary_path = f"{self.manifest_path}.tmp"
+        with open(temporary_path, 'w') as file:
+            json.dump(self.manifest, file, indent=4)
+        os.replace(temporary_path, self.manifest_path)
+
+    def cached(self, stage, ticker, compute, *inputs, refresh=False):
+        """
+        Loads a stage output from its checkpoint, or computes and saves it.
+        Args:
+            stage (str): Pipeline stage name
+            ticker (str): Ticker symbol
+            compute (callable): Returns the stage output as a DataFrame
+            *inputs: Everything the output depends on, hashed into the key
+            refresh (bool): Recompute and overwrite even if a checkpoint exists
+        Returns:
+            tuple: (output DataFrame, key of the checkpoint)
+        """
+        key = self.content_hash(stage, ticker, *inputs)
+        frame = None if refresh else self.load(stage, ticker, key)
+        if frame is None:
+            frame = compute()
+            self.save(stage, ticker, key, frame)
+        else:
+            self.mark_current(stage, ticker, key)
+        return frame, key
+
+    def completed_stages(self, ticker):
+        """ Stages of a ticker with a good checkpoint, as {stage: key}. """
+        return dict(self.manifest.get(ticker, {}))
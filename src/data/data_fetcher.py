@@ -54,4 +54,17 @@ class StockDataFetcher:
                 'annual_financials': ticker.financials,
                 'quarterly_financials': ticker.quarterly_financials,
             }
-        return financial_data
\ No newline at end of file
+        return financial_data
+
+    def get_intraday_bars(self, ticker_symbol, period="1d", interval="1m"):
+        """
+        Gets the most recent intraday bars of a single stock
+        Args:
+            ticker_symbol (str): Ticker to fetch
+            period (str, optional): How far back to fetch. Defaults to "1d".
+            interval (str, optional): Bar size. Defaults to "1m".
+        Returns:
+            pd.DataFrame: OHLCV bars indexed by timestamp
+        """
+        ticker = yf.Ticker(ticker_symbol)
+        return ticker.history(period=period, interval=interval, prepost=False)
\ No newline at end of file
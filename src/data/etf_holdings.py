@@ -0,0 +1,137 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+class ETFHoldings:
+    """
+    Constituent weights of ETFs, loaded from a local holdings file into a
+    sparse (ETFs, constituents) matrix. Positions are looked through with
+    sparse products: a (tickers, companies) look-through matrix maps every
+    held ticker to what it actually owns, a stock to itself and an ETF to
+    its constituents, plus the share of the fund the file does not list,
+    which stays an exposure to the ETF itself.
+    """
+    def __init__(self, weights, etfs, constituents):
+        """
+        :param weights: scipy.sparse matrix of constituent weights shaped (etfs, constituents),
+        each row summing to at most 1.
+        :param etfs: ETF tickers, in row order.
+        :param constituents: Constituent tickers, in column order.
+        """
+        self.weights = sparse.csr_matrix(weights)
+        self.etfs = list(etfs)
+        self.constituents = list(constituents)
+        self.etf_index = {etf: k for k, etf in enumerate(self.etfs)}
+        self.constituent_index = {ticker: k for k, ticker in enumerate(self.constituents)}
+
+    @classmethod
+    def from_frame(cls, frame, etf_column='etf', constituent_column='symbol', weight_column='weight'):
+        """
+        Builds the matrix from one row per (ETF, constituent). Duplicate rows
+        are summed, and ETFs whose weights add up to more than 1.5 are taken
+        to be in percent.
+        """
+        frame = frame[[etf_column, constituent_column, weight_column]].dropna()
+        etfs = pd.Categorical(frame[etf_column].astype(str))
+        constituents = pd.Categorical(frame[constituent_column].astype(str))
+        weights = sparse.coo_matrix(
+            (frame[weight_column].to_numpy(dtype=float), (etfs.codes, constituents.codes)),
+            shape=(len(etfs.categories), len(constituents.categories))
+        ).tocsr()
+        weights.sum_duplicates()
+        totals = np.asarray(weights.sum(axis=1)).ravel()
+        scale = np.where(totals > 1.5, 0.01, 1.0)
+        weights = sparse.diags(scale) @ weights
+        return cls(weights, etfs.categories, constituents.categories)
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        """
+        Loads a holdings file: CSV or Parquet with one row per (ETF,
+        constituent), or JSON as {etf: {constituent: weight}}.
+        """
+        extension = os.path.splitext(path)[1].lower()
+        if extension == '.json':
+            with open(path) as file:
+                holdings = json.load(file)
+            frame = pd.DataFrame([
+                (etf, symbol, weight)
+                for etf, constituents in holdings.items() for symbol, weight in constituents.items()
+            ], columns=['etf', 'symbol', 'weight'])
+        elif extension == '.parquet':
+            frame = pd.read_parquet(path)
+        else:
+            frame = pd.read_csv(path)
+        return cls.from_frame(frame, **kwargs)
+
+    def is_etf(self, ticker):
+        return ticker in self.etf_index
+
+    def look_through(self, tickers):
+        """
+        Look-through matrix of a list of held tickers.
+        Returns:
+            tuple: (tickers, companies) scipy.sparse CSR matrix and the company labels,
+            the constituents followed by held tickers that are not constituents
+        """
+        tickers = list(tickers)
+        extra = [
+            ticker for ticker in dict.fromkeys(tickers) if ticker not in self.constituent_index
+        ]
+        companies = self.constituents + extra
+        columns = {**self.constituent_index,
+                   **{ticker: len(self.constituents) + k for k, ticker in enumerate(extra)}}
+        etf_rows = np.array([k for k, ticker in enumerate(tickers) if self.is_etf(ticker)], dtype=np.int64)
+        # Constituent weights of the held ETFs
+        held_etfs = self.weights[[self.etf_index[tickers[k]] for k in etf_rows]] if len(etf_rows) \
+            else sparse.csr_matrix((0, len(self.constituents)))
+        listed = held_etfs.tocoo()
+        residual = np.ones(len(tickers))
+        residual[etf_rows] = np.clip(1 - np.asarray(held_etfs.sum(axis=1)).ravel(), 0.0, None)
+        # Stocks map to themselves, ETFs keep their unlisted share on themselves
+        self_rows = np.flatnonzero(residual > 0)
+        rows = np.concatenate([etf_rows[listed.row], self_rows])
+        cols = np.concatenate([listed.col, [columns[tickers[k]] for k in self_rows]]).astype(np.int64)
+        values = np.concatenate([listed.data, residual[self_rows]])
+        matrix = sparse.csr_matrix((values, (rows, cols)), shape=(len(tickers), len(companies)))
+        return matrix, companies
+
+    def exposures(self, positions):
+        """
+        Effective per-company exposure of one or many accounts.
+        Args:
+            positions (pd.Series or pd.DataFrame): Dollar value per held ticker, or
+            an (accounts, tickers) frame
+        Returns:
+            pd.Series or pd.DataFrame: Dollar exposure per company with any exposure,
+            a sparse frame for many accounts
+        """
+        frame = positions.to_frame().T if isinstance(positions, pd.Series) else positions
+        matrix, companies = self.look_through(frame.columns)
+        values = (sparse.csr_matrix(frame.fillna(0.0).to_numpy(dtype=float)) @ matrix).tocsc()
+        exposed = np.flatnonzero(values.getnnz(axis=0))
+        values = values[:, exposed]
+        companies = [companies[k] for k in exposed]
+        if isinstance(positions, pd.Series):
+            return pd.Series(values.toarray().ravel(), index=companies)
+        return pd.DataFrame.sparse.from_spmatrix(values, index=frame.index, columns=companies)
+
+    def effective_positions(self, positions):
+        """
+        Dollar exposure each held ticker adds to, after look-through: for a
+        stock, the portfolio's total exposure to that company; for an ETF, the
+        weighted exposure to everything it holds. A second sparse product
+        with the same look-through matrix.
+        Args:
+            positions (pd.Series): Dollar value per held ticker
+        Returns:
+            pd.Series: Effective dollar exposure per held ticker
+        """
+        matrix, _ = self.look_through(positions.index)
+        values = positions.fillna(0.0).to_numpy(dtype=float)
+        exposure = matrix.T @ values
+        return pd.Series(matrix @ exposure, index=positions.index)
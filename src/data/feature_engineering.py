@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 
 
@@ -27,32 +28,35 @@ class FeatureEngineering:
         return consolidated_history
     
     def consolidate_financials(self):
-        annual_financials = pd.DataFrame()
-        quarterly_fianancials = pd.DataFrame()
+        reports = {'annual_financials': {}, 'quarterly_financials': {}}
         for ticker_symbol, data in self.financial_data.items():
-            for report_type in ['annual_financials', 'quarterly_financials']:
-                df = data[report_type].copy()
+            for report_type in reports:
+                df = data[report_type]
+                # Funds and newly listed tickers have no financials
+                if df.empty:
+                    continue
                 if not pd.api.types.is_datetime64_any_dtype(df.columns):
                     df = df.transpose()
-                df = df.reset_index().melt(
-                    id_vars='index', var_name='Date', value_name='Value'
-                )
-                df.columns = ['Financial_Metric', 'Date', 'Value']
-                df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-                df['Ticker'] = ticker_symbol
-            if report_type == 'annual_financials':
-                annual_financials = pd.concat(
-                    [annual_financials, df], ignore_index=True
-                )
-            elif report_type == 'quarterly_financials':
-                quarterly_fianancials = pd.concat(
-                    [quarterly_fianancials, df], ignore_index=True
-                )
-            if not annual_financials.empty:
-                annual_financials.set_index('Date', inplace=True)
-            if not quarterly_fianancials.empty:
-                quarterly_fianancials.set_index('Date', inplace=True)
-        return annual_financials, quarterly_fianancials
+                # Long table of the ticker's own report dates, date by date as melt would
+                rows, columns = df.shape
+                reports[report_type][ticker_symbol] = pd.DataFrame({
+                    'Financial_Metric': np.tile(df.index.to_numpy(), columns),
+                    'Date': np.repeat(df.columns.to_numpy(), rows),
+                    'Value': df.to_numpy().ravel(order='F'),
+                    'Ticker': ticker_symbol,
+                })
+        consolidated = []
+        for frames in reports.values():
+            if not frames:
+                consolidated.append(pd.DataFrame())
+                continue
+            # One concat for all tickers instead of one per ticker
+            financials = pd.concat(frames.values(), ignore_index=True)
+            financials['Date'] = pd.to_datetime(financials['Date'], errors='coerce')
+            financials.set_index('Date', inplace=True)
+            consolidated.append(financials)
+        annual_financials, quarterly_financials = consolidated
+        return annual_financials, quarterly_financials
                 
     def consolidate_info_fields(self):
         info_data = []
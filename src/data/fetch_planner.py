@@ -0,0 +1,150 @@
+import pandas as pd
+
+from .data_fetcher import StockDataFetcher
+
+
+class FetchPlanner:
+    """
+    Plans how much daily history a run needs. Every configured analyzer
+    reports its required lookback in bars (None for the whole history), the
+    planner fetches only the union of those lookbacks per ticker, as the
+    shortest yfinance period that covers it, and reuses cached frames that
+    are already long enough instead of fetching them again. With a
+    CheckpointStore the fetched history is kept on disk per day, so later
+    runs of the same day load it instead of downloading it again. Every
+    analyzer cuts its own window from the loaded bars, so all of them see the
+    same bars whether a ticker came from the cache or a fresh fetch.
+    """
+    # Trading days covered by each yfinance period, shortest first
+    period_bars = [
+        ('1mo', 21), ('3mo', 63), ('6mo', 126), ('1y', 252),
+        ('2y', 504), ('5y', 1260), ('10y', 2520),
+    ]
+    # Checkpoint stage of the stored history, apart from CheckpointedPipeline's 'history'
+    stage = 'planned_history'
+
+    def __init__(
+        self, portfolio, requirements, max_period="10y", cache=None, fetcher_class=None,
+        store=None, as_of=None
+    ):
+        """
+        :param portfolio: A list of dictionaries, each containing the ticker symbol of a stock.
+        :param requirements: {analyzer name: bars needed, None for the whole history}.
+        :param max_period: Period fetched for the whole history, the longest ever fetched.
+        :param cache: {ticker: DataFrame} of history already loaded, e.g. by an earlier
+        run or a CheckpointStore. It is assumed to be up to date.
+        :param fetcher_class: Class used to fetch, defaults to StockDataFetcher.
+        :param store: CheckpointStore the history is loaded from and saved to, or None.
+        :param as_of: Date stored history is valid for, part of its key. Defaults to today.
+        """
+        self.portfolio = portfolio
+        self.requirements = dict(requirements)
+        self.max_period = max_period
+        self.cache = {} if cache is None else cache
+        self.fetcher_class = fetcher_class or StockDataFetcher
+        self.store = store
+        self.as_of = as_of or pd.Timestamp.now(tz='America/New_York').strftime('%Y-%m-%d')
+        self.historical_data = {}
+
+    @classmethod
+    def from_analyzers(cls, portfolio, analyzers, **kwargs):
+        """
+        Builds a planner from analyzer classes exposing required_lookback.
+        Args:
+            portfolio (list): Portfolio list as in the portfolio JSON
+            analyzers (list): Classes, or (class, keyword arguments of required_lookback) pairs
+        """
+        requirements = {}
+        for analyzer in analyzers:
+            analyzer, parameters = analyzer if isinstance(analyzer, tuple) else (analyzer, {})
+            requirements[analyzer.__name__] = analyzer.required_lookback(**parameters)
+        return cls(portfolio, requirements, **kwargs)
+
+    @property
+    def required_bars(self):
+        """ Bars needed by the most demanding analyzer, None for the whole history. """
+        if any(bars is None for bars in self.requirements.values()):
+            return None
+        return max(self.requirements.values(), default=0)
+
+    def max_bars(self):
+        return dict(self.period_bars).get(self.max_period, self.period_bars[-1][1])
+
+    def period_for(self, bars):
+        """ Shortest yfinance period covering a number of bars, never above max_period. """
+        if bars is None:
+            return self.max_period
+        for period, period_bars in self.period_bars:
+            if period_bars >= bars or period == self.max_period:
+                return period
+        return self.max_period
+
+    def covered_by_cache(self, ticker, bars):
+        """
+        Whether the cache already holds enough history of a ticker. For the
+        whole history a frame is enough when it spans max_period, or when
+        the ticker simply has no older bars than the cached ones.
+        """
+        data = self.cache.get(ticker)
+        if data is None or data.empty:
+            return False
+        if bars is None:
+            return len(data) >= self.max_bars() - 5 or self.cache_is_full_history(ticker)
+        return len(data) >= bars
+
+    def cache_is_full_history(self, ticker):
+        return getattr(self.cache.get(ticker), 'attrs', {}).get('full_history', False)
+
+    def store_key(self, ticker, interval):
+        return self.store.content_hash(self.stage, ticker, interval, self.as_of)
+
+    def load_stored(self, interval="1d"):
+        """ Adds the history stored on as_of to the cache, for tickers not cached yet. """
+        for stock in self.portfolio:
+            ticker = stock['ticker_symbol']
+            if ticker not in self.cache:
+                data = self.store.load(self.stage, ticker, self.store_key(ticker, interval))
+                if data is not None:
+                    self.cache[ticker] = data
+
+    def plan(self):
+        """
+        Returns:
+            dict: {ticker: period to fetch, or None when the cache covers it}
+        """
+        bars = self.required_bars
+        return {
+            stock['ticker_symbol']: None if self.covered_by_cache(stock['ticker_symbol'], bars)
+            else self.period_for(bars)
+            for stock in self.portfolio
+        }
+
+    def load(self, interval="1d"):
+        """
+        Fetches what the plan requires, one request per ticker as before,
+        and keeps the needed tail of every ticker's history. Fetched history
+        is saved to the store, if any.
+        Returns:
+            dict: Dictionary of DataFrames for each ticker
+        """
+        if self.store is not None:
+            self.load_stored(interval)
+        plan = self.plan()
+        by_period = {}
+        for ticker, period in plan.items():
+            if period is not None:
+                by_period.setdefault(period, []).append({'ticker_symbol': ticker})
+        for period, stocks in by_period.items():
+            fetched = self.fetcher_class(stocks).get_historical_data(period=period, interval=interval)
+            for ticker, data in fetched.items():
+                # Fewer bars than the period spans means the listing is younger
+                data.attrs['full_history'] = len(data) < dict(self.period_bars).get(period, 0) - 5
+                self.cache[ticker] = data
+                if self.store is not None:
+                    self.store.save(self.stage, ticker, self.store_key(ticker, interval), data)
+        bars = self.required_bars
+        self.historical_data = {
+            ticker: self.cache[ticker] if bars is None else self.cache[ticker].iloc[-bars:]
+            for ticker in plan
+        }
+        return self.historical_data
@@ -0,0 +1,184 @@
+import numpy as np
+import pandas as pd
+
+from .feature_engineering import FeatureEngineering
+
+
+class FundamentalFactors:
+    """
+    Growth, margin and stability factors from the quarterly financials of
+    StockDataFetcher.fetch_financials. The long table of
+    FeatureEngineering.consolidate_financials is scattered once into a
+    (tickers, line items, quarters) array, quarter 0 being each ticker's
+    latest report, so every factor of every ticker is a few array operations
+    along the quarter axis instead of a loop over tickers.
+    """
+    line_items = {
+        'revenue': 'Total Revenue',
+        'gross_profit': 'Gross Profit',
+        'operating_income': 'Operating Income',
+        'net_income': 'Net Income',
+    }
+
+    # Slopes this small relative to the row's level are rounding noise of a flat series
+    flat_tolerance = 1e-9
+
+    def __init__(self, quarterly_financials, quarters=8, minimum_quarters=4):
+        """
+        :param quarterly_financials: Long table indexed by 'Date' with 'Financial_Metric',
+        'Value' and 'Ticker', the second frame of FeatureEngineering.consolidate_financials.
+        :param quarters: Most recent quarters kept per ticker.
+        :param minimum_quarters: Reported quarters needed for trends and stability.
+        """
+        self.quarters = quarters
+        self.minimum_quarters = minimum_quarters
+        self.tickers, self.dates, self.values = self.quarter_panel(quarterly_financials)
+
+    @classmethod
+    def from_financial_data(cls, financial_data, **kwargs):
+        """ Factors straight from the output of StockDataFetcher.fetch_financials. """
+        _, quarterly_financials = FeatureEngineering({}, {}, financial_data).consolidate_financials()
+        return cls(quarterly_financials, **kwargs)
+
+    def quarter_panel(self, quarterly_financials):
+        """
+        Scatters the long table into arrays, numbering each ticker's report
+        dates from the latest.
+        Returns:
+            tuple: ticker labels, (tickers, quarters) report dates and
+            (tickers, line items, quarters) values, NaN where not reported
+        """
+        items = list(self.line_items.values())
+        frame = quarterly_financials.reset_index() if len(quarterly_financials) \
+            else pd.DataFrame(columns=['Date', 'Financial_Metric', 'Value', 'Ticker'])
+        frame = frame[frame['Financial_Metric'].isin(items)]
+        frame = frame.assign(Value=pd.to_numeric(frame['Value'], errors='coerce'))
+        frame = frame.dropna(subset=['Date', 'Value'])
+        tickers = pd.Categorical(frame['Ticker'].astype(str))
+        dates = frame['Date'].to_numpy(dtype='datetime64[ns]')
+        # Quarter number of every row: rank of its date among its ticker's dates, latest first
+        pairs = pd.DataFrame({'ticker': tickers.codes, 'date': dates}).drop_duplicates()
+        pairs = pairs.sort_values(['ticker', 'date'], ascending=[True, False])
+        codes = pairs['ticker'].to_numpy()
+        starts = np.r_[0, np.flatnonzero(np.diff(codes)) + 1] if len(codes) else np.zeros(0, dtype=int)
+        slots = np.arange(len(codes)) - np.repeat(starts, np.diff(np.r_[starts, len(codes)]))
+        pairs['slot'] = slots
+        rows = pd.DataFrame({'ticker': tickers.codes, 'date': dates}).merge(
+            pairs, on=['ticker', 'date'], how='left'
+        )
+        keep = (rows['slot'] < self.quarters).to_numpy()
+        ticker_codes = tickers.codes[keep]
+        slot_codes = rows['slot'].to_numpy()[keep]
+        item_codes = pd.Categorical(frame['Financial_Metric'], categories=items).codes[keep]
+        values = np.full((len(tickers.categories), len(items), self.quarters), np.nan)
+        values[ticker_codes, item_codes, slot_codes] = frame['Value'].to_numpy(dtype=float)[keep]
+        report_dates = np.full((len(tickers.categories), self.quarters), np.datetime64('NaT'), 'datetime64[ns]')
+        kept = (pairs['slot'] < self.quarters).to_numpy()
+        report_dates[codes[kept], slots[kept]] = pairs['date'].to_numpy()[kept]
+        return list(tickers.categories), report_dates, values
+
+    def item(self, name):
+        """ (tickers, quarters) values of one line item of line_items. """
+        return self.values[:, list(self.line_items).index(name)]
+
+    def days_between(self, first, second):
+        """ Days from quarter 'second' back to quarter 'first' of every ticker. """
+        return (self.dates[:, first] - self.dates[:, second]) / np.timedelta64(1, 'D')
+
+    def trailing_sum(self, values, offset=0):
+        """
+        Sum of four consecutive quarters starting offset quarters back, NaN
+        when one is missing or the reports span more than a year.
+        """
+        if values.shape[1] < offset + 4:
+            return np.full(len(values), np.nan)
+        total = values[:, offset:offset + 4].sum(axis=1)
+        spans_a_year = self.days_between(offset, offset + 3) <= 300
+        return np.where(spans_a_year, total, np.nan)
+
+    def growth(self, values, lag):
+        """
+        Growth of the latest quarter over the quarter lag reports earlier,
+        relative to the size of the earlier value so a loss turning into a
+        profit counts as growth. YoY comparisons need the reports a year apart.
+        """
+        if values.shape[1] <= lag:
+            return np.full(len(values), np.nan)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change = (values[:, 0] - values[:, lag]) / np.abs(values[:, lag])
+        if lag == 4:
+            days = self.days_between(0, 4)
+            change = np.where((days >= 330) & (days <= 400), change, np.nan)
+        return np.where(np.isfinite(change), change, np.nan)
+
+    def trend(self, values):
+        """
+        Least-squares slope per quarter of every row over its reported
+        quarters, oldest to latest, NaN with fewer than minimum_quarters.
+        Flat rows get exactly 0, so normalization does not stretch the noise.
+        """
+        reported = np.isfinite(values)
+        count = reported.sum(axis=1)
+        time = -np.arange(values.shape[1], dtype=float)[None, :]
+        filled = np.where(reported, values, 0.0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            time_mean = np.where(reported, time, 0.0).sum(axis=1) / count
+            value_mean = filled.sum(axis=1) / count
+            centered = np.where(reported, time - time_mean[:, None], 0.0)
+            slope = (centered * (filled - value_mean[:, None])).sum(axis=1) / (centered ** 2).sum(axis=1)
+        level = np.abs(filled).max(axis=1, initial=0.0)
+        slope = np.where(np.abs(slope) <= self.flat_tolerance * level, 0.0, slope)
+        return np.where(count >= self.minimum_quarters, slope, np.nan)
+
+    def stability(self, values):
+        """
+        1 / (1 + coefficient of variation) of every row, 1 for perfectly steady
+        quarters and towards 0 for erratic or sign-changing ones.
+        """
+        count = np.isfinite(values).sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.nanmean(values, axis=1)
+            deviation = np.nanstd(values, axis=1)
+            score = 1 / (1 + deviation / np.abs(mean))
+        return np.where((count >= self.minimum_quarters) & np.isfinite(score), score, np.nan)
+
+    def compute(self):
+        """
+        Returns:
+            pd.DataFrame: One row per ticker with the factors, whose scoring
+            directions are part of PortfolioAnalysisEngine.metrics
+        """
+        revenue = self.item('revenue')
+        net_income = self.item('net_income')
+        ttm = {name: self.trailing_sum(self.item(name)) for name in self.line_items}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            margins = {
+                name: self.item(name) / np.where(revenue > 0, revenue, np.nan)
+                for name in ('gross_profit', 'operating_income')
+            }
+            ttm_revenue = np.where(ttm['revenue'] > 0, ttm['revenue'], np.nan)
+            factors = pd.DataFrame({
+                'ttmRevenue': ttm['revenue'],
+                'ttmNetIncome': ttm['net_income'],
+                'revenueGrowthYoY': self.growth(revenue, 4),
+                'revenueGrowthQoQ': self.growth(revenue, 1),
+                'earningsGrowthYoY': self.growth(net_income, 4),
+                'earningsGrowthQoQ': self.growth(net_income, 1),
+                'ttmGrossMargin': ttm['gross_profit'] / ttm_revenue,
+                'ttmOperatingMargin': ttm['operating_income'] / ttm_revenue,
+                'ttmNetMargin': ttm['net_income'] / ttm_revenue,
+                'grossMarginTrend': self.trend(margins['gross_profit']),
+                'operatingMarginTrend': self.trend(margins['operating_income']),
+                'earningsStability': self.stability(net_income),
+            }, index=pd.Index(self.tickers, name='Ticker'))
+        return factors
+
+    def join(self, market_data):
+        """
+        Adds the factors to market_data as new columns, NaN for tickers
+        without quarterly financials such as ETFs.
+        Returns:
+            pd.DataFrame: market_data with the factor columns
+        """
+        factors = self.compute().reindex(market_data.index)
+        return market_data.drop(columns=factors.columns, errors='ignore').join(factors)
@@ -0,0 +1,270 @@
+import math
+import os
+from collections import deque
+
+import pandas as pd
+
+
+class IntradayBarStore:
+    """
+    Streams minute bars into a local store and resamples them on the fly.
+    Every timeframe keeps one open bar per ticker, updated in place, plus a
+    bounded deque of finished bars, so memory stays constant however long
+    the session runs. Raw minute bars are appended to one CSV per ticker and
+    day when a store directory is given, and replayed from it on startup so
+    a restarted store neither appends bars twice nor loses its bars. Daily
+    bars before the stored days can be seeded from the daily history, so
+    the 1d timeframe does not start empty either.
+    """
+    timeframe_minutes = {'1m': 1, '5m': 5, '15m': 15, '30m': 30, '1h': 60, '1d': None}
+    columns = ['Open', 'High', 'Low', 'Close', 'Volume']
+    session_minutes = 390
+
+    def __init__(
+        self, tickers, store_dir=None, timeframes=('5m', '1h', '1d'),
+        max_bars=500, session_open='09:30', timezone='America/New_York', restore_days=None
+    ):
+        """
+        :param tickers: Ticker symbols to ingest.
+        :param store_dir: Directory for the raw minute bars, or None to keep nothing on disk.
+        :param timeframes: Timeframes to resample into, keys of timeframe_minutes.
+        :param max_bars: Finished bars kept in memory per ticker and timeframe.
+        :param session_open: Local time intraday buckets are anchored to.
+        :param timezone: Exchange timezone of the session.
+        :param restore_days: Most recent persisted days replayed into memory on startup,
+        by default enough to fill max_bars of every intraday timeframe. The last
+        persisted bar is always used to skip bars already on disk.
+        """
+        unknown = set(timeframes) - set(self.timeframe_minutes)
+        if unknown:
+            raise ValueError(f"Unsupported timeframes: {sorted(unknown)}")
+        self.tickers = list(tickers)
+        self.store_dir = store_dir
+        self.timeframes = list(timeframes)
+        self.timezone = timezone
+        hours, minutes = map(int, session_open.split(':'))
+        self.session_open = hours * 60 + minutes
+        self.finished = {
+            timeframe: {ticker: deque(maxlen=max_bars) for ticker in self.tickers}
+            for timeframe in self.timeframes
+        }
+        self.open_bars = {
+            timeframe: dict.fromkeys(self.tickers) for timeframe in self.timeframes
+        }
+        self.max_bars = max_bars
+        self.last_timestamp = dict.fromkeys(self.tickers)
+        if self.store_dir is not None:
+            self.restore(self.days_to_fill() if restore_days is None else restore_days)
+
+    def days_to_fill(self):
+        """ Sessions of minute bars needed for max_bars of every intraday timeframe. """
+        return max((
+            math.ceil(self.max_bars / math.ceil(self.session_minutes / minutes))
+            for minutes in map(self.timeframe_minutes.get, self.timeframes) if minutes is not None
+        ), default=1)
+
+    def stored_days(self, ticker):
+        """ Persisted day files of a ticker, oldest first. """
+        directory = os.path.join(self.store_dir, ticker)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(
+            os.path.join(directory, name) for name in os.listdir(directory) if name.endswith('.csv')
+        )
+
+    def read_day(self, path):
+        bars = pd.read_csv(path, index_col=0)
+        bars.index = pd.to_datetime(bars.index, utc=True).tz_convert(self.timezone)
+        return bars[self.columns]
+
+    def restore(self, days=1):
+        """
+        Rebuilds the open and finished bars from the last persisted days and
+        seeds the last ingested timestamp of every ticker from disk.
+        Args:
+            days (int): Number of most recent day files replayed
+        """
+        for ticker in self.tickers:
+            paths = self.stored_days(ticker)
+            if not paths:
+                continue
+            if days <= 0:
+                last = self.read_day(paths[-1]).index.max()
+                self.last_timestamp[ticker] = last if pd.notna(last) else None
+                continue
+            self.replay(ticker, pd.concat([self.read_day(path) for path in paths[-days:]]))
+
+    def replay(self, ticker, bars):
+        """
+        Folds many minute bars into every timeframe at once, with the same
+        result as add_bar on each of them. Bars are resampled with one
+        groupby per timeframe, which keeps restoring weeks of minute bars fast.
+        Args:
+            ticker (str): Ticker symbol
+            bars (pd.DataFrame): Minute bars with OHLCV columns in time order
+        """
+        if self.last_timestamp[ticker] is not None:
+            # Bars must be merged into the open ones, one at a time
+            for row in bars[self.columns].itertuples():
+                self.add_bar(ticker, row.Index, row.Open, row.High, row.Low,
+                             row.Close, row.Volume)
+            return
+        index = pd.DatetimeIndex(bars.index)
+        index = index.tz_localize(self.timezone) if index.tz is None \
+            else index.tz_convert(self.timezone)
+        # add_bar skips every bar not later than the ones before it
+        newer = index > pd.Series(index).cummax().shift().to_numpy()
+        newer[:1] = True
+        bars, index = bars[self.columns][newer], index[newer]
+        if not len(bars):
+            return
+        for timeframe in self.timeframes:
+            minutes = self.timeframe_minutes[timeframe]
+            starts = index.normalize()
+            if minutes is not None:
+                minute_of_day = index.hour * 60 + index.minute
+                offsets = (minute_of_day - self.session_open) // minutes * minutes
+                starts = starts + pd.to_timedelta(self.session_open + offsets, unit='min')
+            resampled = bars.groupby(starts, sort=False).agg(
+                {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'}
+            )
+            rows = list(resampled.itertuples(name=None))
+            self.finished[timeframe][ticker].extend(rows[:-1])
+            self.open_bars[timeframe][ticker] = list(rows[-1])
+        self.last_timestamp[ticker] = index[-1]
+
+    def seed_daily(self, historical_data):
+        """
+        Fills the finished 1d bars with the daily history before the first
+        day already held, so daily signals are available right after a start.
+        Args:
+            historical_data (dict): {ticker: daily OHLCV DataFrame}, e.g. from FetchPlanner.load
+        Returns:
+            dict: Number of daily bars added per ticker
+        """
+        if '1d' not in self.timeframes:
+            return {}
+        added = {}
+        for ticker in self.tickers:
+            data = historical_data.get(ticker)
+            if data is None or data.empty:
+                continue
+            finished = self.finished['1d'][ticker]
+            open_bar = self.open_bars['1d'][ticker]
+            held = [bar[0] for bar in finished] + ([open_bar[0]] if open_bar is not None else [])
+            bars = data[self.columns].dropna(subset=['Close'])
+            index = pd.DatetimeIndex(bars.index)
+            index = index.tz_localize(self.timezone) if index.tz is None \
+                else index.tz_convert(self.timezone)
+            days = index.normalize()
+            if held:
+                # Days the store already holds come from the minute bars
+                bars, days = bars[days < min(held)], days[days < min(held)]
+            room = self.max_bars - len(finished)
+            older = [
+                (day, *row) for day, row in zip(days, bars.itertuples(index=False))
+            ][len(bars) - room:] if room > 0 else []
+            self.finished['1d'][ticker] = deque(older + list(finished), maxlen=self.max_bars)
+            added[ticker] = len(older)
+        return added
+
+    def bucket_start(self, timestamp, timeframe):
+        """ Start of the bar of the given timeframe that a minute bar falls into. """
+        day = timestamp.normalize()
+        minutes = self.timeframe_minutes[timeframe]
+        if minutes is None:
+            return day
+        minute_of_day = timestamp.hour * 60 + timestamp.minute
+        offset = (minute_of_day - self.session_open) // minutes * minutes
+        return day + pd.Timedelta(minutes=self.session_open + offset)
+
+    def localize(self, timestamp):
+        timestamp = pd.Timestamp(timestamp)
+        if timestamp.tzinfo is None:
+            return timestamp.tz_localize(self.timezone)
+        return timestamp.tz_convert(self.timezone)
+
+    def add_bar(self, ticker, timestamp, open_, high, low, close, volume):
+        """
+        Folds one minute bar into every timeframe.
+        Returns:
+            bool: False if the bar was already ingested
+        """
+        timestamp = self.localize(timestamp)
+        last = self.last_timestamp[ticker]
+        if last is not None and timestamp <= last:
+            return False
+        self.last_timestamp[ticker] = timestamp
+        for timeframe in self.timeframes:
+            start = self.bucket_start(timestamp, timeframe)
+            bar = self.open_bars[timeframe][ticker]
+            if bar is not None and bar[0] == start:
+                bar[2] = max(bar[2], high)
+                bar[3] = min(bar[3], low)
+                bar[4] = close
+                bar[5] += volume
+                continue
+            if bar is not None:
+                self.finished[timeframe][ticker].append(tuple(bar))
+            self.open_bars[timeframe][ticker] = [start, open_, high, low, close, volume]
+        return True
+
+    def ingest(self, ticker, bars):
+        """
+        Streams a DataFrame of minute bars into the store, skipping bars seen before.
+        Args:
+            ticker (str): Ticker symbol
+            bars (pd.DataFrame): Minute bars with OHLCV columns indexed by timestamp
+        Returns:
+            int: Number of new bars
+        """
+        new_rows = []
+        for row in bars[self.columns].itertuples():
+            if self.add_bar(ticker, row.Index, row.Open, row.High, row.Low,
+                            row.Close, row.Volume):
+                new_rows.append(row.Index)
+        if self.store_dir is not None and new_rows:
+            self.persist(ticker, bars.loc[new_rows, self.columns])
+        return len(new_rows)
+
+    def persist(self, ticker, bars):
+        """ Appends minute bars to the ticker's file for each trading day. """
+        directory = os.path.join(self.store_dir, ticker)
+        os.makedirs(directory, exist_ok=True)
+        for day, day_bars in bars.groupby(bars.index.date):
+            path = os.path.join(directory, f"{day.isoformat()}.csv")
+            day_bars.to_csv(path, mode='a', header=not os.path.exists(path))
+
+    def poll(self, data_fetcher, period="1d"):
+        """
+        Fetches the latest minute bars for every ticker and ingests the new ones.
+        Args:
+            data_fetcher (StockDataFetcher): Source of the intraday bars
+        Returns:
+            dict: Number of new bars per ticker
+        """
+        return {
+            ticker: self.ingest(ticker, data_fetcher.get_intraday_bars(ticker, period=period))
+            for ticker in self.tickers
+        }
+
+    def frames(self, timeframe, include_partial=True, min_bars=1):
+        """
+        Resampled bars of one timeframe in the historical_data layout the analyzers expect.
+        Args:
+            timeframe (str): One of the configured timeframes
+            include_partial (bool): Whether to append the bar that is still forming
+            min_bars (int): Tickers with fewer bars are left out
+        Returns:
+            dict: {ticker: OHLCV DataFrame}
+        """
+        frames = {}
+        for ticker in self.tickers:
+            bars = list(self.finished[timeframe][ticker])
+            if include_partial and self.open_bars[timeframe][ticker] is not None:
+                bars.append(tuple(self.open_bars[timeframe][ticker]))
+            if len(bars) < min_bars:
+                continue
+            frame = pd.DataFrame(bars, columns=['Date'] + self.columns)
+            frames[ticker] = frame.set_index('Date')
+        return frames
@@ -0,0 +1,167 @@
+import datetime
+import json
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+
+class SnapshotStore:
+    """
+    Versioned, columnar snapshots of what a run produced. Every run writes
+    its tables (enriched market data, factor contributions, weights,
+    allocations) as uncompressed Arrow IPC files in a new version directory,
+    and a manifest lists the versions in order. Reading memory-maps the
+    files, so tables and single columns of past runs are available without
+    copying them into memory.
+    """
+    def __init__(self, root):
+        """
+        :param root: Directory holding one sub-directory per version and the manifest.
+        """
+        if pa is None:
+            raise ImportError("SnapshotStore requires pyarrow to be installed")
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.manifest_path = os.path.join(root, 'manifest.json')
+        self.manifest = []
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as file:
+                self.manifest = json.load(file)
+
+    @staticmethod
+    def to_arrow(frame):
+        """
+        Converts a DataFrame to an Arrow table, keeping the index as a column.
+        Object columns become numbers when they all are, strings when they
+        hold text, and JSON text otherwise.
+        """
+        frame = frame.copy()
+        for column in frame.columns[frame.dtypes == object]:
+            values = frame[column]
+            numeric = pd.to_numeric(values, errors='coerce')
+            if numeric.notna().sum() == values.notna().sum():
+                frame[column] = numeric
+            elif values.map(lambda value: value is None or isinstance(value, str)).all():
+                frame[column] = values.astype('string')
+            else:
+                frame[column] = values.map(
+                    lambda value: None if value is None else json.dumps(value, default=str)
+                ).astype('string')
+        frame.columns = [str(column) for column in frame.columns]
+        return pa.Table.from_pandas(frame, preserve_index=True)
+
+    def new_version(self):
+        """ Timestamped version id, suffixed when two runs share a second. """
+        version = datetime.datetime.now().strftime('%Y%m%dT%H%M%S')
+        existing = {entry['version'] for entry in self.manifest}
+        suffix = 1
+        candidate = version
+        while candidate in existing:
+            candidate = f"{version}_{suffix}"
+            suffix += 1
+        return candidate
+
+    def path(self, version, name):
+        return os.path.join(self.root, version, f"{name}.arrow")
+
+    def write(self, tables, metadata=None):
+        """
+        Writes one snapshot.
+        Args:
+            tables (dict): {table name: DataFrame or Series}
+            metadata (dict, optional): JSON-serializable details about the run
+        Returns:
+            str: The new version id
+        """
+        version = self.new_version()
+        os.makedirs(os.path.join(self.root, version), exist_ok=True)
+        rows = {}
+        for name, frame in tables.items():
+            if isinstance(frame, pd.Series):
+                frame = frame.to_frame()
+            table = self.to_arrow(frame)
+            path = self.path(version, name)
+            temporary_path = f"{path}.tmp"
+            with pa.OSFile(temporary_path, 'wb') as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(temporary_path, path)
+            rows[name] = table.num_rows
+        # The manifest is written last, so a crashed run never shows up as a version
+        self.manifest.append({
+            'version': version,
+            'created': datetime.datetime.now().isoformat(),
+            'tables': rows,
+            'metadata': metadata or {},
+        })
+        temporary_path = f"{self.manifest_path}.tmp"
+        with open(temporary_path, 'w') as file:
+            json.dump(self.manifest, file, indent=4, default=str)
+        os.replace(temporary_path, self.manifest_path)
+        return version
+
+    def versions(self, table=None):
+        """ Version ids in the order they were written, optionally only those holding a table. """
+        return [
+            entry['version'] for entry in self.manifest
+            if table is None or table in entry['tables']
+        ]
+
+    def resolve(self, version):
+        if version is None or version == 'latest':
+            versions = self.versions()
+            if not versions:
+                raise FileNotFoundError(f"No snapshots in {self.root}")
+            return versions[-1]
+        return version
+
+    def read(self, name, version=None, columns=None):
+        """
+        Memory-maps one table of a snapshot. The returned Arrow table refers
+        to the mapped file, no data is copied.
+        Args:
+            name (str): Table name
+            version (str, optional): Version id, defaults to the latest
+            columns (list, optional): Columns to keep
+        Returns:
+            pyarrow.Table
+        """
+        source = pa.memory_map(self.path(self.resolve(version), name), 'r')
+        table = pa.ipc.open_file(source).read_all()
+        return table.select(columns) if columns is not None else table
+
+    def read_frame(self, name, version=None, columns=None):
+        """ A snapshot table converted to a DataFrame with its original index. """
+        table = self.read(name, version)
+        if columns is not None:
+            index_columns = table.schema.pandas_metadata.get('index_columns', []) \
+                if table.schema.pandas_metadata else []
+            keep = [c for c in index_columns if isinstance(c, str)] + list(columns)
+            table = table.select(keep)
+        return table.to_pandas()
+
+    def compare(self, name, column, versions=None, key='Ticker'):
+        """
+        One column of a table across versions, side by side.
+        Args:
+            name (str): Table name
+            column (str): Column compared
+            versions (list, optional): Versions to compare, defaults to all holding the table
+            key (str): Column identifying rows, usually the saved index
+        Returns:
+            pd.DataFrame: Indexed by key with one column per version
+        """
+        versions = self.versions(name) if versions is None else versions
+        series = {}
+        for version in versions:
+            table = self.read(name, version, columns=[key, column])
+            series[version] = pd.Series(
+                table.column(column).to_numpy(zero_copy_only=False),
+                index=table.column(key).to_pylist()
+            )
+        return pd.DataFrame(series)
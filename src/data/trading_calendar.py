@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+
+
+class TradingCalendar:
+    """
+    Ingest stage that runs once per run: every ticker's history is mapped to
+    one shared calendar of trading sessions, stored as int64 nanoseconds of
+    the session date in a single timezone. Downstream components then take
+    lookback windows as integer offsets instead of re-localizing and
+    filtering each frame by date.
+    """
+    def __init__(self, historical_data, timezone='America/New_York'):
+        """
+        :param historical_data: Dictionary of DataFrames indexed by date for each ticker.
+        :param timezone: Timezone every timestamp is normalized to.
+        """
+        self.historical_data = historical_data
+        self.timezone = timezone
+        self.tickers = list(historical_data)
+        sessions = {
+            ticker: self.normalize_index(data.index)
+            for ticker, data in historical_data.items()
+        }
+        self.timestamps = np.unique(np.concatenate(
+            list(sessions.values()) or [np.empty(0, dtype=np.int64)]
+        ))
+        # Calendar position of every row of every ticker's own frame
+        self.positions = {
+            ticker: np.searchsorted(self.timestamps, values)
+            for ticker, values in sessions.items()
+        }
+        self.listing_positions = pd.Series({
+            ticker: positions[0] if len(positions) else -1
+            for ticker, positions in self.positions.items()
+        }, dtype=np.int64)
+        self.gaps = {
+            ticker: np.setdiff1d(np.arange(positions[0], positions[-1] + 1), positions)
+            if len(positions) else np.empty(0, dtype=np.int64)
+            for ticker, positions in self.positions.items()
+        }
+        self.panels = {}
+
+    def normalize_index(self, index):
+        """ Session dates of an index as int64 nanoseconds in the calendar timezone. """
+        index = pd.DatetimeIndex(index)
+        if index.tz is None:
+            index = index.tz_localize(self.timezone)
+        else:
+            index = index.tz_convert(self.timezone)
+        return index.normalize().as_unit('ns').asi8
+
+    @property
+    def dates(self):
+        return pd.DatetimeIndex(pd.to_datetime(self.timestamps, utc=True)).tz_convert(self.timezone)
+
+    @property
+    def listing_dates(self):
+        return pd.Series(self.dates[self.listing_positions.values], index=self.tickers)
+
+    def panel(self, field='Close'):
+        """
+        Aligned (sessions, tickers) array of one column, NaN where a ticker did not trade.
+        """
+        if field not in self.panels:
+            panel = np.full((len(self.timestamps), len(self.tickers)), np.nan)
+            for j, ticker in enumerate(self.tickers):
+                data = self.historical_data[ticker]
+                if field in data.columns:
+                    panel[self.positions[ticker], j] = data[field].to_numpy(dtype=float)
+            self.panels[field] = panel
+        return self.panels[field]
+
+    def to_timestamp(self, date):
+        """ A date as int64 nanoseconds of its session date in the calendar timezone. """
+        return self.normalize_index(pd.DatetimeIndex([pd.Timestamp(date)]))[0]
+
+    def lookback_start(self, years=None, bars=None, as_of=None):
+        """
+        First calendar position of a lookback window ending at the latest session.
+        Args:
+            years (float, optional): Calendar years to look back from as_of
+            bars (int, optional): Number of sessions to look back instead
+            as_of (datetime-like, optional): End of the window. Defaults to today.
+        Returns:
+            int: Calendar position where the window starts
+        """
+        if bars is not None:
+            return max(len(self.timestamps) - bars, 0)
+        as_of = pd.Timestamp.now(tz=self.timezone) if as_of is None else as_of
+        cutoff = self.to_timestamp(pd.Timestamp(as_of) - pd.DateOffset(years=years))
+        return int(np.searchsorted(self.timestamps, cutoff, side='left'))
+
+    def ticker_offset(self, ticker, start_position):
+        """ Row offset into a ticker's own frame of the first row at or after a calendar position. """
+        return int(np.searchsorted(self.positions[ticker], start_position, side='left'))
+
+    def recent_data(self, years=None, bars=None):
+        """
+        Every ticker's frame restricted to the lookback window with integer slicing.
+        Returns:
+            dict: {ticker: DataFrame}
+        """
+        start = self.lookback_start(years=years, bars=bars)
+        return {
+            ticker: data.iloc[self.ticker_offset(ticker, start):]
+            for ticker, data in self.historical_data.items()
+        }
+
+    def nearest_position(self, date, tolerance_days=5):
+        """
+        Calendar position of the session closest to a date.
+        Returns:
+            int: Position, or -1 when no session lies within the tolerance
+        """
+        if len(self.timestamps) == 0:
+            return -1
+        target = self.to_timestamp(date)
+        right = int(np.searchsorted(self.timestamps, target))
+        candidates = [p for p in (right - 1, right) if 0 <= p < len(self.timestamps)]
+        nearest = min(candidates, key=lambda p: abs(self.timestamps[p] - target))
+        tolerance = pd.Timedelta(days=tolerance_days).value
+        return nearest if abs(self.timestamps[nearest] - target) <= tolerance else -1
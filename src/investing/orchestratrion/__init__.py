@@ -1,2 +1,6 @@
 from .portfolio_updator import PortfolioUpdator
-from .investing_decision_maker import InvestmentDecisionMaker
\ No newline at end of file
+from .investing_decision_maker import InvestmentDecisionMaker
+from .multi_portfolio_decision_maker import MultiPortfolioDecisionMaker
+from .intraday_signal_refresher import IntradaySignalRefresher
+from .checkpointed_pipeline import CheckpointedPipeline
+from .drift_monitor import DriftMonitor
\ No newline at end of file
@@ -0,0 +1,144 @@
+import json
+
+import pandas as pd
+
+from analysis import PortfolioAnalysisEngine
+from data import StockDataFetcher, FeatureEngineering, ETFDataFiller, TradingCalendar
+from strategies import AnalysisImplementor, StrategyExecutor, BudgetAllocator
+
+
+class CheckpointedPipeline:
+    """
+    Runs the investment pipeline ticker by ticker with every stage
+    checkpointed in a CheckpointStore. Fetches are keyed by their parameters
+    and the run date; every later stage's key hashes its parameters and the
+    content of the data it consumes, so a rerun skips every unchanged
+    (ticker, stage) pair, a corrected fetch recomputes everything downstream,
+    a newly added ticker only runs its own stages, and a failure late in the
+    run resumes from the last good stage.
+    """
+    def __init__(
+        self, portfolio, budget, checkpoint_store, period="10y", interval="1d",
+        as_of=None, seed=0, refresh=False
+    ):
+        """
+        Args:
+            portfolio (list): Portfolio list as in the portfolio JSON
+            budget (float): Money to allocate
+            checkpoint_store (CheckpointStore): Where stage outputs are kept
+            period (str): History fetched per ticker
+            interval (str): Bar size of the history
+            as_of (str, optional): Date the run refers to, part of every key
+            so fetched data is refreshed daily. Defaults to today.
+            seed (int): Seed of the Markov stage so reruns reproduce it
+            refresh (bool): Fetch history and info again even if fetched on as_of,
+            e.g. after a data correction
+        """
+        self.portfolio = portfolio
+        self.budget = budget
+        self.store = checkpoint_store
+        self.period = period
+        self.interval = interval
+        self.as_of = as_of or pd.Timestamp.now(tz='America/New_York').strftime('%Y-%m-%d')
+        self.seed = seed
+        self.refresh = refresh
+        self.historical_data = {}
+        self.market_data = None
+
+    def fetch_history(self, ticker):
+        fetcher = StockDataFetcher([{'ticker_symbol': ticker}])
+        return self.store.cached(
+            'history', ticker,
+            lambda: fetcher.get_historical_data(self.period, self.interval)[ticker],
+            self.period, self.interval, self.as_of, refresh=self.refresh
+        )
+
+    def fetch_info(self, ticker):
+        fetcher = StockDataFetcher([{'ticker_symbol': ticker}])
+        frame, _ = self.store.cached(
+            'info', ticker,
+            lambda: pd.DataFrame({
+                'info': [json.dumps(fetcher.fetch_current_market_data()[ticker], default=str)]
+            }),
+            self.as_of, refresh=self.refresh
+        )
+        return json.loads(frame['info'].iloc[0]), self.store.content_hash(frame)
+
+    def consolidate_market_data(self, ticker, info, history, info_key):
+        """
+        Info fields of one ticker, with ETF fields filled from the cached info.
+        info_key is the content hash of the fetched info.
+        """
+        def compute():
+            market_data = FeatureEngineering({ticker: info}, {ticker: history}, {}) \
+                .consolidate_info_fields()
+            ETFDataFiller(market_data, _CachedInfo({ticker: info})).fill_all_etfs()
+            return market_data
+        return self.store.cached('market_data', ticker, compute, info_key)
+
+    def analysis_stage(self, stage, ticker, history, market_row, *upstream_keys):
+        """
+        Runs one AnalysisImplementor step on a single ticker and keeps only
+        the columns it added.
+        """
+        steps = {
+            'indicators': 'implement_technical_analysis',
+            'patterns': 'implement_pattern_analysis',
+            'markov': 'integrate_markov_predictions',
+        }
+        def compute():
+            row = market_row.copy()
+            implementor = AnalysisImplementor({ticker: history}, row, seed=self.seed)
+            getattr(implementor, steps[stage])()
+            added = implementor.market_data.columns.difference(market_row.columns)
+            return implementor.market_data[added].infer_objects()
+        return self.store.cached(stage, ticker, compute, self.seed, *upstream_keys)
+
+    def run_ticker(self, ticker):
+        """
+        Runs every per-ticker stage, loading whatever is already checkpointed.
+        Returns:
+            pd.DataFrame: The ticker's market_data row with all analysis columns
+        """
+        history, _ = self.fetch_history(ticker)
+        # Downstream stages depend on what was fetched, not on how it was keyed
+        history_key = self.store.content_hash(history)
+        info, info_key = self.fetch_info(ticker)
+        market_row, market_key = self.consolidate_market_data(ticker, info, history, info_key)
+        columns = [market_row]
+        for stage in ['indicators', 'patterns', 'markov']:
+            # The analyses cut their lookback relative to the run date, hence as_of
+            frame, _ = self.analysis_stage(
+                stage, ticker, history, market_row, history_key, market_key, self.as_of
+            )
+            columns.append(frame)
+        self.historical_data[ticker] = history
+        return pd.concat(columns, axis=1)
+
+    def run(self):
+        """
+        Returns:
+            dict: Money allocated per ticker
+        """
+        rows = [self.run_ticker(stock['ticker_symbol']) for stock in self.portfolio]
+        self.market_data = pd.concat(rows)
+        portfolio_analyzer = PortfolioAnalysisEngine(
+            self.portfolio, self.market_data, self.historical_data,
+            calendar=TradingCalendar(self.historical_data)
+        )
+        strategy_executor = StrategyExecutor(self.market_data, portfolio_analyzer)
+        strategy_executor.adjust_weights()
+        budget_allocator = BudgetAllocator(
+            self.budget, self.market_data, self.historical_data,
+            self.portfolio, strategy_executor.weights
+        )
+        return budget_allocator.allocate_budget()
+
+
+class _CachedInfo:
+    """ Stands in for StockDataFetcher so ETFDataFiller reads the checkpointed info. """
+    def __init__(self, market_dict):
+        self.market_dict = market_dict
+
+    def fetch_current_market_data(self):
+        return self.market_dict
@@ -0,0 +1,235 @@
+import datetime
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+class DriftMonitor:
+    """
+    Cheap check of whether accounts have drifted away from their last target
+    weights. The targets StrategyExecutor produced for every account are kept
+    in a JSON state file, and holdings are kept as a sparse (accounts,
+    tickers) share matrix, so a check is one element-wise product with the
+    cached prices, a row sum and a comparison against the thresholds. Only
+    the accounts that breach a threshold are handed to the full pipeline,
+    and only on the edge: an account stays drifted until it trades, so it is
+    recomputed again only once its holdings change, its drift grows or the
+    cooldown expires.
+    """
+    def __init__(
+        self, state_path, absolute_threshold=0.05, relative_threshold=0.25,
+        drift_growth=0.02, cooldown_minutes=24 * 60
+    ):
+        """
+        :param state_path: JSON file the target weights are kept in between runs.
+        :param absolute_threshold: Weight difference, in weight points, that is a breach.
+        :param relative_threshold: Weight difference relative to the target that is a breach.
+        :param drift_growth: Growth of an account's largest drift, in weight points,
+        that triggers another recompute before the cooldown expires.
+        :param cooldown_minutes: Minutes after which a still drifted account is recomputed again.
+        """
+        self.state_path = state_path
+        self.absolute_threshold = absolute_threshold
+        self.relative_threshold = relative_threshold
+        self.drift_growth = drift_growth
+        self.cooldown = pd.Timedelta(minutes=cooldown_minutes)
+        self.state = {}
+        if os.path.exists(state_path):
+            with open(state_path) as file:
+                self.state = json.load(file)
+        self.accounts = []
+        self.rows = {}
+        self.tickers = []
+        self.shares = None
+        self.targets = None
+
+    def record(self, account_id, weights):
+        """
+        Keeps the target weights of an account, e.g. InvestmentDecisionMaker.weights
+        after execute_strategy. The target matrix picks them up on refresh_targets.
+        """
+        total = sum(weights.values())
+        self.state.setdefault(str(account_id), {}).update({
+            'weights': {ticker: weight / total for ticker, weight in weights.items()} if total else {},
+            'as_of': datetime.datetime.now().isoformat(),
+        })
+
+    def save(self):
+        """ Writes the target weights to the state file. """
+        temporary_path = f"{self.state_path}.tmp"
+        with open(temporary_path, 'w') as file:
+            json.dump(self.state, file, indent=4)
+        os.replace(temporary_path, self.state_path)
+
+    def set_holdings(self, portfolios):
+        """
+        Builds the share and target matrices. Holdings only change when an
+        account trades, so this runs once per trading session, not per check.
+        Args:
+            portfolios (dict): {account_id: portfolio list as in the portfolio JSON}
+        """
+        self.accounts = [str(account) for account in portfolios]
+        self.rows = {account: row for row, account in enumerate(self.accounts)}
+        tickers = dict.fromkeys(
+            stock['ticker_symbol'] for portfolio in portfolios.values() for stock in portfolio
+        )
+        for account in self.accounts:
+            tickers.update(dict.fromkeys(self.state.get(account, {}).get('weights', {})))
+        self.tickers = list(tickers)
+        columns = {ticker: k for k, ticker in enumerate(self.tickers)}
+        self.shares = self.matrix([
+            (row, columns[stock['ticker_symbol']], stock.get('stocks_owned', 0))
+            for row, portfolio in enumerate(portfolios.values()) for stock in portfolio
+        ])
+        self.refresh_targets()
+
+    def matrix(self, entries):
+        """ (accounts, tickers) sparse matrix from (row, column, value) entries. """
+        rows, cols, values = zip(*entries) if entries else ((), (), ())
+        return sparse.csr_matrix(
+            (np.asarray(values, dtype=float), (np.asarray(rows, dtype=np.int64),
+                                               np.asarray(cols, dtype=np.int64))),
+            shape=(len(self.accounts), len(self.tickers))
+        )
+
+    def refresh_targets(self):
+        """
+        Rebuilds the target matrix from the recorded weights, adding columns
+        for tickers the holdings did not have, so the next check compares
+        against the latest targets without another set_holdings.
+        """
+        known = set(self.tickers)
+        self.tickers += list(dict.fromkeys(
+            ticker for account in self.accounts
+            for ticker in self.state.get(account, {}).get('weights', {}) if ticker not in known
+        ))
+        if self.shares is not None and self.shares.shape[1] != len(self.tickers):
+            self.shares = self.shares.tocsr(copy=True)
+            self.shares.resize((len(self.accounts), len(self.tickers)))
+        columns = {ticker: k for k, ticker in enumerate(self.tickers)}
+        self.targets = self.matrix([
+            (row, columns[ticker], weight)
+            for row, account in enumerate(self.accounts)
+            for ticker, weight in self.state.get(account, {}).get('weights', {}).items()
+        ])
+
+    @staticmethod
+    def prices_from_history(historical_data):
+        """ Last cached close per ticker, e.g. from the CheckpointStore or IntradayBarStore frames. """
+        return pd.Series({
+            ticker: data['Close'].dropna().iloc[-1] if not data['Close'].dropna().empty else np.nan
+            for ticker, data in historical_data.items()
+        })
+
+    def current_weights(self, prices):
+        """
+        Weights of the holdings at the given prices.
+        Args:
+            prices (dict or pd.Series): Price per ticker, tickers without a price count as zero value
+        Returns:
+            scipy.sparse.csr_matrix: (accounts, tickers) weights
+        """
+        prices = pd.Series(prices, dtype=float).reindex(self.tickers).fillna(0.0).to_numpy()
+        values = self.shares.multiply(prices[None, :]).tocsr()
+        totals = np.asarray(values.sum(axis=1)).ravel()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scale = np.where(totals > 0, 1 / totals, 0.0)
+        return sparse.diags(scale) @ values
+
+    def check(self, prices):
+        """
+        Compares current weights with the targets.
+        Args:
+            prices (dict or pd.Series): Cached price per ticker
+        Returns:
+            pd.DataFrame: One row per breaching (account, ticker) pair with the
+            'target', 'current' and 'drift' weights, largest drift first
+        """
+        current = self.current_weights(prices)
+        has_target = np.diff(self.targets.indptr) > 0
+        drift = (current - self.targets).tocoo()
+        targets = np.asarray(self.targets[drift.row, drift.col]).ravel()
+        breached = (np.abs(drift.data) > self.absolute_threshold) | (
+            np.abs(drift.data) > self.relative_threshold * targets
+        )
+        # Accounts without recorded targets cannot drift
+        breached &= has_target[drift.row]
+        rows, cols = drift.row[breached], drift.col[breached]
+        breaches = pd.DataFrame({
+            'account': np.asarray(self.accounts, dtype=object)[rows] if len(rows) else [],
+            'ticker': np.asarray(self.tickers, dtype=object)[cols] if len(cols) else [],
+            'target': targets[breached],
+            'current': drift.data[breached] + targets[breached],
+            'drift': drift.data[breached],
+        })
+        order = np.argsort(-np.abs(breaches['drift'].to_numpy()), kind='stable')
+        return breaches.iloc[order].reset_index(drop=True)
+
+    def accounts_without_targets(self):
+        """ Accounts without recorded target weights, they need the full pipeline. """
+        return [
+            account for account in self.accounts
+            if not self.state.get(account, {}).get('weights')
+        ]
+
+    def holdings_of(self, account):
+        """ {ticker: shares} of one account's current holdings. """
+        row = self.shares.getrow(self.rows[account])
+        return {self.tickers[col]: float(shares) for col, shares in zip(row.indices, row.data)}
+
+    def should_trigger(self, account, drift, now):
+        """
+        Whether an account needs the full pipeline, given its largest absolute
+        drift. It does unless it was already triggered with the same holdings,
+        a drift that has not grown by drift_growth since, and within the cooldown.
+        """
+        trigger = self.state.get(account, {}).get('trigger')
+        if trigger is None or trigger['holdings'] != self.holdings_of(account):
+            return True
+        if drift > trigger['drift'] + self.drift_growth:
+            return True
+        return now - pd.Timestamp(trigger['at']) >= self.cooldown
+
+    def mark_triggered(self, account, drift, now):
+        """ Keeps what an account looked like when it was handed to the full pipeline. """
+        self.state.setdefault(account, {})['trigger'] = {
+            'holdings': self.holdings_of(account),
+            'drift': float(drift),
+            'at': now.isoformat(),
+        }
+
+    def run(self, prices, recompute):
+        """
+        Checks every account and runs the full pipeline only where needed:
+        for breaching or never recorded accounts that should_trigger.
+        Args:
+            prices (dict or pd.Series): Cached price per ticker
+            recompute (callable): Called as recompute(account_ids, tickers) with the
+            triggered accounts and the tickers they breached on. It returns
+            {account_id: target weights}, which are recorded and saved.
+        Returns:
+            pd.DataFrame: The breaches that triggered the recompute
+        """
+        now = pd.Timestamp.now()
+        breaches = self.check(prices)
+        drifts = breaches['drift'].abs().groupby(breaches['account']).max()
+        accounts = [
+            account for account in dict.fromkeys(
+                list(breaches['account']) + self.accounts_without_targets()
+            ) if self.should_trigger(account, drifts.get(account, 0.0), now)
+        ]
+        breaches = breaches[breaches['account'].isin(accounts)].reset_index(drop=True)
+        if accounts:
+            tickers = sorted(set(breaches['ticker']))
+            targets = recompute(accounts, tickers)
+            for account in accounts:
+                self.mark_triggered(account, drifts.get(account, 0.0), now)
+            for account, weights in targets.items():
+                self.record(account, weights)
+            self.save()
+            # Later checks compare against the new targets, not the breached ones
+            self.refresh_targets()
+        return breaches
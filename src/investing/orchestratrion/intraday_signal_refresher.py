@@ -0,0 +1,46 @@
+import pandas as pd
+
+from strategies import AnalysisImplementor
+
+
+class IntradaySignalRefresher:
+    def __init__(self, bar_store, min_bars=30, historical_data=None):
+        """
+        Refreshes technical indicators and candlestick patterns during the
+        trading day from the bars kept by an IntradayBarStore.
+        Args:
+            bar_store (IntradayBarStore): Source of the resampled bars
+            min_bars (int): Tickers with fewer bars in a timeframe are skipped,
+            the volatility based windows need at least 30
+            historical_data (dict, optional): Daily history the 1d bars are seeded
+            with, so daily signals do not wait min_bars sessions
+        """
+        self.bar_store = bar_store
+        self.min_bars = min_bars
+        if historical_data is not None:
+            self.bar_store.seed_daily(historical_data)
+
+    def refresh(self, timeframe):
+        """
+        Runs TechnicalAnalysis and CandlestickPatterns on one timeframe.
+        Returns:
+            pd.DataFrame: Latest signals per ticker, with the same columns
+            AnalysisImplementor writes into market_data
+        """
+        frames = self.bar_store.frames(timeframe, min_bars=self.min_bars)
+        signals = pd.DataFrame(index=pd.Index(list(frames), name='Ticker'))
+        if not frames:
+            return signals
+        analysis_implementor = AnalysisImplementor(frames, signals)
+        analysis_implementor.implement_technical_analysis()
+        analysis_implementor.implement_pattern_analysis()
+        return analysis_implementor.market_data
+
+    def refresh_all(self):
+        """
+        Returns:
+            dict: {timeframe: latest signals DataFrame}
+        """
+        return {
+            timeframe: self.refresh(timeframe) for timeframe in self.bar_store.timeframes
+        }
@@ -1,32 +1,103 @@
+import pandas as pd
+
 from strategies import (
-    AnalysisImplementor, StrategyExecutor, BudgetAllocator 
+    AnalysisImplementor, StrategyExecutor, BudgetAllocator, PortfolioOptimizer
 )
-from analysis import PortfolioAnalysisEngine
+from analysis import PortfolioAnalysisEngine, RiskEngine
+from utils import longest_lookback
 
 
 class InvestmentDecisionMaker:
     
     def __init__(
-        self, historical_data, market_data, portfolio_data, budget
+        self, historical_data, market_data, portfolio_data, budget, calendar=None,
+        allocation_mode='heuristic', optimizer=None, minimum_allocation=5, etf_holdings=None,
+        seed=0
     ):
+        """
+        allocation_mode is 'heuristic' to allocate the adjusted weights as
+        they are, or a PortfolioOptimizer mode ('mean_variance' or
+        'risk_budget') to use them as tilts of an optimized allocation.
+        Passing the same optimizer every day warm-starts its solves.
+        etf_holdings (ETFHoldings) enables the look-through balance score.
+        seed seeds the Markov stage so runs on the same data are identical.
+        """
         self.historical_data = historical_data
         self.market_data = market_data
         self.portfolio_data = portfolio_data
-        self.portfolio_analyzer = PortfolioAnalysisEngine(portfolio_data, market_data, historical_data)
-        self.analysis_implementor = AnalysisImplementor(historical_data, market_data)
+        self.portfolio_analyzer = PortfolioAnalysisEngine(
+            portfolio_data, market_data, historical_data, calendar=calendar,
+            etf_holdings=etf_holdings
+        )
+        self.analysis_implementor = AnalysisImplementor(
+            historical_data, market_data, seed=seed, calendar=calendar
+        )
         self.strategy_exeutor = StrategyExecutor(market_data, self.portfolio_analyzer)
         self.budget_allocator = None  
         self.budget = budget
+        self.allocation_mode = allocation_mode
+        self.optimizer = optimizer
+        self.minimum_allocation = minimum_allocation
+        self.weights = {}
+
+    @classmethod
+    def required_lookback(cls):
+        """ Daily bars of history a run needs, None meaning all of it. """
+        return longest_lookback(
+            AnalysisImplementor.required_lookback(), PortfolioAnalysisEngine.required_lookback()
+        )
+
+    def optimize_weights(self, weights):
+        """
+        Re-weights the heuristic weights with the portfolio optimizer, using
+        an exponentially weighted covariance of the portfolio's returns.
+        """
+        if self.optimizer is None:
+            risk_engine = RiskEngine.from_historical_data(
+                {ticker: self.historical_data[ticker] for ticker in weights}
+            )
+            self.optimizer = PortfolioOptimizer(
+                risk_engine.covariance(), mode=self.allocation_mode
+            )
+        return self.optimizer.optimize_weights(
+            weights, self.budget, self.minimum_allocation, key='portfolio'
+        )
 
     def execute_strategy(self):
         # Perform all market and financial analyses
         self.analysis_implementor.implement_all_analysis()
         self.strategy_exeutor.adjust_weights()
+        self.weights = self.strategy_exeutor.weights
+        if self.allocation_mode != 'heuristic':
+            self.weights = self.optimize_weights(self.weights)
         self.budget_allocator = BudgetAllocator(
             self.budget, self.market_data, self.historical_data, 
-            self.portfolio_data, self.strategy_exeutor.weights
+            self.portfolio_data, self.weights
         )
+        self.budget_allocator.set_minimum_allocation(self.minimum_allocation)
         # Allocate budget based on the adjusted weights
         allocations = self.budget_allocator.allocate_budget()
 
-        return allocations
\ No newline at end of file
+        return allocations
+
+    def snapshot_tables(self, allocations):
+        """
+        Everything an executed run produced, ready for SnapshotStore.write.
+        Args:
+            allocations (dict): Result of execute_strategy
+        Returns:
+            dict: {table name: DataFrame indexed by ticker}
+        """
+        weights = pd.DataFrame({
+            'adjusted_weight': pd.Series(self.strategy_exeutor.weights, dtype=float),
+            'weight': pd.Series(self.weights, dtype=float),
+        })
+        allocations = pd.Series(allocations, dtype=float, name='allocation').to_frame()
+        for table in (weights, allocations):
+            table.index.name = 'Ticker'
+        return {
+            'market_data': self.market_data,
+            'factor_contributions': self.strategy_exeutor.factor_contributions(),
+            'weights': weights,
+            'allocations': allocations,
+        }
\ No newline at end of file
@@ -0,0 +1,166 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from strategies import (
+    AnalysisImplementor, StrategyExecutor, BatchBudgetAllocator, PortfolioOptimizer
+)
+from analysis import PortfolioAnalysisEngine, RiskEngine
+
+
+class MultiPortfolioDecisionMaker:
+    """
+    Runs the investment strategy for many managed accounts at once.
+    Fetching, indicators, patterns, Markov predictions and the normalization
+    of fundamental metrics happen once over the union of all holdings; only
+    portfolio diversity, the resulting weights and the budget allocation are
+    computed per account. Metrics are therefore normalized across the whole
+    union rather than within each account.
+    """
+    def __init__(
+        self, historical_data, market_data, portfolios, budgets,
+        minimum_allocation=5, chunk_size=256, max_workers=4, calendar=None,
+        allocation_mode='heuristic', optimizer=None, etf_holdings=None, seed=0
+    ):
+        """
+        Args:
+            historical_data (dict): Price history for every ticker of the union
+            market_data (pd.DataFrame): Info fields for every ticker of the union
+            portfolios (dict): {account_id: portfolio list as in the portfolio JSON}
+            budgets (float or dict): Shared budget or {account_id: budget}
+            minimum_allocation (float): Lowest investment permitted per stock
+            chunk_size (int): Accounts held in memory and allocated per batch
+            max_workers (int): Threads used for the per-account computations
+            calendar (TradingCalendar, optional): Shared calendar of the union
+            allocation_mode (str): 'heuristic', or a PortfolioOptimizer mode to
+            optimize every account with its weights as tilts
+            optimizer (PortfolioOptimizer, optional): Reused across runs to warm-start
+            etf_holdings (ETFHoldings, optional): Enables the look-through balance score
+            seed (int): Seed of the Markov stage so runs on the same data are identical
+        """
+        self.historical_data = historical_data
+        self.market_data = market_data
+        self.portfolios = portfolios
+        self.budgets = budgets
+        self.minimum_allocation = minimum_allocation
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.calendar = calendar
+        self.allocation_mode = allocation_mode
+        self.optimizer = optimizer
+        self.etf_holdings = etf_holdings
+        self.seed = seed
+        self.ticker_metrics = None
+        self.adjustments = None
+
+    @staticmethod
+    def union_portfolio(portfolios):
+        """
+        Builds a portfolio list holding each ticker of every account once,
+        suitable for StockDataFetcher.
+        """
+        tickers = dict.fromkeys(
+            stock['ticker_symbol']
+            for portfolio in portfolios.values() for stock in portfolio
+        )
+        return [{'ticker_symbol': ticker} for ticker in tickers]
+
+    def prepare_shared_analysis(self):
+        """
+        Runs every ticker-level stage once for the union of holdings.
+        """
+        analysis_implementor = AnalysisImplementor(
+            self.historical_data, self.market_data, seed=self.seed, calendar=self.calendar
+        )
+        analysis_implementor.implement_all_analysis()
+        self.adjustments = StrategyExecutor(self.market_data).calculate_all_adjustments()
+        shared_analyzer = PortfolioAnalysisEngine(
+            self.union_portfolio(self.portfolios), self.market_data.copy(),
+            self.historical_data, calendar=self.calendar
+        )
+        shared_analyzer.calculate_ticker_metrics()
+        self.ticker_metrics = shared_analyzer.market_data
+        if self.allocation_mode != 'heuristic' and self.optimizer is None:
+            risk_engine = RiskEngine.from_historical_data(self.historical_data)
+            self.optimizer = PortfolioOptimizer(
+                risk_engine.covariance(), mode=self.allocation_mode
+            )
+
+    def account_weights(self, portfolio):
+        """
+        Applies the account-specific part of the strategy to shared metrics.
+        Returns:
+            dict: Normalized weight per ticker held in the account
+        """
+        tickers = [stock['ticker_symbol'] for stock in portfolio]
+        analyzer = PortfolioAnalysisEngine(
+            portfolio, self.ticker_metrics.loc[tickers].copy(), self.historical_data,
+            etf_holdings=self.etf_holdings
+        )
+        analyzer.apply_account_strategy()
+        weights = {
+            ticker: weight * (1 + self.adjustments.get(ticker, 0))
+            for ticker, weight in analyzer.weights.items()
+        }
+        total_weight = sum(weights.values())
+        return {ticker: weight / total_weight for ticker, weight in weights.items()}
+
+    def budget_for(self, account_id):
+        if isinstance(self.budgets, dict):
+            return self.budgets[account_id]
+        return self.budgets
+
+    def allocate_chunk(self, account_ids, executor):
+        """
+        Computes weights for a chunk of accounts in parallel and allocates
+        all of their budgets with a single batch call. In an optimized
+        allocation mode the whole chunk is also optimized in one batch.
+        """
+        weights = list(executor.map(
+            lambda account_id: self.account_weights(self.portfolios[account_id]),
+            account_ids
+        ))
+        if self.allocation_mode != 'heuristic':
+            tickers = self.optimizer.tickers
+        else:
+            tickers = list(dict.fromkeys(
+                ticker for account in weights for ticker in account
+            ))
+        columns = {ticker: position for position, ticker in enumerate(tickers)}
+        weights_matrix = np.zeros((len(account_ids), len(tickers)))
+        held = np.zeros(weights_matrix.shape, dtype=bool)
+        for row, account in enumerate(weights):
+            for ticker, weight in account.items():
+                if ticker in columns:
+                    weights_matrix[row, columns[ticker]] = weight
+                    held[row, columns[ticker]] = True
+        budgets = [self.budget_for(account_id) for account_id in account_ids]
+        if self.allocation_mode != 'heuristic':
+            weights_matrix = self.optimizer.solve_many(
+                weights_matrix, held, budgets, self.minimum_allocation, keys=account_ids
+            )
+        allocator = BatchBudgetAllocator(
+            weights_matrix, budgets, self.minimum_allocation
+        )
+        return zip(account_ids, allocator.allocate_dicts(tickers))
+
+    def iter_allocations(self):
+        """
+        Yields (account_id, allocations) chunk by chunk, so only chunk_size
+        accounts are materialized at any time.
+        """
+        if self.ticker_metrics is None:
+            self.prepare_shared_analysis()
+        account_ids = list(self.portfolios)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for start in range(0, len(account_ids), self.chunk_size):
+                yield from self.allocate_chunk(
+                    account_ids[start:start + self.chunk_size], executor
+                )
+
+    def execute_strategy(self):
+        """
+        Returns:
+            dict: {account_id: {ticker: money allocated}}
+        """
+        return dict(self.iter_allocations())
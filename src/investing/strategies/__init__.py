@@ -1,3 +1,6 @@
 from .strategy_executor import StrategyExecutor
 from .analysis_implementor import AnalysisImplementor
-from .budget_allocator import BudgetAllocator
\ No newline at end of file
+from .budget_allocator import BudgetAllocator
+from .batch_allocator import BatchBudgetAllocator
+from .portfolio_optimizer import PortfolioOptimizer
+from .contribution_simulator import ContributionPlanSimulator
\ No newline at end of file
@@ -1,19 +1,47 @@
 import numpy as np
 
-from analysis import TechnicalAnalysis, CandlestickPatterns, SupportResistance, MarkovModel
+from analysis import (
+    TechnicalAnalysis, CandlestickPatterns, SupportResistance, MarkovModel,
+    MarkovPathSimulator, IndicatorKernels
+)
+from analysis.kernels import PATTERN_NAMES
+from utils import longest_lookback
 
 
 class AnalysisImplementor:
-    def __init__(self, historical_data, market_data) -> None:
+    def __init__(
+        self, historical_data, market_data, seed=None, calendar=None, backend=None
+    ) -> None:
+        """
+        backend is the IndicatorKernels backend, 'numba' or 'numpy', that the
+        recursive indicators and the candlestick patterns are computed with.
+        """
         self.historical_data = historical_data
         self.market_data = market_data
-        self.technical_analysis = TechnicalAnalysis(self.historical_data)
+        self.seed = seed
+        self.technical_analysis = TechnicalAnalysis(self.historical_data, calendar=calendar)
         self.candlestick_patterns = CandlestickPatterns(self.historical_data)
+        # Same bars as TechnicalAnalysis and CandlestickPatterns respectively
+        self.indicator_kernels = IndicatorKernels(
+            self.technical_analysis.historical_data, backend=backend
+        )
+        self.pattern_kernels = IndicatorKernels(self.historical_data, backend=backend)
         self.support_resistance = SupportResistance(self.historical_data)
+        start = calendar.lookback_start(years=3) if calendar is not None else None
         self.markov_models = {
-            ticker: MarkovModel(data) for ticker, data in self.historical_data.items()
+            ticker: MarkovModel(
+                data, offset=calendar.ticker_offset(ticker, start) if calendar is not None else None
+            ) for ticker, data in self.historical_data.items()
         }
     
+    @classmethod
+    def required_lookback(cls):
+        """ Daily bars of history the analyses need, None meaning all of it. """
+        return longest_lookback(
+            TechnicalAnalysis.required_lookback(), CandlestickPatterns.required_lookback(),
+            SupportResistance.required_lookback(), MarkovModel.required_lookback()
+        )
+
     def implement_all_analysis(self):
         self.implement_technical_analysis()
         self.implement_pattern_analysis()
@@ -21,27 +49,32 @@ class AnalysisImplementor:
         
     def implement_technical_analysis(self):
         """ 
-        Applies most recent technical analysis to market data
+        Applies most recent technical analysis to market data. EMA, MACD, RSI
+        and OBV come from IndicatorKernels in one pass over all tickers; each
+        ticker's last bar is the last row of the right-aligned panels.
         """
-        for ticker in self.technical_analysis.historical_data.keys():
+        kernels = self.indicator_kernels
+        windows = self.technical_analysis.windows
+        emas = {window: kernels.ema(window)[-1] for window in set(windows.values())}
+        macd, macd_signal = kernels.macd()
+        rsi = kernels.rsi()
+        obv = kernels.obv()
+        for j, ticker in enumerate(kernels.tickers):
             self.market_data.loc[ticker, 'sma'] = \
                 self.technical_analysis.calculate_sma(ticker).iloc[-1]
-            self.market_data.loc[ticker, 'ema'] = \
-                self.technical_analysis.calculate_ema(ticker).iloc[-1]
+            self.market_data.loc[ticker, 'ema'] = emas[windows[ticker]][j]
             self.market_data.loc[ticker, 'volatility'] = \
                 self.technical_analysis.calculate_moving_volatility(ticker).iloc[-1]
-            self.market_data.loc[ticker, 'rsi'] = \
-                self.technical_analysis.calculate_rsi(ticker).iloc[-1]
-            macd, macd_signal = self.technical_analysis.calculate_macd(ticker)
-            self.market_data.loc[ticker, 'macd'] = macd.iloc[-1]
-            self.market_data.loc[ticker, 'macd_signal'] = macd_signal.iloc[-1]
+            self.market_data.loc[ticker, 'rsi'] = rsi[-1, j]
+            self.market_data.loc[ticker, 'macd'] = macd[-1, j]
+            self.market_data.loc[ticker, 'macd_signal'] = macd_signal[-1, j]
             upper_band, lower_band = \
                 self.technical_analysis.calculate_bollinger_bands(ticker)
             self.market_data.loc[ticker, 'upper_bollinger'] = upper_band.iloc[-1]
             self.market_data.loc[ticker, 'lower_bollinger'] = lower_band.iloc[-1]
-            obv, obv_prev = self.technical_analysis.calculate_obv(ticker)
-            self.market_data.loc[ticker, 'obv'] = obv.iloc[-1]
-            self.market_data.loc[ticker, 'obv_previous'] = obv_prev.iloc[-1]
+            self.market_data.loc[ticker, 'obv'] = obv[-1, j]
+            self.market_data.loc[ticker, 'obv_previous'] = \
+                obv[-2, j] if len(obv) > 1 else np.nan
             self.market_data.loc[ticker, 'trend'] = \
                 self.technical_analysis.calculate_recent_trend(ticker).iloc[-1]
     
@@ -58,25 +91,29 @@ class AnalysisImplementor:
             self.market_data.loc[ticker, 'resistances'] = \
                 resistances[ticker].iloc[-1] if not resistances[ticker].empty else None
 
-        all_patterns = self.candlestick_patterns.find_patterns()
-        for ticker, patterns in all_patterns.items():
-            # Get the last date's data for each ticker's patterns
-            last_patterns = patterns.iloc[-1]
-            # Ensure the ticker is already an index in market_data or has an equivalent key
+        # Only the last bar's flags are needed, (tickers, patterns) from the kernels
+        last_patterns = self.pattern_kernels.patterns()[-1] \
+            if self.pattern_kernels.rows else np.zeros((0, len(PATTERN_NAMES)), dtype=bool)
+        for pattern_name in PATTERN_NAMES:
+            # Add pattern columns to market_data if not already present
+            if pattern_name not in self.market_data.columns:
+                self.market_data[pattern_name] = np.nan
+        for j, ticker in enumerate(self.pattern_kernels.tickers):
             if ticker in self.market_data.index:
-                for pattern_name in patterns.columns:
-                    # Safely add pattern columns to market_data if not already present
-                    if pattern_name not in self.market_data.columns:
-                        self.market_data[pattern_name] = np.nan  # Initialize if not existing
-                    
-                    # Update the specific pattern entry for the ticker in market_data
-                    self.market_data.loc[ticker, pattern_name] = float(last_patterns[pattern_name]
-)                
+                self.market_data.loc[ticker, PATTERN_NAMES] = last_patterns[j].astype(float)
+
     def integrate_markov_predictions(self):
         """
         Integrate Markov model predictions into market data
         """
         self.market_data['markov_state'] = None
+        rng = np.random.default_rng(self.seed)
         for ticker, model in self.markov_models.items():
             if ticker in self.market_data.index:
-                self.market_data.at[ticker, 'markov_state'] = model.predict_next_state()
\ No newline at end of file
+                self.market_data.at[ticker, 'markov_state'] = \
+                    model.predict_next_state(random_state=rng)
+        # Distribution of simulated paths, far less noisy than the single draw above
+        if self.markov_models:
+            summary = MarkovPathSimulator(self.markov_models, seed=rng).summarize()
+            for column in ['next_up_probability', 'expected_return']:
+                self.market_data[f'markov_{column}'] = summary[column]
\ No newline at end of file
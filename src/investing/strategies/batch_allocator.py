@@ -0,0 +1,83 @@
+import numpy as np
+
+
+class BatchBudgetAllocator:
+    def __init__(self, weights, budgets, minimum_allocations=5):
+        """
+        Allocates budgets for many accounts at once.
+        Args:
+            weights (array-like): Weights matrix shaped (accounts, tickers)
+            budgets (array-like): Budget per account
+            minimum_allocations (float or array-like): Lowest investment permitted
+            per stock, either shared or one per account
+        """
+        self.weights = np.nan_to_num(np.atleast_2d(np.asarray(weights, dtype=float)))
+        self.weights = np.clip(self.weights, 0, None)
+        accounts = self.weights.shape[0]
+        self.budgets = np.broadcast_to(np.asarray(budgets, dtype=float), (accounts,))
+        self.minimum_allocations = np.broadcast_to(
+            np.asarray(minimum_allocations, dtype=float), (accounts,)
+        )
+
+    def normalized_weights(self):
+        totals = self.weights.sum(axis=1, keepdims=True)
+        return np.divide(
+            self.weights, totals, out=np.zeros_like(self.weights), where=totals > 0
+        )
+
+    def eligible_tickers(self, weights):
+        """
+        Drops every ticker whose rounded initial allocation is below the minimum.
+        Accounts where nothing clears the threshold keep their largest weight,
+        so the budget is never left unallocated.
+        """
+        initial = np.round(self.budgets[:, None] * weights, 2)
+        eligible = (initial >= self.minimum_allocations[:, None]) & (weights > 0)
+        empty = ~eligible.any(axis=1) & (weights.sum(axis=1) > 0)
+        eligible[empty, np.argmax(weights[empty], axis=1)] = True
+        return eligible
+
+    def allocate(self):
+        """
+        Redistributes each budget over its eligible tickers in proportion to
+        their weights, then rounds with the largest-remainder method in
+        integer cents so every row adds up to its budget exactly.
+        Returns:
+            np.ndarray: Allocations in cents shaped (accounts, tickers)
+        """
+        weights = self.normalized_weights()
+        kept = weights * self.eligible_tickers(weights)
+        totals = kept.sum(axis=1, keepdims=True)
+        shares = np.divide(kept, totals, out=np.zeros_like(kept), where=totals > 0)
+        budget_cents = np.round(self.budgets * 100).astype(np.int64)
+        budget_cents[totals[:, 0] == 0] = 0
+        exact = budget_cents[:, None] * shares
+        cents = np.floor(exact).astype(np.int64)
+        remainders = budget_cents - cents.sum(axis=1)
+        remainders = np.clip(remainders, 0, np.count_nonzero(shares, axis=1))
+        # Hand the leftover cents to the largest fractional parts, ties go to the larger weight
+        by_weight = np.argsort(-shares, axis=1, kind='stable')
+        fractions = np.take_along_axis(exact - cents, by_weight, axis=1)
+        order = np.take_along_axis(
+            by_weight, np.argsort(-fractions, axis=1, kind='stable'), axis=1
+        )
+        ranks = np.empty_like(order)
+        np.put_along_axis(ranks, order, np.arange(order.shape[1])[None, :], axis=1)
+        cents += (ranks < remainders[:, None]) & (shares > 0)
+        return cents
+
+    def allocate_dollars(self):
+        """ Allocations converted back to dollars. """
+        return self.allocate() / 100
+
+    def allocate_dicts(self, tickers):
+        """
+        Allocations as one {ticker: dollars} dictionary per account, skipping
+        tickers that received nothing.
+        """
+        return [
+            {
+                ticker: int(cents) / 100
+                for ticker, cents in zip(tickers, row) if cents > 0
+            } for row in self.allocate()
+        ]
@@ -0,0 +1,309 @@
+import numpy as np
+import pandas as pd
+
+
+class PortfolioOptimizer:
+    """
+    Long-only optimizer used as an alternative to the heuristic weights.
+    Two problems are supported over the simplex of each account's holdings:
+
+    - 'mean_variance' minimizes 0.5 * w'Cw - mu'w, where the expected returns
+      mu = tilt_strength * C @ tilts are implied by the heuristic score
+      weights. The solution blends the score weights with the minimum
+      variance portfolio, tilt_strength = 1 reproducing the scores wherever
+      the long-only constraint does not bind.
+    - 'risk_budget' finds the weights whose risk contributions are
+      proportional to the score weights.
+
+    Many accounts are solved at once: each account is compacted to the
+    covariance block of its own holdings and the blocks are stacked, so one
+    batched product per iteration serves every account. Every solve
+    warm-starts from the account's previous solution, so daily re-solves
+    only need a handful of iterations.
+    """
+    MODES = ('mean_variance', 'risk_budget')
+
+    def __init__(
+        self, covariance, mode='mean_variance', tilt_strength=0.5,
+        max_iterations=2000, tolerance=1e-6, block_elements=10_000_000
+    ):
+        """
+        :param covariance: Covariance DataFrame indexed by ticker on both axes, e.g. RiskEngine.covariance().
+        :param mode: Either 'mean_variance' or 'risk_budget'.
+        :param tilt_strength: Weight of the implied score returns against minimum variance.
+        :param max_iterations: Iteration cap of a single solve.
+        :param tolerance: Largest weight change between iterations at convergence.
+        :param block_elements: Cap on the stacked covariance blocks held in memory at once.
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown optimizer mode '{mode}', expected one of {self.MODES}")
+        covariance = pd.DataFrame(covariance)
+        self.tickers = list(covariance.index)
+        self.covariance = covariance.loc[self.tickers, self.tickers].to_numpy(dtype=float)
+        self.covariance = np.nan_to_num((self.covariance + self.covariance.T) / 2)
+        self.mode = mode
+        self.tilt_strength = tilt_strength
+        self.max_iterations = max_iterations
+        self.tolerance = tolerance
+        self.block_elements = block_elements
+        self.solutions = {}
+        self.iterations = 0
+
+    @staticmethod
+    def largest_eigenvalues(blocks, iterations=100):
+        """ Power iteration estimate of every block's largest eigenvalue, padded by 1%. """
+        vectors = np.ones(blocks.shape[:2])
+        values = np.zeros(len(blocks))
+        for _ in range(iterations):
+            products = np.einsum('akl,al->ak', blocks, vectors)
+            norms = np.linalg.norm(products, axis=1)
+            vectors = products / np.maximum(norms, 1e-300)[:, None]
+            converged = np.abs(norms - values) <= 1e-6 * norms
+            values = norms
+            if converged.all():
+                break
+        return 1.01 * np.maximum(values, 1e-12)
+
+    @staticmethod
+    def project_to_simplex(values, masks):
+        """
+        Euclidean projection of every row onto the probability simplex of its
+        masked entries, the other entries are set to zero.
+        Args:
+            values (np.ndarray): Points shaped (accounts, tickers)
+            masks (np.ndarray): Boolean (accounts, tickers), tickers an account may hold
+        """
+        columns = values.shape[1]
+        ordered = -np.sort(-np.where(masks, values, -np.inf), axis=1)
+        finite = np.isfinite(ordered)
+        ordered = np.where(finite, ordered, 0.0)
+        cumulative = np.cumsum(ordered, axis=1) - 1
+        positions = np.arange(1, columns + 1)
+        support = finite & (ordered - cumulative / positions > 0)
+        size = columns - np.argmax(support[:, ::-1], axis=1)
+        rows = np.arange(len(values))
+        threshold = cumulative[rows, size - 1] / size
+        projected = np.where(masks, np.maximum(values - threshold[:, None], 0.0), 0.0)
+        projected[~support.any(axis=1)] = 0.0
+        return projected
+
+    def align(self, tilts, masks=None):
+        """ Tilts and masks as float and boolean arrays over the optimizer's tickers. """
+        tilts = np.atleast_2d(np.nan_to_num(np.asarray(tilts, dtype=float)))
+        tilts = np.clip(tilts, 0, None)
+        masks = np.ones(tilts.shape, dtype=bool) if masks is None \
+            else np.atleast_2d(np.asarray(masks, dtype=bool))
+        totals = np.where(masks, tilts, 0).sum(axis=1, keepdims=True)
+        tilts = np.divide(tilts * masks, totals, out=np.zeros_like(tilts), where=totals > 0)
+        return tilts, masks
+
+    def starting_points(self, tilts, masks, keys):
+        """ Previous solutions where the account has one, the tilts otherwise. """
+        start = tilts.copy()
+        for row, key in enumerate(keys or []):
+            previous = self.solutions.get(str(key))
+            if previous is not None:
+                start[row] = previous
+        start = self.project_to_simplex(start, masks)
+        empty = ~(start > 0).any(axis=1)
+        start[empty] = self.project_to_simplex(tilts[empty], masks[empty])
+        return start
+
+    def compact(self, masks):
+        """
+        Column indices of every account's holdings, padded to the largest
+        holding count.
+        Returns:
+            tuple: (indices, valid), both shaped (accounts, holdings)
+        """
+        counts = masks.sum(axis=1)
+        width = max(int(counts.max(initial=0)), 1)
+        order = np.argsort(~masks, axis=1, kind='stable')[:, :width]
+        valid = np.arange(width)[None, :] < counts[:, None]
+        return np.where(valid, order, 0), valid
+
+    def blocks(self, indices, valid):
+        """ Stacked covariance blocks, zero outside the holdings and one on the padded diagonal. """
+        blocks = self.covariance[indices[:, :, None], indices[:, None, :]]
+        pairs = valid[:, :, None] & valid[:, None, :]
+        blocks = np.where(pairs, blocks, 0.0)
+        padding = np.flatnonzero(~valid.ravel())
+        rows, columns = np.divmod(padding, valid.shape[1])
+        blocks[rows, columns, columns] = 1.0
+        return blocks
+
+    def solve_mean_variance(self, blocks, tilts, valid, start):
+        """
+        Accelerated projected gradient (FISTA) with adaptive restarts. The step
+        of every account is the inverse of its block's largest eigenvalue, and
+        every account keeps its own momentum sequence, reset on its restarts.
+        """
+        expected_returns = self.tilt_strength * np.einsum('ak,akl->al', tilts, blocks)
+        steps = 1 / self.largest_eigenvalues(np.where(valid[:, :, None], blocks, 0.0))
+        weights = start
+        momentum = start
+        t = np.ones(len(blocks))
+        iteration = -1
+        for iteration in range(self.max_iterations):
+            gradient = np.einsum('ak,akl->al', momentum, blocks) - expected_returns
+            updated = self.project_to_simplex(momentum - steps[:, None] * gradient, valid)
+            change = updated - weights
+            if np.abs(change).max(initial=0) < self.tolerance:
+                weights = updated
+                break
+            # Restart the momentum of rows moving against their gradient
+            restart = np.einsum('ij,ij->i', gradient, change) > 0
+            t_next = (1 + np.sqrt(1 + 4 * t * t)) / 2
+            momentum = updated + ((t - 1) / t_next)[:, None] * change
+            momentum[restart] = updated[restart]
+            t_next[restart] = 1.0
+            weights = updated
+            t = t_next
+        self.iterations = max(self.iterations, iteration + 1)
+        return weights
+
+    def solve_risk_budget(self, blocks, budgets, valid, start):
+        """
+        Cyclic coordinate descent on the log-barrier formulation
+        min 0.5 * y'Cy - sum(b * log(y)), whose solution normalized to one has
+        risk contributions proportional to b. Each coordinate has a closed
+        form and is updated for all accounts at once. Holdings without variance
+        would take the whole account, so their variance is floored at the
+        smallest positive variance among the account's holdings.
+        """
+        variances = np.diagonal(blocks, axis1=1, axis2=2)
+        floors = np.where(valid & (variances > 0), variances, np.inf).min(axis=1)
+        floors = np.where(np.isfinite(floors), floors, 1.0)
+        riskless = valid & ~(variances > 0)
+        if riskless.any():
+            blocks = blocks.copy()
+            rows, columns = np.nonzero(riskless)
+            blocks[rows, columns, columns] = floors[rows]
+        budgets = np.where(valid, np.maximum(budgets, 1e-12), 0.0)
+        budgets = budgets / np.maximum(budgets.sum(axis=1, keepdims=True), 1e-300)
+        # At the optimum y'Cy equals the sum of the budgets, so rescale the start to it
+        products = np.einsum('ak,akl->al', start, blocks)
+        variance = np.einsum('ak,ak->a', products, start)
+        scale = 1 / np.sqrt(np.maximum(variance, 1e-300))
+        scaled = start * scale[:, None]
+        products *= scale[:, None]
+        variances = np.diagonal(blocks, axis1=1, axis2=2)
+        iteration = -1
+        for iteration in range(self.max_iterations):
+            # Changes are measured on the weights normalized to one
+            totals = np.maximum(scaled.sum(axis=1), 1e-300)
+            change = 0.0
+            for j in range(scaled.shape[1]):
+                variance = variances[:, j]
+                others = products[:, j] - variance * scaled[:, j]
+                updated = (-others + np.sqrt(others ** 2 + 4 * variance * budgets[:, j])) \
+                    / (2 * variance)
+                delta = updated - scaled[:, j]
+                products += delta[:, None] * blocks[:, :, j]
+                scaled[:, j] = updated
+                change = max(change, (np.abs(delta) / totals).max(initial=0))
+            if change < self.tolerance:
+                break
+        self.iterations = max(self.iterations, iteration + 1)
+        totals = scaled.sum(axis=1, keepdims=True)
+        return np.divide(scaled, totals, out=np.zeros_like(scaled), where=totals > 0)
+
+    def solve(self, tilts, masks, keys=None, start=None):
+        """
+        Solves aligned rows, starting from the given points or else from the
+        accounts' previous solutions. Accounts are compacted to their own
+        holdings and solved in groups that fit within block_elements.
+        """
+        if start is None:
+            start = self.starting_points(tilts, masks, keys)
+        else:
+            start = self.project_to_simplex(start, masks)
+        indices, valid = self.compact(masks)
+        weights = np.zeros_like(tilts)
+        group = max(self.block_elements // indices.shape[1] ** 2, 1)
+        self.iterations = 0
+        for begin in range(0, len(tilts), group):
+            rows = np.arange(begin, min(begin + group, len(tilts)))
+            columns = indices[rows]
+            blocks = self.blocks(columns, valid[rows])
+            solver = self.solve_mean_variance if self.mode == 'mean_variance' \
+                else self.solve_risk_budget
+            solved = solver(
+                blocks, np.take_along_axis(tilts[rows], columns, axis=1) * valid[rows],
+                valid[rows], np.take_along_axis(start[rows], columns, axis=1) * valid[rows]
+            )
+            held = valid[rows]
+            weights[np.broadcast_to(rows[:, None], held.shape)[held], columns[held]] = solved[held]
+        return weights
+
+    def solve_many(self, tilts, masks=None, budgets=None, minimum_allocation=0, keys=None):
+        """
+        Optimizes every account and drops holdings whose allocation would be
+        below the minimum, re-solving (warm) over the remaining holdings
+        until no allocation is below it.
+        Args:
+            tilts (array-like): Heuristic score weights shaped (accounts, tickers)
+            masks (array-like, optional): Tickers each account may hold. Defaults to all
+            budgets (float or array-like, optional): Budget per account
+            minimum_allocation (float): Lowest investment permitted per stock
+            keys (list, optional): Account ids, used to warm-start and store solutions.
+            They are stored as strings so solutions survive save_solutions
+        Returns:
+            np.ndarray: Weights shaped (accounts, tickers), rows add up to one
+        """
+        tilts, masks = self.align(tilts, masks)
+        masks = masks.copy()
+        weights = self.solve(tilts, masks, keys)
+        if budgets is not None and minimum_allocation > 0:
+            budgets = np.broadcast_to(np.asarray(budgets, dtype=float), (len(tilts),))
+            rows = np.arange(len(tilts))
+            while True:
+                below = masks & (np.round(budgets[:, None] * weights, 2) < minimum_allocation)
+                # An account that cannot fund anything keeps its largest position
+                keep = np.argmax(weights, axis=1)
+                below[rows, keep] = False
+                changed = below.any(axis=1)
+                if not changed.any():
+                    break
+                masks[below] = False
+                weights[changed] = self.solve(
+                    tilts[changed], masks[changed], start=weights[changed]
+                )
+        if keys is not None:
+            self.solutions.update(zip(map(str, keys), weights))
+        return weights
+
+    def optimize_weights(self, weights, budget=None, minimum_allocation=0, key=None):
+        """
+        Optimizes a single account's {ticker: weight} heuristic weights.
+        Returns:
+            dict: Optimized weight per ticker of the input
+        """
+        tilts = pd.Series(weights, dtype=float).reindex(self.tickers)
+        masks = tilts.notna().to_numpy()
+        optimized = self.solve_many(
+            tilts.fillna(0).to_numpy(), masks, budget, minimum_allocation,
+            keys=None if key is None else [key]
+        )[0]
+        return {
+            ticker: float(optimized[self.tickers.index(ticker)])
+            for ticker in weights if ticker in self.tickers
+        }
+
+    def save_solutions(self, path):
+        """ Stores the last solution of every account so tomorrow's solve can warm-start. """
+        keys = list(self.solutions)
+        np.savez(
+            path, keys=np.array([str(key) for key in keys]), tickers=np.array(self.tickers),
+            weights=np.array([self.solutions[key] for key in keys]).reshape(len(keys), len(self.tickers))
+        )
+
+    def load_solutions(self, path):
+        """
+        Loads solutions written by save_solutions, realigned to the current
+        tickers. Tickers that disappeared are dropped, new ones start at zero.
+        """
+        stored = np.load(path)
+        frame = pd.DataFrame(stored['weights'], index=stored['keys'], columns=stored['tickers'])
+        frame = frame.reindex(columns=self.tickers).fillna(0)
+        self.solutions.update(zip(frame.index, frame.to_numpy()))
@@ -1,10 +1,39 @@
+import pandas as pd
+
+
 class StrategyExecutor:
-    def __init__(self, market_data, portfolio_analyzor) -> None:
+    def __init__(self, market_data, portfolio_analyzor=None) -> None:
+        """
+        Without a portfolio analyzer the executor only computes ticker-level
+        adjustments, which is how multi-portfolio runs share them across accounts.
+        """
         self.market_data = market_data
         self.portfolio_analyzor = portfolio_analyzor
-        self.portfolio_analyzor.apply_strategy()
-        self.weights = self.portfolio_analyzor.weights
+        self.weights = {}
+        self.calibration = {}
+        self.adjustment_factors = {}
+        if self.portfolio_analyzor is not None:
+            self.portfolio_analyzor.apply_strategy()
+            self.weights = self.portfolio_analyzor.weights
     
+    def load_calibration(self, path, horizon=5):
+        """
+        Replaces the fixed adjustment constants with the weights calibrated
+        by SignalCalibrator for one forward-return horizon. Signals missing
+        from the table, or without a weight, keep their constants.
+        Args:
+            path (str): CSV written by SignalCalibrator.save
+            horizon (int): Forward-return horizon whose weights are used
+        """
+        table = pd.read_csv(path)
+        table = table[table['horizon'] == horizon].dropna(subset=['weight'])
+        self.calibration = dict(zip(table['signal'], table['weight']))
+        return self.calibration
+
+    def calibrated(self, signal, default):
+        """ Calibrated adjustment of a signal, or its fixed constant. """
+        return self.calibration.get(signal, default)
+
     def normalize_weights(self):
         total_weight = sum(self.weights.values())
         for key in self.weights:
@@ -15,11 +44,33 @@ class StrategyExecutor:
         Adjusts weights based on technical indicators, market patterns
         and Markov model predictions
         """
-        for ticker, data in self.market_data.iterrows():
-            total_adjustment = self.calculate_adjustments(data, ticker)
+        for ticker, total_adjustment in self.calculate_all_adjustments().items():
             self.weights[ticker] *= (1 + total_adjustment)
         self.normalize_weights()
+
+    def calculate_all_adjustments(self):
+        """
+        Total adjustment factor for every ticker in the market data
+        Returns:
+            pd.Series: Adjustment indexed by ticker
+        """
+        return pd.Series({
+            ticker: self.calculate_adjustments(data, ticker)
+            for ticker, data in self.market_data.iterrows()
+        }, dtype=float)
     
+    def factor_contributions(self):
+        """
+        Adjustment of every factor for every ticker, from the last call to
+        calculate_all_adjustments.
+        Returns:
+            pd.DataFrame: Indexed by ticker with one column per factor and their total
+        """
+        contributions = pd.DataFrame.from_dict(self.adjustment_factors, orient='index')
+        contributions.index.name = 'Ticker'
+        contributions['total'] = contributions.sum(axis=1)
+        return contributions
+
     def calculate_adjustments(self, data, ticker):
         """Calculates adjustment factors based on secondary signals for trading."""
         adjustment_factors = {
@@ -33,6 +84,8 @@ class StrategyExecutor:
             'support_resistance': self.adjust_support_resistance(data),
             'pattern_weight': self.calculate_pattern_weights(ticker)
         }
+        # Kept per ticker so each factor's contribution can be reported
+        self.adjustment_factors[ticker] = adjustment_factors
         return sum(adjustment_factors.values())
     
     def adjust_rsi(self, data):
@@ -44,7 +97,8 @@ class StrategyExecutor:
             float: weight adjustment based on value of RSI
         """
         if 'rsi' in data:
-            return -0.05 if data['rsi'] > 70 else 0.05 if data['rsi'] < 30 else 0
+            return self.calibrated('rsi_overbought', -0.05) if data['rsi'] > 70 \
+                else self.calibrated('rsi_oversold', 0.05) if data['rsi'] < 30 else 0
         return 0
     
     def adjust_macd(self, data):
@@ -56,7 +110,8 @@ class StrategyExecutor:
             data (pd.Series): Series representing all the columns for the row
         """
         if 'macd' in data and 'macd_signal' in data:
-            return 0.05 if (data['macd'] > data['macd_signal']) else -0.05
+            return self.calibrated('macd_bullish', 0.05) if (data['macd'] > data['macd_signal']) \
+                else self.calibrated('macd_bearish', -0.05)
         return 0
     
     def adjust_bollinger(self, data):
@@ -76,43 +131,53 @@ class StrategyExecutor:
             sma = data['sma'] 
             # Check if current price is above the upper Bollinger Band
             if current_price > upper_band:
-                adjustment += 0.05
+                adjustment += self.calibrated('bollinger_above', 0.05)
             # Check if current price is below the lower Bollinger Band
             elif current_price < lower_band:
-                adjustment -= 0.05
+                adjustment += self.calibrated('bollinger_below', -0.05)
             # Calculate bandwidth
             bandwidth = (upper_band - lower_band) / sma
             # Increase adjustment if the bandwidth is very high, indicating high volatility
             if bandwidth > 0.10:  # Threshold for high volatility
-                adjustment += 0.03
+                adjustment += self.calibrated('bollinger_wide', 0.03)
             elif bandwidth < 0.05:  # Threshold for low volatility
-                adjustment -= 0.03
+                adjustment += self.calibrated('bollinger_narrow', -0.03)
         return adjustment
 
     def adjust_price_vs_sma(self, data):
 
         if 'sma' in data and 'currentPrice' in data:
-            return 0.05 if data['currentPrice'] > data['sma'] else -0.05
+            return self.calibrated('price_above_sma', 0.05) if data['currentPrice'] > data['sma'] \
+                else self.calibrated('price_below_sma', -0.05)
         return 0
 
     def adjust_price_vs_ema(self, data):
  
         if 'ema' in data and 'currentPrice' in data:
-            return 0.05 if data['currentPrice'] > data['ema'] else -0.05
+            return self.calibrated('price_above_ema', 0.05) if data['currentPrice'] > data['ema'] \
+                else self.calibrated('price_below_ema', -0.05)
         return 0
     
     def adjust_volatility(self, data):
         if 'volatility' in data:
             mean_volatility = self.market_data['volatility'].mean()
-            return -0.05 if data['volatility'] > mean_volatility else 0.05
+            return self.calibrated('volatility_high', -0.05) if data['volatility'] > mean_volatility \
+                else self.calibrated('volatility_low', 0.05)
         return 0
     
     def adjust_markov(self, data):
-        """A downtrend prediction is 0 or 1 while an uptrend prediction is 2 or 3
+        """A downtrend prediction is 0 or 1 while an uptrend prediction is 2 or 3.
+        When simulated paths are available, the probability of an uptrend
+        scales the adjustment between -0.10 and 0.10 instead.
         """
+        up = self.calibrated('markov_up', 0.10)
+        down = self.calibrated('markov_down', -0.10)
+        if pd.notna(data.get('markov_next_up_probability')):
+            probability = data['markov_next_up_probability']
+            return probability * up + (1 - probability) * down
         if 'markov_state' in data:
-            return -0.10 if data['markov_state'] \
-                in [0, 1] else 0.10 if data['markov_state'] in [2, 3] else 0
+            return down if data['markov_state'] \
+                in [0, 1] else up if data['markov_state'] in [2, 3] else 0
         return 0
     
     def adjust_support_resistance(self, data):
@@ -144,8 +209,10 @@ class StrategyExecutor:
             'Three Black Crows', 'Harami'
         ]
         pattern_weights = sum(
-            [0.03 if self.market_data.at[ticker, pattern] else 0 for pattern in positive_patterns]
-        ) - sum(
-            [0.03 if self.market_data.at[ticker, pattern] else 0 for pattern in negative_patterns]
+            [self.calibrated(pattern, 0.03) if self.market_data.at[ticker, pattern] else 0
+             for pattern in positive_patterns]
+        ) + sum(
+            [self.calibrated(pattern, -0.03) if self.market_data.at[ticker, pattern] else 0
+             for pattern in negative_patterns]
         )
         return pattern_weights
\ No newline at end of file
@@ -1 +1 @@
-from .utils import find_nearest_date, get_current_price
\ No newline at end of file
+from .utils import find_nearest_date, get_current_price, bars_for_years, longest_lookback
\ No newline at end of file
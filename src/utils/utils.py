@@ -32,6 +32,22 @@ def find_nearest_date(target_date, index, tolerance_days=5):
     
     return np.nan
     
+def bars_for_years(years, trading_days_per_year=252, margin=5):
+    """
+    Number of daily bars that covers a lookback given in calendar years,
+    with a small margin for holidays and the partial current session.
+    """
+    return int(np.ceil(years * trading_days_per_year)) + margin
+
+def longest_lookback(*lookbacks):
+    """
+    Combines required lookbacks in bars, where None stands for the whole
+    history and therefore wins over any number of bars.
+    """
+    if any(lookback is None for lookback in lookbacks):
+        return None
+    return max(lookbacks, default=0)
+
 def get_current_price(stock_symbol):
     stock_data = yf.Ticker(stock_symbol)
     current_price = stock_data.history(period='1d')['Close'][0]
@@ -1,21 +1,38 @@
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 
 from src.analysis import CandlestickPatterns
 from src.analysis import SupportResistance
+from src.utils import bars_for_years
 
 
 class StockDataVisualizer:
-    def __init__(self, historical_data, years=3) -> None:
+    def __init__(self, historical_data, years=3, calendar=None, pattern_index=None) -> None:
         self.historical_data = historical_data
+        self.calendar = calendar
+        # A PatternIndex, when given, supplies pattern dates without recomputation
+        self.pattern_index = pattern_index
         self. limit_data_to_recent_years(years)
         self.candlestick_patterns = CandlestickPatterns(self.historical_data)
         self.support_resistance = SupportResistance(self.historical_data)
     
+    @classmethod
+    def required_lookback(cls, years=3):
+        """ Daily bars of history that are plotted. """
+        return bars_for_years(years)
+
     def limit_data_to_recent_years(self, years):
             """
             Limits the data to the most recent years
             """
+            if self.calendar is not None:
+                start = self.calendar.lookback_start(years=years)
+                self.historical_data = {
+                    ticker: data.iloc[self.calendar.ticker_offset(ticker, start):]
+                    for ticker, data in self.historical_data.items()
+                }
+                return
             current_date = pd.Timestamp.now(tz='America/New_York')
             cutoff_date = current_date - pd.DateOffset(years=years)
             self.historical_data = {
@@ -23,6 +40,26 @@ class StockDataVisualizer:
                     for ticker, data in self.historical_data.items()
             }
     
+    def pattern_dates(self, ticker, data):
+        """
+        Dates of the plotted frame on which each pattern was printed.
+        Returns:
+            dict: {pattern: DatetimeIndex}
+        """
+        if self.pattern_index is not None and ticker in self.pattern_index.ticker_codes:
+            sessions = self.pattern_index.normalize_index(data.index)
+            return {
+                pattern: data.index[np.isin(sessions, self.pattern_index.query_positions(
+                    pattern, int(sessions[0]), int(sessions[-1]), [ticker]
+                )[0])] for pattern in self.pattern_index.dates
+            } if len(sessions) else {}
+        patterns = self.candlestick_patterns.find_patterns().get(ticker, pd.DataFrame())
+        # Get dates where the pattern is True
+        return {
+            pattern_name: presence_data.index[presence_data]
+            for pattern_name, presence_data in patterns.items()
+        }
+
     def plot_stock_data(self):
         for ticker, data in self.historical_data.items():
             fig, ax = plt.subplots(figsize=(14, 7))
@@ -30,9 +67,7 @@ class StockDataVisualizer:
             ax.plot(data.index, data['Close'], label='Close Price', color='blue')
 
             # Highlight candlestick patterns
-            patterns = self.candlestick_patterns.find_patterns().get(ticker, pd.DataFrame())
-            for pattern_name, presence_data in patterns.items():
-                valid_dates = presence_data.index[presence_data]  # Get dates where the pattern is True
+            for pattern_name, valid_dates in self.pattern_dates(ticker, data).items():
                 if not valid_dates.empty:
                     pattern_prices = data.loc[valid_dates, 'Close']
                     ax.scatter(valid_dates, pattern_prices, label=pattern_name, s=100, marker='o')
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Modules import each other the way main.py's run does, with src and
+# src/investing on the path
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+sys.path[:0] = [SRC, os.path.join(SRC, 'investing')]
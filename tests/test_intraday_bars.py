@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+from data.intraday_bars import IntradayBarStore
+
+
+def minute_bars(days, seed=0):
+    rng = np.random.default_rng(seed)
+    frames = []
+    for day in days:
+        index = pd.date_range(
+            pd.Timestamp(f"{day} 09:30", tz='America/New_York'), periods=390, freq='min'
+        )
+        close = 100 * np.exp(rng.normal(0, 0.001, len(index)).cumsum())
+        frames.append(pd.DataFrame({
+            'Open': close, 'High': close * 1.001, 'Low': close * 0.999, 'Close': close,
+            'Volume': rng.integers(100, 1000, len(index)).astype(float),
+        }, index=index))
+    return pd.concat(frames)
+
+
+def test_restart_restores_bars_without_duplicates(tmp_path):
+    bars = minute_bars(['2024-03-04', '2024-03-05', '2024-03-06'])
+    store = IntradayBarStore(['A'], store_dir=str(tmp_path))
+    assert store.ingest('A', bars) == len(bars)
+
+    restarted = IntradayBarStore(['A'], store_dir=str(tmp_path))
+    assert restarted.ingest('A', bars) == 0
+    assert sum(len(restarted.read_day(path)) for path in restarted.stored_days('A')) == len(bars)
+    for timeframe in store.timeframes:
+        pd.testing.assert_frame_equal(
+            restarted.frames(timeframe)['A'], store.frames(timeframe)['A']
+        )
+
+
+def test_default_restore_fills_every_intraday_timeframe():
+    assert IntradayBarStore(['A'], max_bars=500).days_to_fill() == 72
+    assert IntradayBarStore(['A'], timeframes=('5m',), max_bars=500).days_to_fill() == 7
+    assert IntradayBarStore(['A'], timeframes=('1d',)).days_to_fill() == 1
+
+
+def test_seed_daily_prepends_older_days_only():
+    store = IntradayBarStore(['A'], max_bars=40)
+    store.ingest('A', minute_bars(['2024-03-06']))
+    days = pd.bdate_range('2024-01-01', '2024-03-06', tz='America/New_York')
+    daily = pd.DataFrame({
+        'Open': 1.0, 'High': 2.0, 'Low': 0.5, 'Close': 1.5, 'Volume': 10.0
+    }, index=days)
+
+    added = store.seed_daily({'A': daily})
+    frame = store.frames('1d')['A']
+    # max_bars finished days plus the day still forming
+    assert added['A'] == 40
+    assert len(frame) == 41
+    assert frame.index.is_unique and frame.index.is_monotonic_increasing
+    # The day held as minute bars keeps its own values
+    assert frame.index[-1] == pd.Timestamp('2024-03-06', tz='America/New_York')
+    assert frame['Close'].iloc[-1] != 1.5
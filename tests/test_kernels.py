@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis import TechnicalAnalysis, CandlestickPatterns
+from analysis.kernels import IndicatorKernels, PATTERN_NAMES, numba
+
+BACKENDS = ['numpy', pytest.param(
+    'numba', marks=pytest.mark.skipif(numba is None, reason='numba is not installed')
+)]
+
+
+@pytest.fixture(scope='module')
+def historical_data():
+    """ Daily OHLCV bars ending today, of different lengths per ticker. """
+    rng = np.random.default_rng(7)
+    data = {}
+    for ticker, bars in [('AAA', 900), ('BBB', 400), ('CCC', 120)]:
+        index = pd.bdate_range(end=pd.Timestamp('today').normalize(), periods=bars,
+                               tz='America/New_York')
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, bars)))
+        open_ = close * np.exp(rng.normal(0, 0.01, bars))
+        data[ticker] = pd.DataFrame({
+            'Open': open_,
+            'High': np.maximum(open_, close) * (1 + rng.uniform(0, 0.02, bars)),
+            'Low': np.minimum(open_, close) * (1 - rng.uniform(0, 0.02, bars)),
+            'Close': close,
+            'Volume': rng.integers(1_000, 100_000, bars).astype(float),
+        }, index=index)
+    return data
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_kernels_match_reference(historical_data, backend):
+    technical_analysis = TechnicalAnalysis(historical_data)
+    # The reference method needs both analyses on the same, limited bars
+    candlestick_patterns = CandlestickPatterns(technical_analysis.historical_data)
+    kernels = IndicatorKernels(technical_analysis.historical_data, backend=backend)
+    differences = kernels.compare_with_reference(technical_analysis, candlestick_patterns)
+    for name in ['ema', 'macd', 'macd_signal', 'obv']:
+        assert differences[name] == 0.0, name
+    # Rolling sums in pandas and running sums in the kernel round differently
+    assert differences['rsi'] < 1e-9
+    assert differences['patterns'] == 0
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_patterns_match_candlestick_patterns(historical_data, backend):
+    expected = CandlestickPatterns(historical_data).find_patterns()
+    for ticker, frame in IndicatorKernels(historical_data, backend=backend).find_patterns().items():
+        pd.testing.assert_frame_equal(
+            frame, expected[ticker][PATTERN_NAMES], check_dtype=False
+        )
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_analysis_implementor_uses_kernels(historical_data, backend):
+    from strategies import AnalysisImplementor
+    market_data = pd.DataFrame(index=list(historical_data))
+    implementor = AnalysisImplementor(historical_data, market_data.copy(), seed=0, backend=backend)
+    implementor.implement_technical_analysis()
+    implementor.implement_pattern_analysis()
+    result = implementor.market_data
+    technical_analysis = TechnicalAnalysis(historical_data)
+    patterns = CandlestickPatterns(historical_data).find_patterns()
+    for ticker in historical_data:
+        macd, macd_signal = technical_analysis.calculate_macd(ticker)
+        obv, obv_previous = technical_analysis.calculate_obv(ticker)
+        expected = {
+            'ema': technical_analysis.calculate_ema(ticker).iloc[-1],
+            'rsi': technical_analysis.calculate_rsi(ticker).iloc[-1],
+            'macd': macd.iloc[-1],
+            'macd_signal': macd_signal.iloc[-1],
+            'obv': obv.iloc[-1],
+            'obv_previous': obv_previous.iloc[-1],
+        }
+        for column, value in expected.items():
+            assert result.loc[ticker, column] == pytest.approx(value, rel=1e-12, abs=1e-9), column
+        for pattern_name in PATTERN_NAMES:
+            assert result.loc[ticker, pattern_name] == float(patterns[ticker][pattern_name].iloc[-1])
@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+from analysis import MarkovModel, MarkovPathSimulator
+
+
+def markov_models():
+    rng = np.random.default_rng(3)
+    models = {}
+    for ticker in ['AAA', 'BBB', 'CCC']:
+        index = pd.bdate_range(end=pd.Timestamp('today').normalize(), periods=500,
+                               tz='America/New_York')
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, len(index))))
+        model = MarkovModel(pd.DataFrame({'Close': close}, index=index))
+        model.define_states()
+        models[ticker] = model
+    return models
+
+
+def test_next_up_probability_is_exact_and_deterministic():
+    models = markov_models()
+    simulator = MarkovPathSimulator(models, seed=1)
+    expected = [
+        simulator.transitions[i, simulator.current_states[i], list(simulator.up_states)].sum()
+        for i in range(len(models))
+    ]
+    np.testing.assert_allclose(simulator.next_up_probabilities(), expected)
+    first = MarkovPathSimulator(models, seed=1).summarize(n_paths=200)
+    second = MarkovPathSimulator(models, seed=2).summarize(n_paths=200)
+    pd.testing.assert_series_equal(first['next_up_probability'], second['next_up_probability'])
+
+
+def test_simulated_first_step_agrees_with_closed_form():
+    simulator = MarkovPathSimulator(markov_models(), seed=0)
+    states, _ = simulator.simulate(n_paths=20000, horizon=1)
+    sampled = np.isin(states[..., 0], simulator.up_states).mean(axis=1)
+    np.testing.assert_allclose(sampled, simulator.next_up_probabilities(), atol=0.02)
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.signal import argrelextrema
+
+from analysis.support_resistance import SupportResistance
+
+
+def extrema(prices, order):
+    analyzer = SupportResistance({'A': pd.DataFrame({'Close': prices})}, order=order)
+    return analyzer.find_extrema('A')[order]
+
+
+@pytest.mark.parametrize('length', [0, 1, 2, 3, 5, 10, 11, 30, 250])
+@pytest.mark.parametrize('order', [1, 3, 10])
+def test_extrema_match_argrelextrema(length, order):
+    rng = np.random.default_rng(length * 100 + order)
+    for _ in range(20):
+        # Rounded so ties are frequent
+        prices = np.round(rng.normal(size=length).cumsum(), 1)
+        minima, maxima = extrema(prices, order)
+        np.testing.assert_array_equal(
+            minima, argrelextrema(prices, np.less_equal, order=order)[0]
+        )
+        np.testing.assert_array_equal(
+            maxima, argrelextrema(prices, np.greater_equal, order=order)[0]
+        )
+
+
+def test_short_series_keeps_global_extremum():
+    minima, maxima = extrema(np.array([3.0, 1.0, 2.0, 4.0, 2.5]), order=10)
+    np.testing.assert_array_equal(minima, [1])
+    np.testing.assert_array_equal(maxima, [3])
+
+
+def test_flat_bottoms_keep_every_bar():
+    prices = np.array([5, 4, 1, 1, 1, 3, 6, 5, 4, 2, 1, 1, 2, 3], dtype=float)
+    minima, _ = extrema(prices, order=2)
+    np.testing.assert_array_equal(minima, [2, 3, 4, 10, 11])